@@ -5,6 +5,34 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
+
+Serving profile
+---------------
+
+The API endpoints that wait on other services (``get_sunset_time``,
+``save_res``, ``activate_res`` and ``do_create_account``) are ``async def``
+views. Under ASGI they wait on the event loop instead of holding a worker
+thread, so one process can keep many slow-upstream requests in flight::
+
+    uvicorn mysite.asgi:application \\
+        --workers 2 \\
+        --limit-concurrency 1000 \\
+        --backlog 2048 \\
+        --timeout-keep-alive 5
+
+- Use one or two workers per core. Synchronous views still run in a
+  single thread per worker, through ``sync_to_async``.
+- ``--limit-concurrency`` bounds open requests per worker. Past it,
+  uvicorn answers 503 instead of queueing without limit.
+- Google Maps calls use a blocking client. Sunset lookups therefore run
+  in the event loop's default thread pool, and concurrent lookups of the
+  same date and location share one thread. The Maps timeouts and circuit
+  breaker in ``yahrzeit_app.maps`` bound how long a thread is held.
+- Keep ``CONN_MAX_AGE`` at 0. Async views reach the database from
+  several threads, and persistent connections would pile up in them.
+
+Under WSGI, the async views still work. Django runs each one in an event
+loop of its own.
 """
 
 import os
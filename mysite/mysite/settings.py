@@ -39,7 +39,6 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    "django_nose",
 ]
 
 MIDDLEWARE = [
@@ -83,6 +82,79 @@ DATABASES = {
     }
 }
 
+
+# Caches
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+#
+# Both caches are in process by default. Set CACHE_BACKEND,
+# CACHE_LOCATION and RESULTS_CACHE_LOCATION to share them between workers,
+# for example with django.core.cache.backends.redis.RedisCache. The two
+# locations must differ, so that culling one cache doesn't evict the
+# other's entries. MAX_ENTRIES and CULL_FREQUENCY bound the in-process,
+# file and database backends: when a cache is full, 1 / CULL_FREQUENCY of
+# its entries are evicted.
+
+CACHE_BACKEND = os.environ.get(
+    "CACHE_BACKEND",
+    "django.core.cache.backends.locmem.LocMemCache",
+)
+CACHE_OPTIONS = {}
+
+if CACHE_BACKEND.endswith(("LocMemCache", "FileBasedCache", "DatabaseCache")):
+    CACHE_OPTIONS = {
+        "MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", 10000)),
+        "CULL_FREQUENCY": int(os.environ.get("CACHE_CULL_FREQUENCY", 3)),
+    }
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": os.environ.get("CACHE_LOCATION", "default"),
+        "KEY_PREFIX": "yahrzeit",
+        "OPTIONS": CACHE_OPTIONS,
+    },
+    # Rendered calculation results, see views.calculate.
+    "results": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": os.environ.get("RESULTS_CACHE_LOCATION", "results"),
+        "KEY_PREFIX": "yahrzeit-results",
+        "OPTIONS": CACHE_OPTIONS,
+    },
+}
+
+# Sessions are only written for logged in users (calculation results are
+# kept in a signed cookie, see yahrzeit_app.results). With a cache that is
+# shared between processes, reads come from the default cache, falling
+# back to the database. A per-process cache would keep serving a session
+# that another worker logged out, so then they only use the database.
+# Prune expired sessions with the prune_sessions command.
+
+if CACHE_BACKEND.endswith(("RedisCache", "PyMemcacheCache", "PyLibMCCache")):
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+else:
+    SESSION_ENGINE = "django.contrib.sessions.backends.db"
+
+
+# Yahrzeit app
+#
+# Read here rather than when yahrzeit_app modules are imported, so that
+# management commands and tests that don't call Google Maps run without
+# the keys.
+
+# Server-side key for geocoding and the browser key for Places
+# autocomplete.
+GMAPS_KEY = os.environ.get("GMAPS_KEY", "")
+JS_KEY = os.environ.get("JS_KEY", "")
+GMAPS_BASE_URL = os.environ.get(
+    "GMAPS_BASE_URL",
+    "https://maps.googleapis.com",
+)
+
+# "google" geocodes with Google Maps, "local" with the offline gazetteer,
+# which reads GAZETTEER_FILE if it is set (see yahrzeit_app.gazetteer).
+GEOCODER = os.environ.get("GEOCODER", "google")
+GAZETTEER_FILE = os.environ.get("GAZETTEER_FILE")
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -129,8 +201,3 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 TEST_RUNNER = "django.test.runner.DiscoverRunner"
-
-# NOSE_ARGS = [
-#     '--with-coverage',
-#     '--cover-package=yahrzeit_app.helpers, yahrzeit_app.crud, yahrzeit_app.views',
-# ]
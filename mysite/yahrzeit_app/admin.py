@@ -1,6 +1,8 @@
 from django.contrib import admin
-from .models import CustomUser, Decedent
+from .models import CustomUser, Anniversary, Decedent, GeocodedLocation
 
 # Register your models here.
 admin.site.register(CustomUser)
+admin.site.register(Anniversary)
 admin.site.register(Decedent)
+admin.site.register(GeocodedLocation)
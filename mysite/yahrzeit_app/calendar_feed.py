@@ -0,0 +1,208 @@
+"""iCalendar subscription feeds for Yahrzeit app.
+
+Each user has a feed of their decedents' upcoming yahrzeits, at a URL
+holding a signed token (see feed_token), since calendar clients can't log
+in. Feeds are generated as a stream, a chunk of decedents at a time, so a
+long list never sits in memory whole.
+
+A decedent's VEVENT blocks only change when its next yahrzeit does, so
+they are kept in the cache keyed by the decedent and its next Hebrew date,
+and each is built once per rollover rather than once per poll.
+
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+import zlib
+from django.core import signing
+from django.core.cache import cache
+from yahrzeit_app import formatting, hebrew_calendar, helpers
+from yahrzeit_app.models import CustomUser, Decedent
+
+FEED_YEARS = 5
+MAX_FEED_YEARS = 20
+CHUNK_SIZE = 500
+# Events are rebuilt when the next yahrzeit changes, so the timeout only
+# has to outlast a year.
+CACHE_TIMEOUT = 400 * 24 * 60 * 60
+
+TOKEN_SALT = 'yahrzeit_app.calendar_feed'
+PRODID = '-//Yahrzeit//Yahrzeit Calendar//EN'
+
+# (pk, name, next_date_hebrew, next_date_gregorian, month, day) of a
+# Decedent, with the month and day of its Anniversary.
+Row = Tuple[int, str, int, date, int, int]
+
+
+def feed_token(user: CustomUser) -> str:
+    """Return the signed token for a user's feed URL."""
+
+    return signing.Signer(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def user_pk_from_token(token: str) -> int:
+    """Return the pk of the user a feed token was made for.
+
+    Raises signing.BadSignature if the token wasn't made by feed_token.
+
+    """
+
+    return int(signing.Signer(salt=TOKEN_SALT).unsign(token))
+
+
+def escape_text(text: str) -> str:
+    """Escape a string for an iCalendar TEXT value."""
+
+    return (
+        text.replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\n', '\\n')
+    )
+
+
+def fold(line: str) -> str:
+    """Fold a content line at 75 octets and end it with CRLF."""
+
+    encoded = line.encode()
+
+    if len(encoded) <= 75:
+        return line + '\r\n'
+
+    parts = []
+    start = 0
+    limit = 75
+
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+
+        # Don't split a UTF-8 character.
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+
+        parts.append(encoded[start:end].decode())
+        start = end
+        # Continuation lines start with a space.
+        limit = 74
+
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _ical_date(day: date) -> str:
+    """Format a date as an iCalendar DATE value."""
+
+    return day.strftime('%Y%m%d')
+
+
+def build_events(row: Row, years: int) -> str:
+    """Return the VEVENT blocks for a decedent's next yahrzeits."""
+
+    pk, name, next_date_hebrew, next_date_gregorian, month, day = row
+    next_date_h = hebrew_calendar.hebrew_date(
+        *formatting.unpack_hebrew(next_date_hebrew),
+    )
+    following_dates = [
+        helpers.FollowingDate(
+            next_date_h,
+            hebrew_calendar.gregorian_from_ordinal(
+                next_date_gregorian.toordinal(),
+            ),
+        ),
+    ] + helpers.get_following_dates(
+        next_date_h,
+        years - 1,
+        anniversary=(month, day),
+    )
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    summary = escape_text(f"{name}'s yahrzeit")
+
+    lines = []
+    for following_date in following_dates:
+        day = following_date.gregorian.to_pydate()
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:{pk}-{following_date.hebrew.year}@yahrzeit',
+            f'DTSTAMP:{stamp}',
+            f'DTSTART;VALUE=DATE:{_ical_date(day)}',
+            f'DTEND;VALUE=DATE:{_ical_date(day + timedelta(days=1))}',
+            f'SUMMARY:{summary}',
+            'DESCRIPTION:' + escape_text(
+                f'{following_date.hebrew_res}. The yahrzeit begins at '
+                'sunset the evening before.',
+            ),
+            'TRANSP:TRANSPARENT',
+            'END:VEVENT',
+        ]
+
+    return ''.join(fold(line) for line in lines)
+
+
+def _cache_key(row: Row, years: int) -> str:
+    """Return the cache key for a decedent's events."""
+
+    pk, name, next_date_hebrew, _, month, day = row
+
+    # The name is hashed in case it is edited, and to bound the key length.
+    return (
+        f'calendar_feed:{pk}:{next_date_hebrew}:{month}-{day}:{years}:'
+        f'{zlib.crc32(name.encode()):08x}'
+    )
+
+
+def events_for_rows(rows: List[Row], years: int) -> Iterator[str]:
+    """Yield the events for a chunk of decedents, from the cache where
+    possible, and cache the ones that had to be built.
+
+    """
+
+    keys = [_cache_key(row, years) for row in rows]
+    cached = cache.get_many(keys)
+    built = {}
+
+    for key, row in zip(keys, rows):
+        events = cached.get(key)
+
+        if events is None:
+            events = built[key] = build_events(row, years)
+
+        yield events
+
+    if built:
+        cache.set_many(built, CACHE_TIMEOUT)
+
+
+def _chunks(rows: Iterable[Row], size: int) -> Iterator[List[Row]]:
+    """Split rows into lists of up to size rows."""
+
+    rows = iter(rows)
+
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def iter_feed(user: CustomUser, years: int = FEED_YEARS) -> Iterator[str]:
+    """Yield a user's feed as iCalendar text, a chunk at a time."""
+
+    yield ''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:Yahrzeits',
+    ))
+
+    rows = Decedent.objects.filter(user=user).order_by('pk').values_list(
+        'pk',
+        'name',
+        'anniversary__next_date_hebrew',
+        'anniversary__next_date_gregorian',
+        'anniversary__month',
+        'anniversary__day',
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+    for chunk in _chunks(rows, CHUNK_SIZE):
+        yield ''.join(events_for_rows(chunk, years))
+
+    yield fold('END:VCALENDAR')
@@ -1,14 +1,24 @@
 """CRUD module for yahrzeit app."""
 
-from django.db.models import QuerySet
-from yahrzeit_app.models import CustomUser, Decedent
+from datetime import date
+import logging
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import F, Q, QuerySet
+from django.utils import timezone
+from yahrzeit_app.models import CustomUser, Anniversary, Decedent
+from yahrzeit_app import formatting
 from yahrzeit_app.helpers import (
-    today_date_string,
-    get_next_date,
-    h_date_db_to_res,
-    g_date_db_to_res,
+    today_date,
+    get_anniversary,
+    get_next_date_for_anniversary,
 )
 
+DECEDENTS_PAGE_SIZE = 50
+
+logger = logging.getLogger(__name__)
+
 
 def create_user(email: str, password: str) -> bool:
     """Instantiate a User with given attributes and save to database."""
@@ -17,6 +27,20 @@ def create_user(email: str, password: str) -> bool:
         return CustomUser.objects.create_user(email, password)
 
 
+async def acreate_user(email: str, password: str) -> bool:
+    """Async version of create_user.
+
+    Hashing the password is slow CPU work, so it runs in a worker thread.
+
+    """
+
+    if not await aget_user_by_email(email):
+        return await sync_to_async(CustomUser.objects.create_user)(
+            email,
+            password,
+        )
+
+
 def get_user_by_email(email: str) -> CustomUser:
     """Retrieve a User with given email if it exists.
     Otherwise, return None.
@@ -26,47 +50,320 @@ def get_user_by_email(email: str) -> CustomUser:
     return CustomUser.objects.filter(email=email).first()
 
 
+async def aget_user_by_email(email: str) -> CustomUser:
+    """Async version of get_user_by_email."""
+
+    return await CustomUser.objects.filter(email=email).afirst()
+
+
+def _version_bump() -> dict:
+    """Return the field updates that mark users' decedents as changed."""
+
+    return {
+        'decedents_version': F('decedents_version') + 1,
+        'decedents_modified': timezone.now(),
+    }
+
+
+def bump_decedents_version(users: QuerySet) -> int:
+    """Mark the decedents of a queryset of users as changed.
+
+    This changes the ETags of their dashboards and decedent API responses.
+    Returns the number of users updated.
+
+    """
+
+    return users.update(**_version_bump())
+
+
+def users_with_anniversaries(anniversaries: Iterable) -> QuerySet:
+    """Return the users with a decedent on any of the given anniversaries.
+
+    Anniversaries can be given as instances, pks or a queryset.
+
+    """
+
+    return CustomUser.objects.filter(
+        pk__in=Decedent.objects.filter(
+            anniversary__in=anniversaries,
+        ).values('user'),
+    )
+
+
+def _decedent_fields(death_date_hebrew: str, next_date_hebrew: str,
+                     next_date_gregorian: str,
+                     after_sunset: bool) -> Tuple[dict, dict, int]:
+    """Parse create_decedent's date strings into model fields.
+
+    Return the Anniversary's lookup fields, its next date fields and the
+    packed death date.
+
+    """
+
+    death_date_h = formatting.parse_parts(death_date_hebrew)
+    next_date_h = formatting.parse_parts(next_date_hebrew)
+    month, day = get_anniversary(death_date_h, next_date_h, after_sunset)
+
+    next_dates = {
+        'next_date_hebrew': formatting.pack_hebrew(*next_date_h),
+        'next_date_gregorian': formatting.parse_date(next_date_gregorian),
+    }
+
+    return (
+        {'month': month, 'day': day},
+        next_dates,
+        formatting.pack_hebrew(*death_date_h),
+    )
+
+
 def create_decedent(user: CustomUser, name: str, death_date_hebrew: str,
-                    next_date_hebrew: str, next_date_gregorian: str) -> None:
-    """Instantiate a Decedent with given attributes and save to database."""
+                    next_date_hebrew: str, next_date_gregorian: str,
+                    after_sunset: bool = False) -> None:
+    """Instantiate a Decedent with given attributes and save to database.
+
+    Dates are given as YYYY-MM-DD strings, with the death date as calculated
+    from the Gregorian date, before any shift for a death after sunset. The
+    Decedent is linked to the Anniversary for its yahrzeit, which is created
+    with the given next dates if it doesn't exist yet.
+
+    """
+
+    anniversary_key, next_dates, packed_death_date = _decedent_fields(
+        death_date_hebrew,
+        next_date_hebrew,
+        next_date_gregorian,
+        after_sunset,
+    )
+    anniversary, created = Anniversary.objects.get_or_create(
+        **anniversary_key,
+        defaults=next_dates,
+    )
+
+    caught_up = False
+
+    if not created:
+        # The given dates are fresh, so catch up a stale anniversary.
+        caught_up = Anniversary.objects.filter(
+            pk=anniversary.pk,
+            next_date_gregorian__lt=next_dates['next_date_gregorian'],
+        ).update(**next_dates)
 
     new_decedent = Decedent(
         user=user,
         name=name,
-        death_date_hebrew=death_date_hebrew,
-        next_date_hebrew=next_date_hebrew,
-        next_date_gregorian=next_date_gregorian,
+        death_date_hebrew=packed_death_date,
+        anniversary=anniversary,
     )
     new_decedent.save()
 
+    if caught_up:
+        # Everyone who shares the anniversary sees its new dates.
+        bump_decedents_version(users_with_anniversaries([anniversary.pk]))
+
+    else:
+        bump_decedents_version(CustomUser.objects.filter(pk=user.pk))
+
+
+async def acreate_decedent(user: CustomUser, name: str,
+                           death_date_hebrew: str, next_date_hebrew: str,
+                           next_date_gregorian: str,
+                           after_sunset: bool = False) -> None:
+    """Async version of create_decedent, using the async ORM."""
+
+    anniversary_key, next_dates, packed_death_date = _decedent_fields(
+        death_date_hebrew,
+        next_date_hebrew,
+        next_date_gregorian,
+        after_sunset,
+    )
+    anniversary, created = await Anniversary.objects.aget_or_create(
+        **anniversary_key,
+        defaults=next_dates,
+    )
+
+    caught_up = False
 
-def get_decedents_for_user(user: CustomUser) -> QuerySet:
-    """Retrieve a list of Decedents for given user."""
+    if not created:
+        caught_up = await Anniversary.objects.filter(
+            pk=anniversary.pk,
+            next_date_gregorian__lt=next_dates['next_date_gregorian'],
+        ).aupdate(**next_dates)
 
-    decedents = Decedent.objects.filter(
+    await Decedent.objects.acreate(
         user=user,
+        name=name,
+        death_date_hebrew=packed_death_date,
+        anniversary=anniversary,
     )
-    decedents = {
-        decedent.name: ' / '.join([
-            h_date_db_to_res(decedent.next_date_hebrew),
-            g_date_db_to_res(decedent.next_date_gregorian),
-        ])
-        for decedent in decedents
-    }
 
-    return decedents
+    if caught_up:
+        users = users_with_anniversaries([anniversary.pk])
 
+    else:
+        users = CustomUser.objects.filter(pk=user.pk)
 
-def update_decedents_for_user(user: CustomUser) -> None:
-    """Update related decedent records for a user."""
+    await users.aupdate(**_version_bump())
+
+
+class DecedentRow(NamedTuple):
+    """A Decedent with its next yahrzeit, as shown on the dashboard."""
+
+    pk: int
+    name: str
+    next_date_hebrew: int
+    next_date_gregorian: date
+
+    @property
+    def next_date_h_res(self) -> str:
+        """Next Hebrew date formatted for result."""
+
+        return formatting.hebrew_packed_to_res(self.next_date_hebrew)
+
+    @property
+    def next_date_g_res(self) -> str:
+        """Next Gregorian date formatted for result."""
+
+        return formatting.gregorian_date_to_res(self.next_date_gregorian)
+
+    @property
+    def cursor(self) -> str:
+        """Keyset cursor for the page that starts after this row."""
+
+        return f'{self.next_date_gregorian.isoformat()}.{self.pk}'
+
+    def to_json(self) -> dict:
+        """Return the row in storage and result formats for JSON."""
+
+        return {
+            'id': self.pk,
+            'name': self.name,
+            'next_date_h': formatting.db(
+                *formatting.unpack_hebrew(self.next_date_hebrew),
+            ),
+            'next_date_g': self.next_date_gregorian.isoformat(),
+            'next_date_h_res': self.next_date_h_res,
+            'next_date_g_res': self.next_date_g_res,
+        }
+
+
+def parse_cursor(cursor: str) -> Tuple[date, int]:
+    """Split a keyset cursor into (next_date_gregorian, pk).
+
+    Raises ValueError if the cursor is malformed.
+
+    """
+
+    date_string, _, pk = cursor.partition('.')
+
+    return (formatting.parse_date(date_string), int(pk))
+
+
+def get_decedents_page(
+    user: CustomUser,
+    after: Optional[str] = None,
+    limit: int = DECEDENTS_PAGE_SIZE,
+) -> Tuple[List[DecedentRow], Optional[str]]:
+    """Retrieve a page of Decedents for given user.
+
+    Decedents are ordered by next yahrzeit, with ties broken by pk, and the
+    page starts after the row that the cursor given as after points to. Only
+    the columns shown on the dashboard are fetched. Return the page's rows
+    and the cursor for the next page, or None if this is the last page.
 
-    needs_update = Decedent.objects.filter(
-        user=user.pk,
-        next_date_gregorian__lt=today_date_string(),
+    Raises ValueError if after is malformed.
+
+    """
+
+    decedents = Decedent.objects.filter(user=user)
+
+    if after:
+        next_date_gregorian, pk = parse_cursor(after)
+        decedents = decedents.filter(
+            Q(anniversary__next_date_gregorian__gt=next_date_gregorian)
+            | Q(
+                anniversary__next_date_gregorian=next_date_gregorian,
+                pk__gt=pk,
+            ),
+        )
+
+    rows = [
+        DecedentRow(*row)
+        for row in decedents.order_by(
+            'anniversary__next_date_gregorian',
+            'pk',
+        ).values_list(
+            'pk',
+            'name',
+            'anniversary__next_date_hebrew',
+            'anniversary__next_date_gregorian',
+        )[:limit + 1]
+    ]
+
+    if len(rows) > limit:
+        return (rows[:limit], rows[limit - 1].cursor)
+
+    return (rows, None)
+
+
+def rollover_anniversaries(anniversaries: QuerySet, today: date) -> int:
+    """Move stale anniversaries in a queryset to their next yahrzeit.
+
+    Bumps the decedents version of every user with a decedent on an updated
+    anniversary. Returns the number of anniversaries updated. Anniversaries
+    that have no date in the year they would move to, like 30 Cheshvan when
+    Cheshvan has 29 days, are logged and left as they are.
+
+    """
+
+    updated = []
+
+    for anniversary in anniversaries.filter(next_date_gregorian__lt=today):
+        try:
+            next_date_h, next_date_g, _ = get_next_date_for_anniversary(
+                anniversary.month,
+                anniversary.day,
+                today,
+            )
+
+        except ValueError as e:
+            logger.warning(
+                'Could not roll over anniversary %s (%s/%s): %s',
+                anniversary.pk,
+                anniversary.month,
+                anniversary.day,
+                e,
+            )
+            continue
+
+        anniversary.next_date_hebrew = formatting.pack_hebrew(*next_date_h)
+        anniversary.next_date_gregorian = next_date_g.to_pydate()
+        updated.append(anniversary)
+
+    Anniversary.objects.bulk_update(
+        updated,
+        ['next_date_hebrew', 'next_date_gregorian'],
     )
 
-    for decedent in needs_update:
-        next_date_data = get_next_date(decedent.next_date_gregorian)
-        decedent.next_date_hebrew = next_date_data[0]
-        decedent.next_date_gregorian = next_date_data[1]
-        decedent.save()
+    if updated:
+        bump_decedents_version(users_with_anniversaries(updated))
+
+    return len(updated)
+
+
+def update_decedents_for_user(user: CustomUser) -> None:
+    """Update related decedent records for a user.
+
+    Decedents share their next dates through Anniversary, so this rolls over
+    the user's stale anniversaries (for every user who shares them).
+
+    """
+
+    with transaction.atomic():
+        rollover_anniversaries(
+            Anniversary.objects.filter(
+                pk__in=Decedent.objects.filter(user=user.pk).values(
+                    'anniversary',
+                ),
+            ).select_for_update(),
+            today_date(),
+        )
@@ -0,0 +1,143 @@
+"""Date parsing and formatting for Yahrzeit app.
+
+Dates are exchanged as YYYY-MM-DD strings, Hebrew dates are stored in the
+database packed into integers (year * 10000 + month * 100 + day), dates are
+displayed as e.g. '18 Adar 5783' or '11 March 2023' and times as '7:15 PM'.
+Parsing slices the string into integers instead of going through strptime,
+month names come from precomputed tables, and display strings for stored
+dates are cached.
+
+"""
+
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Tuple
+from yahrzeit_app import hebrew_calendar
+
+# Indexed by month number; month 1 is Nisan, as in pyluach.
+HEBREW_MONTHS = (
+    '', 'Nissan', 'Iyar', 'Sivan', 'Tammuz', 'Av', 'Elul', 'Tishrei',
+    'Cheshvan', 'Kislev', 'Teves', 'Shevat', 'Adar', 'Adar',
+)
+HEBREW_MONTHS_LEAP = HEBREW_MONTHS[:12] + ('Adar 1', 'Adar 2')
+
+GREGORIAN_MONTHS = (
+    '', 'January', 'February', 'March', 'April', 'May', 'June', 'July',
+    'August', 'September', 'October', 'November', 'December',
+)
+
+DISPLAY_CACHE_SIZE = 4096
+
+
+def parse_parts(date_string: str) -> Tuple[int, int, int]:
+    """Split a YYYY-MM-DD string into (year, month, day) integers."""
+
+    if (
+        len(date_string) == 10
+        and date_string[4] == '-'
+        and date_string[7] == '-'
+    ):
+        return (
+            int(date_string[:4]),
+            int(date_string[5:7]),
+            int(date_string[8:]),
+        )
+
+    parts = date_string.split('-')
+
+    if len(parts) != 3:
+        raise ValueError(f'{date_string!r} is not a YYYY-MM-DD date.')
+
+    return (int(parts[0]), int(parts[1]), int(parts[2]))
+
+
+def parse_date(date_string: str) -> date:
+    """Parse a date object from a YYYY-MM-DD string."""
+
+    return date(*parse_parts(date_string))
+
+
+def db(year: int, month: int, day: int) -> str:
+    """Format a Hebrew or Gregorian date as a string for storage."""
+
+    return f'{year}-{month:02d}-{day:02d}'
+
+
+def pack_hebrew(year: int, month: int, day: int) -> int:
+    """Pack a Hebrew date into an integer for storage."""
+
+    return year * 10000 + month * 100 + day
+
+
+def pack_hebrew_string(h_date_str: str) -> int:
+    """Pack a YYYY-MM-DD Hebrew date string into an integer for storage."""
+
+    return pack_hebrew(*parse_parts(h_date_str))
+
+
+def unpack_hebrew(packed: int) -> Tuple[int, int, int]:
+    """Unpack an integer Hebrew date into (year, month, day)."""
+
+    return (packed // 10000, packed // 100 % 100, packed % 100)
+
+
+def hebrew_res(year: int, month: int, day: int) -> str:
+    """Format a Hebrew date as a string for display."""
+
+    if hebrew_calendar.is_leap(year):
+        return f'{day} {HEBREW_MONTHS_LEAP[month]} {year}'
+
+    return f'{day} {HEBREW_MONTHS[month]} {year}'
+
+
+def gregorian_res(year: int, month: int, day: int) -> str:
+    """Format a Gregorian date as a string for display."""
+
+    return f'{day} {GREGORIAN_MONTHS[month]} {year}'
+
+
+@lru_cache(maxsize=DISPLAY_CACHE_SIZE)
+def hebrew_db_to_res(h_date_str: str) -> str:
+    """Format a stored Hebrew date string for display.
+
+    Raises ValueError if the date doesn't exist.
+
+    """
+
+    year, month, day = parse_parts(h_date_str)
+    hebrew_calendar.hebrew_to_ordinal(year, month, day)
+
+    return hebrew_res(year, month, day)
+
+
+@lru_cache(maxsize=DISPLAY_CACHE_SIZE)
+def gregorian_db_to_res(g_date_str: str) -> str:
+    """Format a stored Gregorian date string for display.
+
+    Raises ValueError if the date doesn't exist.
+
+    """
+
+    g_date = parse_date(g_date_str)
+
+    return gregorian_res(g_date.year, g_date.month, g_date.day)
+
+
+@lru_cache(maxsize=DISPLAY_CACHE_SIZE)
+def hebrew_packed_to_res(packed: int) -> str:
+    """Format a packed Hebrew date for display."""
+
+    return hebrew_res(*unpack_hebrew(packed))
+
+
+@lru_cache(maxsize=DISPLAY_CACHE_SIZE)
+def gregorian_date_to_res(g_date: date) -> str:
+    """Format a Gregorian date object for display."""
+
+    return gregorian_res(g_date.year, g_date.month, g_date.day)
+
+
+def time_res(time: datetime) -> str:
+    """Format a time, like a sunset, for display."""
+
+    return time.strftime('%-I:%M %p')
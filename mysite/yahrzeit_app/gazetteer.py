@@ -0,0 +1,187 @@
+"""Offline gazetteer for Yahrzeit app.
+
+Resolves place names without a network, for the local geocoder backend and
+for location autocomplete. Places are loaded once per process, from the
+cities bundled with astral or from the CSV file named by the
+GAZETTEER_FILE setting, with name, region, timezone, latitude and
+longitude columns.
+
+Every place is indexed under its name and under its name and region. The
+index is a sorted list of normalized keys and a parallel array of place
+numbers, so a prefix search is a binary search for the first key followed
+by a scan over the keys that share the prefix.
+
+"""
+
+from array import array
+from bisect import bisect_left
+import csv
+from threading import Lock
+from typing import Iterable, Iterator, List, Union
+from astral import LocationInfo
+from django.conf import settings
+
+SEARCH_LIMIT = 10
+
+_gazetteer = None
+_gazetteer_lock = Lock()
+
+
+def normalize(text: str) -> str:
+    """Normalize a place name for the index, ignoring commas and case."""
+
+    return ' '.join(text.replace(',', ' ').split()).casefold()
+
+
+class Gazetteer:
+    """Prefix index of places."""
+
+    def __init__(self, locations: Iterable[LocationInfo]):
+        self.locations = []
+        entries = set()
+
+        for location in locations:
+            number = len(self.locations)
+            self.locations.append(location)
+            entries.add((normalize(location.name), number))
+            entries.add(
+                (normalize(f'{location.name} {location.region}'), number),
+            )
+
+        entries = sorted(entries)
+        self.keys = [key for key, _ in entries]
+        self.numbers = array('I', (number for _, number in entries))
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def _scan(self, prefix: str) -> Iterator[int]:
+        """Yield the place numbers of keys starting with a normalized prefix,
+        in key order.
+
+        """
+
+        for i in range(bisect_left(self.keys, prefix), len(self.keys)):
+            if not self.keys[i].startswith(prefix):
+                return
+
+            yield self.numbers[i]
+
+    def search(
+        self,
+        query: str,
+        limit: int = SEARCH_LIMIT,
+    ) -> List[LocationInfo]:
+        """Return up to limit places whose name starts with query.
+
+        Places are in order of name, each at most once. An empty query
+        matches nothing.
+
+        """
+
+        prefix = normalize(query)
+        results = []
+        seen = set()
+
+        if not prefix:
+            return results
+
+        for number in self._scan(prefix):
+            if number in seen:
+                continue
+
+            seen.add(number)
+            results.append(self.locations[number])
+
+            if len(results) >= limit:
+                break
+
+        return results
+
+    def resolve(self, location_string: str) -> Union[LocationInfo, None]:
+        """Return the place named by location_string, or None.
+
+        Matches a name, or a name and region, exactly (ignoring commas and
+        case). If several places have the name, the first one loaded wins.
+
+        """
+
+        key = normalize(location_string)
+        i = bisect_left(self.keys, key)
+
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.locations[self.numbers[i]]
+
+
+def bundled_locations() -> Iterator[LocationInfo]:
+    """Yield the cities bundled with astral."""
+
+    from astral import geocoder
+
+    for group in geocoder.database().values():
+        for locations in group.values():
+            yield from locations
+
+
+def read_locations(path: str) -> Iterator[LocationInfo]:
+    """Yield the places in a gazetteer CSV file."""
+
+    with open(path, newline='', encoding='utf-8') as csv_file:
+        for row in csv.DictReader(csv_file):
+            yield LocationInfo(
+                row['name'],
+                row['region'],
+                row['timezone'],
+                float(row['latitude']),
+                float(row['longitude']),
+            )
+
+
+def get_gazetteer() -> Gazetteer:
+    """Return the process-wide gazetteer, loading it on first use."""
+
+    global _gazetteer
+
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                path = settings.GAZETTEER_FILE
+                _gazetteer = Gazetteer(
+                    read_locations(path) if path else bundled_locations(),
+                )
+
+    return _gazetteer
+
+
+def search(query: str, limit: int = SEARCH_LIMIT) -> List[LocationInfo]:
+    """Return up to limit places whose name starts with query."""
+
+    return get_gazetteer().search(query, limit)
+
+
+def geocode(location_string: str) -> list:
+    """Geocode a place name offline.
+
+    Returns a list shaped like the start of a Google Maps geocoding
+    response, so it can stand in for helpers.geocode_address: empty if the
+    place isn't in the gazetteer.
+
+    """
+
+    location = get_gazetteer().resolve(location_string)
+
+    if location is None:
+        return []
+
+    return [{
+        'geometry': {
+            'location': {
+                'lat': location.latitude,
+                'lng': location.longitude,
+            },
+        },
+        'address_components': [
+            {'long_name': location.name},
+            {'long_name': location.region},
+        ],
+    }]
@@ -0,0 +1,251 @@
+"""Cached location lookups for Yahrzeit app.
+
+Looking up a location string takes a geocoding and a timezone request to
+Google Maps, and users look up the same few places over and over. Results
+are stored in the GeocodedLocation table, keyed by the normalized location
+string, for CACHE_TTL, and the most recently used ones are also kept in
+process so that repeat lookups don't touch the database either.
+
+Every lookup counts as a hit on its location, wherever it is served from.
+Hits are counted in process and added to the table in batches, every
+HITS_FLUSH_SIZE lookups or HITS_FLUSH_INTERVAL seconds, whichever comes
+first.
+
+"""
+
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from threading import Lock
+import time
+from typing import Iterable, Union
+from astral import LocationInfo
+from django.db.models import F
+from django.utils import timezone
+from yahrzeit_app import helpers, maps
+from yahrzeit_app.models import GeocodedLocation
+
+CACHE_TTL = timedelta(days=30)
+LRU_SIZE = 256
+HITS_FLUSH_SIZE = 100
+HITS_FLUSH_INTERVAL = 60
+
+# Normalized location string -> (LocationInfo, expiry), least recently used
+# first.
+_lru = OrderedDict()
+_lru_lock = Lock()
+
+# Normalized location string -> hits not yet added to the table.
+_pending_hits = Counter()
+_pending_total = 0
+_pending_since = None
+_hits_lock = Lock()
+
+
+def normalize_location(location_string: str) -> str:
+    """Normalize a location string for use as a cache key."""
+
+    return ' '.join(location_string.split()).casefold()
+
+
+def clear_lru() -> None:
+    """Empty the in-process cache."""
+
+    with _lru_lock:
+        _lru.clear()
+
+
+def _lru_get(key: str, now: datetime) -> Union[LocationInfo, None]:
+    """Return a fresh location from the in-process cache, if there is one."""
+
+    with _lru_lock:
+        entry = _lru.get(key)
+
+        if entry is None:
+            return
+
+        location, expires = entry
+
+        if expires <= now:
+            del _lru[key]
+            return
+
+        _lru.move_to_end(key)
+
+        return location
+
+
+def _lru_put(key: str, location: LocationInfo, expires: datetime) -> None:
+    """Add a location to the in-process cache, evicting the oldest entry."""
+
+    with _lru_lock:
+        _lru[key] = (location, expires)
+        _lru.move_to_end(key)
+
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _count_hit(key: str) -> None:
+    """Count a lookup of a location, flushing the counts when due."""
+
+    global _pending_total, _pending_since
+
+    with _hits_lock:
+        _pending_hits[key] += 1
+        _pending_total += 1
+
+        if _pending_since is None:
+            _pending_since = time.monotonic()
+
+        due = (
+            _pending_total >= HITS_FLUSH_SIZE
+            or time.monotonic() - _pending_since >= HITS_FLUSH_INTERVAL
+        )
+
+    if due:
+        flush_hits()
+
+
+def flush_hits() -> None:
+    """Add the hits counted in process to the table.
+
+    Locations with the same number of hits are updated together, so a
+    flush takes one query per distinct count.
+
+    """
+
+    global _pending_total, _pending_since
+
+    with _hits_lock:
+        pending = dict(_pending_hits)
+        _pending_hits.clear()
+        _pending_total = 0
+        _pending_since = None
+
+    keys_by_count = defaultdict(list)
+    for key, count in pending.items():
+        keys_by_count[count].append(key)
+
+    for count, keys in keys_by_count.items():
+        GeocodedLocation.objects.filter(key__in=keys).update(
+            hits=F('hits') + count,
+        )
+
+
+def _to_location_info(entry: GeocodedLocation) -> LocationInfo:
+    """Build a LocationInfo from a GeocodedLocation."""
+
+    return LocationInfo(
+        entry.name,
+        entry.region,
+        entry.timezone,
+        entry.latitude,
+        entry.longitude,
+    )
+
+
+def fetch_location(location_string: str) -> Union[LocationInfo, None]:
+    """Look up a location remotely and store it in both caches.
+
+    Return None if the location can't be found. Locations that can't be
+    found aren't cached. Raises maps.MapsUnavailableError if Google Maps is
+    unavailable.
+
+    """
+
+    key = normalize_location(location_string)
+    location = helpers.fetch_location(location_string)
+
+    if location is None:
+        return
+
+    now = timezone.now()
+
+    if len(key) <= GeocodedLocation._meta.get_field('key').max_length:
+        GeocodedLocation.objects.update_or_create(
+            key=key,
+            defaults={
+                'name': location.name,
+                'region': location.region,
+                'timezone': location.timezone,
+                'latitude': location.latitude,
+                'longitude': location.longitude,
+                'fetched_at': now,
+            },
+        )
+
+    _lru_put(key, location, now + CACHE_TTL)
+
+    return location
+
+
+def lookup_location(location_string: str) -> Union[LocationInfo, None]:
+    """Return the LocationInfo for a location string.
+
+    Check the in-process cache, then the database, and only look the
+    location up remotely if neither has a fresh entry. If Google Maps is
+    unavailable, an expired entry is returned instead. Return None if the
+    location can't be found.
+
+    Raises maps.MapsUnavailableError if Google Maps is unavailable and the
+    location has never been looked up.
+
+    """
+
+    key = normalize_location(location_string)
+    now = timezone.now()
+
+    location = _lru_get(key, now)
+    if location is not None:
+        _count_hit(key)
+        return location
+
+    entry = GeocodedLocation.objects.filter(key=key).first()
+
+    if entry is None or entry.fetched_at <= now - CACHE_TTL:
+        try:
+            location = fetch_location(location_string)
+
+        except maps.MapsUnavailableError:
+            if entry is None:
+                raise
+
+            # Serve the expired entry until Google Maps is back.
+            _count_hit(key)
+
+            return _to_location_info(entry)
+
+        if location is not None:
+            _count_hit(key)
+
+        return location
+
+    _count_hit(key)
+    location = _to_location_info(entry)
+    _lru_put(key, location, entry.fetched_at + CACHE_TTL)
+
+    return location
+
+
+def evict_expired_locations() -> int:
+    """Delete expired locations from the database and return how many."""
+
+    deleted, _ = GeocodedLocation.objects.filter(
+        fetched_at__lte=timezone.now() - CACHE_TTL,
+    ).delete()
+
+    return deleted
+
+
+def warm_locations(location_strings: Iterable[str]) -> int:
+    """Look up locations remotely to refresh their cache entries.
+
+    Return the number of locations that were found. Raises
+    maps.MapsUnavailableError if Google Maps is unavailable.
+
+    """
+
+    return sum(
+        fetch_location(location_string) is not None
+        for location_string in location_strings
+    )
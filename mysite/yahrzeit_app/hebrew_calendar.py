@@ -0,0 +1,373 @@
+"""Table-driven Hebrew calendar engine for Yahrzeit app.
+
+Days are counted as proleptic Gregorian ordinals (``date.toordinal()``), so
+Gregorian conversions are free and Hebrew conversions only need the start
+day of each Hebrew year. Those are precomputed, along with year length, leap
+status and month offsets, for every year from ``FIRST_YEAR`` to
+``LAST_YEAR``. Years outside of that range are computed on demand.
+
+The same tables are also kept as NumPy arrays for converting whole arrays
+of dates at once. The array functions only cover the table range. NumPy
+and the arrays are loaded when an array function is first called, so that
+processes which only convert single dates don't import it.
+
+"""
+
+from bisect import bisect_right
+from datetime import date
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, NamedTuple, Tuple
+from pyluach import dates
+
+if TYPE_CHECKING:
+    import numpy as np
+
+FIRST_YEAR = 5600
+LAST_YEAR = 6200
+
+# Ordinal of the day before 1 Tishrei AM 1 (the elapsed-days epoch).
+HEBREW_EPOCH = -1373428
+
+# Offset from an ordinal to the Julian day number (at midnight) used by
+# pyluach date objects.
+JD_OFFSET = 1721424.5
+
+# Ordinal of 1970-01-01, the epoch of NumPy's datetime64.
+UNIX_EPOCH = 719163
+
+# Months in calendar order, starting from Tishrei (Nisan is month 1).
+MONTHS_LEAP = (7, 8, 9, 10, 11, 12, 13, 1, 2, 3, 4, 5, 6)
+MONTHS_COMMON = (7, 8, 9, 10, 11, 12, 1, 2, 3, 4, 5, 6)
+
+
+class YearInfo(NamedTuple):
+    """Precomputed data for one Hebrew year."""
+
+    start: int
+    length: int
+    leap: bool
+    months: Tuple[int, ...]
+    month_starts: Tuple[int, ...]
+    month_offsets: Tuple[int, ...]
+    month_lengths: Tuple[int, ...]
+
+
+def _is_leap(year: int) -> bool:
+    """Return whether a Hebrew year has a second Adar."""
+
+    return (7 * year + 1) % 19 < 7
+
+
+def _elapsed_days(year: int) -> int:
+    """Return days from the epoch to 1 Tishrei of a Hebrew year.
+
+    Applies the molad calculation and the four postponement rules.
+
+    """
+
+    months_elapsed = (235 * year - 234) // 19
+    parts_elapsed = 204 + 793 * (months_elapsed % 1080)
+    hours_elapsed = (
+        5 + 12 * months_elapsed + 793 * (months_elapsed // 1080)
+        + parts_elapsed // 1080
+    )
+    day = 1 + 29 * months_elapsed + hours_elapsed // 24
+    parts = 1080 * (hours_elapsed % 24) + parts_elapsed % 1080
+
+    if (
+        parts >= 19440
+        or (day % 7 == 2 and parts >= 9924 and not _is_leap(year))
+        or (day % 7 == 1 and parts >= 16789 and _is_leap(year - 1))
+    ):
+        day += 1
+
+    if day % 7 in (0, 3, 5):
+        day += 1
+
+    return day
+
+
+def _build_year(year: int) -> YearInfo:
+    """Compute the table entry for a Hebrew year."""
+
+    start = HEBREW_EPOCH + _elapsed_days(year)
+    length = HEBREW_EPOCH + _elapsed_days(year + 1) - start
+    leap = _is_leap(year)
+    months = MONTHS_LEAP if leap else MONTHS_COMMON
+
+    lengths = [0, 30, 29, 30, 29, 30, 29, 30, 29, 30, 29, 30, 29, 29]
+    if leap:
+        lengths[12] = 30
+    if length % 10 == 5:
+        lengths[8] = 30
+    if length % 10 == 3:
+        lengths[9] = 29
+
+    offsets = [0] * 14
+    month_starts = []
+    elapsed = 0
+    for month in months:
+        offsets[month] = elapsed
+        month_starts.append(elapsed)
+        elapsed += lengths[month]
+
+    if not leap:
+        lengths[13] = 0
+
+    return YearInfo(
+        start,
+        length,
+        leap,
+        months,
+        tuple(month_starts),
+        tuple(offsets),
+        tuple(lengths),
+    )
+
+
+_YEARS: List[YearInfo] = [
+    _build_year(year) for year in range(FIRST_YEAR, LAST_YEAR + 1)
+]
+_YEAR_STARTS: List[int] = [info.start for info in _YEARS]
+_RANGE_END = _build_year(LAST_YEAR + 1).start
+
+
+class _Arrays(NamedTuple):
+    """The year tables as NumPy arrays, indexed by year - FIRST_YEAR."""
+
+    starts: 'np.ndarray'
+    leap: 'np.ndarray'
+    offsets: 'np.ndarray'
+    lengths: 'np.ndarray'
+    month_starts: 'np.ndarray'
+    months: 'np.ndarray'
+
+
+@lru_cache(maxsize=None)
+def _arrays() -> _Arrays:
+    """Return the year tables as NumPy arrays, building them on first use."""
+
+    import numpy as np
+
+    return _Arrays(
+        starts=np.array(_YEAR_STARTS, dtype=np.int64),
+        leap=np.array([info.leap for info in _YEARS], dtype=bool),
+        offsets=np.array(
+            [info.month_offsets for info in _YEARS],
+            dtype=np.int64,
+        ),
+        lengths=np.array(
+            [info.month_lengths for info in _YEARS],
+            dtype=np.int64,
+        ),
+        # Common years are padded with a start no day of the year can reach.
+        month_starts=np.array(
+            [
+                info.month_starts + (400,) * (13 - len(info.months))
+                for info in _YEARS
+            ],
+            dtype=np.int64,
+        ),
+        months=np.array(
+            [info.months + (0,) * (13 - len(info.months)) for info in _YEARS],
+            dtype=np.int64,
+        ),
+    )
+
+
+def year_info(year: int) -> YearInfo:
+    """Return the table entry for a Hebrew year."""
+
+    if FIRST_YEAR <= year <= LAST_YEAR:
+        return _YEARS[year - FIRST_YEAR]
+
+    if year < 1:
+        raise ValueError('Year must be >= 1.')
+
+    return _build_year(year)
+
+
+def is_leap(year: int) -> bool:
+    """Return whether a Hebrew year is a leap year."""
+
+    return _is_leap(year)
+
+
+def month_length(year: int, month: int) -> int:
+    """Return the number of days in a Hebrew month."""
+
+    if month < 1 or month > 13:
+        raise ValueError(f'{month} is an invalid month.')
+
+    return year_info(year).month_lengths[month]
+
+
+def hebrew_to_ordinal(year: int, month: int, day: int) -> int:
+    """Return the ordinal for a Hebrew date.
+
+    Raises ValueError for dates that don't exist, like pyluach's HebrewDate.
+
+    """
+
+    info = year_info(year)
+
+    if month < 1 or month > 13:
+        raise ValueError(f'{month} is an invalid month.')
+    if month == 13 and not info.leap:
+        raise ValueError(f'{year} is not a leap year')
+
+    length = info.month_lengths[month]
+    if day < 1 or day > length:
+        raise ValueError(f'Given month has {length} days.')
+
+    return info.start + info.month_offsets[month] + day - 1
+
+
+def ordinal_to_hebrew(ordinal: int) -> Tuple[int, int, int]:
+    """Return the Hebrew (year, month, day) for an ordinal."""
+
+    if _YEAR_STARTS[0] <= ordinal < _RANGE_END:
+        index = bisect_right(_YEAR_STARTS, ordinal) - 1
+        year = FIRST_YEAR + index
+        info = _YEARS[index]
+
+    else:
+        year = (ordinal - HEBREW_EPOCH) * 19 // 6940 + 1
+        info = year_info(year)
+        while info.start > ordinal:
+            year -= 1
+            info = year_info(year)
+        while info.start + info.length <= ordinal:
+            year += 1
+            info = year_info(year)
+
+    day_of_year = ordinal - info.start
+    index = bisect_right(info.month_starts, day_of_year) - 1
+
+    return (
+        year,
+        info.months[index],
+        day_of_year - info.month_starts[index] + 1,
+    )
+
+
+def hebrew_date(year: int, month: int, day: int) -> dates.HebrewDate:
+    """Return a pyluach HebrewDate with its Julian day already resolved."""
+
+    ordinal = hebrew_to_ordinal(year, month, day)
+
+    return dates.HebrewDate(year, month, day, ordinal + JD_OFFSET)
+
+
+def hebrew_from_ordinal(ordinal: int) -> dates.HebrewDate:
+    """Return a pyluach HebrewDate for an ordinal."""
+
+    year, month, day = ordinal_to_hebrew(ordinal)
+
+    return dates.HebrewDate(year, month, day, ordinal + JD_OFFSET)
+
+
+def gregorian_from_ordinal(ordinal: int) -> dates.GregorianDate:
+    """Return a pyluach GregorianDate for an ordinal."""
+
+    pydate = date.fromordinal(ordinal)
+
+    return dates.GregorianDate(
+        pydate.year,
+        pydate.month,
+        pydate.day,
+        ordinal + JD_OFFSET,
+    )
+
+
+def hebrew_from_pydate(pydate: date) -> dates.HebrewDate:
+    """Return a pyluach HebrewDate for a Python date."""
+
+    return hebrew_from_ordinal(pydate.toordinal())
+
+
+def _year_indexes(years: 'np.ndarray') -> 'np.ndarray':
+    """Return table indexes for an array of Hebrew years."""
+
+    indexes = years - FIRST_YEAR
+
+    if indexes.size and (indexes.min() < 0 or indexes.max() >= len(_YEARS)):
+        raise ValueError(
+            f'Years must be between {FIRST_YEAR} and {LAST_YEAR}.'
+        )
+
+    return indexes
+
+
+def leap_years(years: 'np.ndarray') -> 'np.ndarray':
+    """Return a boolean array of which Hebrew years are leap years."""
+
+    import numpy as np
+
+    return _arrays().leap[
+        _year_indexes(np.asarray(years, dtype=np.int64))
+    ]
+
+
+def ordinals_to_hebrew(
+    ordinals: 'np.ndarray',
+) -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+    """Return arrays of Hebrew years, months and days for ordinals."""
+
+    import numpy as np
+
+    arrays = _arrays()
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+
+    if ordinals.size and (
+        ordinals.min() < _YEAR_STARTS[0] or ordinals.max() >= _RANGE_END
+    ):
+        raise ValueError(
+            f'Dates must fall between {FIRST_YEAR} and {LAST_YEAR}.'
+        )
+
+    indexes = np.searchsorted(arrays.starts, ordinals, side='right') - 1
+    day_of_year = ordinals - arrays.starts[indexes]
+
+    month_starts = arrays.month_starts[indexes]
+    month_indexes = (month_starts <= day_of_year[:, np.newaxis]).sum(1) - 1
+    rows = np.arange(len(ordinals))
+
+    return (
+        indexes + FIRST_YEAR,
+        arrays.months[indexes, month_indexes],
+        day_of_year - month_starts[rows, month_indexes] + 1,
+    )
+
+
+def hebrew_to_ordinals(
+    years: 'np.ndarray',
+    months: 'np.ndarray',
+    days: 'np.ndarray',
+) -> 'np.ndarray':
+    """Return an array of ordinals for arrays of Hebrew dates.
+
+    Raises ValueError if any of the dates don't exist.
+
+    """
+
+    import numpy as np
+
+    arrays = _arrays()
+
+    years, months, days = np.broadcast_arrays(
+        np.asarray(years, dtype=np.int64),
+        np.asarray(months, dtype=np.int64),
+        np.asarray(days, dtype=np.int64),
+    )
+    indexes = _year_indexes(years)
+
+    if months.size and (months.min() < 1 or months.max() > 13):
+        raise ValueError('Months must be between 1 and 13.')
+
+    if np.any((days < 1) | (days > arrays.lengths[indexes, months])):
+        raise ValueError('Some of the given dates do not exist.')
+
+    return (
+        arrays.starts[indexes] + arrays.offsets[indexes, months] + days - 1
+    )
@@ -1,36 +1,56 @@
 """Helper module for Yahrzeit app."""
 
-from datetime import datetime, date
-import os
-from typing import Tuple, Dict, Union
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+from itertools import count, islice
+from typing import (
+    TYPE_CHECKING,
+    Tuple,
+    Union,
+    Sequence,
+    NamedTuple,
+    Iterator,
+    List,
+)
 from astral import LocationInfo, sun
-from pyluach import dates, hebrewcal
-import googlemaps
-
-gmaps_key = os.environ['GMAPS_KEY']
-js_key = os.environ['JS_KEY']
+from django.conf import settings
+from pyluach import dates
+from yahrzeit_app import (
+    formatting,
+    gazetteer,
+    hebrew_calendar,
+    maps,
+    solar,
+    timezones,
+)
+
+# NumPy is only needed by the batch functions, so it is imported by them.
+if TYPE_CHECKING:
+    import numpy as np
+
+# Day (as an ordinal) that the next-date cache was last used for. The cache
+# is cleared when the clock moves past it.
+_next_date_cache_day = None
 
 
 def date_from_string(date_string: str) -> datetime.date:
     """Parse a date object from a string."""
 
-    return datetime.strptime(date_string, '%Y-%m-%d').date()
+    return formatting.parse_date(date_string)
 
 
 def greg_to_heb(greg_str: str) -> str:
     """Convert gregorian date string to hebrew date string."""
 
-    return h_date_stringify_db(
-        dates.HebrewDate.from_pydate(
-            date_from_string(greg_str),
-        )
-    )
+    return formatting.db(*hebrew_calendar.ordinal_to_hebrew(
+        date_from_string(greg_str).toordinal(),
+    ))
 
 
 def adjust_adar_leap(month: int, year: int) -> int:
     """Return yahrzeit month adjusted for future year's leap status."""
 
-    if (month == 13 and not hebrewcal.Year(year).leap):
+    if (month == 13 and not hebrew_calendar.is_leap(year)):
         return 12
 
     return month
@@ -39,143 +59,477 @@ def adjust_adar_leap(month: int, year: int) -> int:
 def today_date_string() -> str:
     """Return string of today's date."""
 
-    return date.strftime(date.today(), '%Y-%m-%d')
+    return date.strftime(today_date(), '%Y-%m-%d')
+
+
+def today_date() -> date:
+    """Return today's date. Tests can patch this to move the clock."""
+
+    return date.today()
+
+
+def get_next_date(
+    date_string: str,
+    after_sunset: bool = False,
+    today: date = None,
+) -> Tuple:
+    """Calculate next yahrzeit date.
 
+    Results are memoized by Hebrew anniversary and day, see
+    _next_date_for_anniversary. If today isn't given, the clock's date is
+    used and the cache is cleared whenever that date changes.
 
-def get_next_date(date_string: str, after_sunset: bool = False) -> Tuple:
-    """Calculate next yahrzeit date."""
+    """
 
-    date_as_date = date_from_string(date_string)
-    hebrew_date = dates.HebrewDate.from_pydate(date_as_date)
+    death_ordinal = date_from_string(date_string).toordinal()
 
     if after_sunset:
-        hebrew_date = hebrew_date.add(days=1)
+        death_ordinal += 1
 
-    today_h = dates.HebrewDate.today()
+    _, month, day = hebrew_calendar.ordinal_to_hebrew(death_ordinal)
 
-    this_h_year_yahr = dates.HebrewDate(
-        today_h.year,
-        adjust_adar_leap(hebrew_date.month, today_h.year),
-        hebrew_date.day,
+    return get_next_date_for_anniversary(month, day, today)
+
+
+def get_anniversary(
+    death_date_h: Tuple[int, int, int],
+    next_date_h: Tuple[int, int, int],
+    after_sunset: bool = False,
+) -> Tuple[int, int]:
+    """Return the Hebrew (month, day) anniversary for a saved result.
+
+    Uses the next yahrzeit's month and day (the death date doesn't account
+    for sunset), but keeps Adar II for deaths in Adar II even when the next
+    yahrzeit falls in a common year's Adar. A death after sunset is moved
+    to the next Hebrew day first, so one on the evening of 30 Adar I is in
+    Adar II.
+
+    """
+
+    if after_sunset:
+        death_date_h = hebrew_calendar.ordinal_to_hebrew(
+            hebrew_calendar.hebrew_to_ordinal(*death_date_h) + 1,
+        )
+
+    _, month, day = next_date_h
+
+    if month == 12 and death_date_h[1] == 13:
+        month = 13
+
+    return (month, day)
+
+
+def get_next_date_for_anniversary(
+    month: int,
+    day: int,
+    today: date = None,
+) -> Tuple:
+    """Calculate next yahrzeit date for a Hebrew month and day of death."""
+
+    if today is None:
+        today_ordinal = today_date().toordinal()
+        _expire_next_date_cache(today_ordinal)
+
+    else:
+        today_ordinal = today.toordinal()
+
+    return _next_date_for_anniversary(month, day, today_ordinal)
+
+
+def _expire_next_date_cache(today_ordinal: int) -> None:
+    """Clear memoized next dates once the day has rolled over."""
+
+    global _next_date_cache_day
+
+    if _next_date_cache_day != today_ordinal:
+        _next_date_for_anniversary.cache_clear()
+        _next_date_cache_day = today_ordinal
+
+
+@lru_cache(maxsize=1024)
+def _next_date_for_anniversary(month: int, day: int,
+                               today_ordinal: int) -> Tuple:
+    """Calculate next yahrzeit date for a Hebrew month and day of death.
+
+    There are only a few hundred month and day pairs, so with today in the
+    key almost every call on a given day is a cache hit.
+
+    """
+
+    today_year = hebrew_calendar.ordinal_to_hebrew(today_ordinal)[0]
+
+    this_year_ordinal = hebrew_calendar.hebrew_to_ordinal(
+        today_year,
+        adjust_adar_leap(month, today_year),
+        day,
     )
 
-    if today_h < this_h_year_yahr:
-        next_date_h = this_h_year_yahr
-        next_date_g = next_date_h.to_greg()
+    if today_ordinal < this_year_ordinal:
+        next_ordinal = this_year_ordinal
         is_it_today = False
 
     else:
-        next_date_h = dates.HebrewDate(
-            today_h.year + 1,
-            adjust_adar_leap(hebrew_date.month, today_h.year+1),
-            hebrew_date.day,
+        next_ordinal = hebrew_calendar.hebrew_to_ordinal(
+            today_year + 1,
+            adjust_adar_leap(month, today_year + 1),
+            day,
         )
-        next_date_g = next_date_h.to_greg()
+        is_it_today = today_ordinal == this_year_ordinal
 
-        if today_h > this_h_year_yahr:
-            is_it_today = False
-
-        else:
-            is_it_today = True
+    next_date_h = hebrew_calendar.hebrew_from_ordinal(next_ordinal)
+    next_date_g = hebrew_calendar.gregorian_from_ordinal(next_ordinal)
 
     return (next_date_h, next_date_g, is_it_today)
 
 
+def get_next_dates_batch(
+    death_dates: Sequence,
+    after_sunset_mask: Sequence,
+    today: date = None,
+) -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+    """Calculate next yahrzeit dates for arrays of death dates.
+
+    Vectorized version of get_next_date. Death dates can be anything NumPy
+    can read as datetime64[D] (date objects or YYYY-MM-DD strings). Returns
+    an (n, 3) array of Hebrew (year, month, day) rows, a datetime64[D] array
+    of Gregorian dates, and a boolean array of whether today is the
+    yahrzeit.
+
+    """
+
+    import numpy as np
+
+    months, days = _anniversaries_batch(death_dates, after_sunset_mask)
+
+    today_ordinal = (today or today_date()).toordinal()
+    today_year = hebrew_calendar.ordinal_to_hebrew(today_ordinal)[0]
+
+    this_year_months = _adjust_adar_leap_batch(months, today_year)
+    this_year_ordinals = hebrew_calendar.hebrew_to_ordinals(
+        today_year,
+        this_year_months,
+        days,
+    )
+
+    # Only anniversaries that aren't still ahead this year move to next year.
+    passed = this_year_ordinals <= today_ordinal
+    next_years = np.where(passed, today_year + 1, today_year)
+    next_months = np.where(
+        passed,
+        _adjust_adar_leap_batch(months, today_year + 1),
+        this_year_months,
+    )
+    next_ordinals = this_year_ordinals.copy()
+    next_ordinals[passed] = hebrew_calendar.hebrew_to_ordinals(
+        today_year + 1,
+        next_months[passed],
+        days[passed],
+    )
+
+    next_dates_h = np.column_stack((next_years, next_months, days))
+    next_dates_g = (next_ordinals - hebrew_calendar.UNIX_EPOCH).astype(
+        'datetime64[D]',
+    )
+    is_it_today = this_year_ordinals == today_ordinal
+
+    return (next_dates_h, next_dates_g, is_it_today)
+
+
+def _anniversaries_batch(
+    death_dates: Sequence,
+    after_sunset_mask: Sequence,
+) -> Tuple['np.ndarray', 'np.ndarray']:
+    """Return arrays of Hebrew anniversary months and days for deaths.
+
+    Vectorized get_anniversary: deaths after sunset are moved to the next
+    Hebrew day, and a death in Adar II keeps month 13.
+
+    """
+
+    import numpy as np
+
+    death_days = np.asarray(death_dates, dtype='datetime64[D]').astype(
+        np.int64,
+    )
+    death_ordinals = (
+        death_days + hebrew_calendar.UNIX_EPOCH
+        + np.asarray(after_sunset_mask, dtype=np.int64)
+    )
+    _, months, days = hebrew_calendar.ordinals_to_hebrew(death_ordinals)
+
+    return (months, days)
+
+
+def get_yahrzeits_batch(
+    death_dates: Sequence,
+    after_sunset_mask: Sequence,
+    num_years: Sequence[int],
+    today: date = None,
+) -> List[dict]:
+    """Calculate next and following yahrzeits for many deaths at once.
+
+    Takes the arguments of get_next_dates_batch and, for each death, the
+    number of yahrzeits to return, counting the next one. Returns a dict
+    per death, formatted like FollowingDate.to_json, with the next date,
+    whether it is today and the following dates.
+
+    Deaths with the same anniversary (month and day, see get_anniversary)
+    have the same yahrzeits, so each anniversary is calculated and
+    formatted once, for the most years any of its deaths asks for, and
+    shared. Adar I and Adar II deaths share their next date in a common
+    year, but not their following dates.
+
+    """
+
+    import numpy as np
+
+    next_dates_h, next_dates_g, is_it_today = get_next_dates_batch(
+        death_dates,
+        after_sunset_mask,
+        today,
+    )
+    anniversaries, first_indexes, inverse = np.unique(
+        np.column_stack(_anniversaries_batch(death_dates, after_sunset_mask)),
+        axis=0,
+        return_index=True,
+        return_inverse=True,
+    )
+    inverse = inverse.reshape(-1)
+    num_years = np.asarray(num_years, dtype=np.int64)
+    max_years = np.zeros(len(anniversaries), dtype=np.int64)
+    np.maximum.at(max_years, inverse, num_years)
+
+    shared = []
+    for anniversary, first, years in zip(
+        anniversaries.tolist(),
+        first_indexes.tolist(),
+        max_years.tolist(),
+    ):
+        next_date_h = next_dates_h[first].tolist()
+        next_date_g = next_dates_g[first].astype(date)
+        shared.append((
+            {
+                'next_date_h': formatting.db(*next_date_h),
+                'next_date_g': next_date_g.isoformat(),
+                'next_date_h_res': formatting.hebrew_res(*next_date_h),
+                'next_date_g_res': formatting.gregorian_date_to_res(
+                    next_date_g,
+                ),
+                'is_it_today': bool(is_it_today[first]),
+            },
+            [
+                following_date.to_json()
+                for following_date in get_following_dates(
+                    hebrew_calendar.hebrew_date(*next_date_h),
+                    years - 1,
+                    anniversary=tuple(anniversary),
+                )
+            ],
+        ))
+
+    results = []
+    for i, years in zip(inverse.tolist(), num_years.tolist()):
+        next_date, following_dates = shared[i]
+        results.append({
+            **next_date,
+            'following_dates': following_dates[:max(years - 1, 0)],
+        })
+
+    return results
+
+
+def _adjust_adar_leap_batch(
+    months: 'np.ndarray',
+    year: int,
+) -> 'np.ndarray':
+    """Vectorized adjust_adar_leap for a single future year."""
+
+    import numpy as np
+
+    if hebrew_calendar.is_leap(year):
+        return months
+
+    return np.where(months == 13, 12, months)
+
+
 def h_date_stringify_res(hebrew_date: dates.HebrewDate) -> str:
     """Format Hebrew date as a string for result."""
 
-    return f'{hebrew_date:%-d %B %Y}'
+    return formatting.hebrew_res(
+        hebrew_date.year,
+        hebrew_date.month,
+        hebrew_date.day,
+    )
 
 
 def g_date_stringify_res(gregorian_date: dates.GregorianDate) -> str:
     """Format Gregorian date as a string for result."""
 
-    return f'{gregorian_date:%-d %B %Y}'
+    return formatting.gregorian_res(
+        gregorian_date.year,
+        gregorian_date.month,
+        gregorian_date.day,
+    )
 
 
 def h_date_stringify_db(hebrew_date: dates.HebrewDate) -> str:
     """Format Hebrew date as a string for database."""
 
-    return f'{hebrew_date:%Y-%m-%d}'
+    return formatting.db(hebrew_date.year, hebrew_date.month, hebrew_date.day)
 
 
 def g_date_stringify_db(gregorian_date: dates.GregorianDate) -> date:
     """Format Gregorian date as a string for storage in session."""
 
-    return f'{gregorian_date:%Y-%m-%d}'
+    return formatting.db(
+        gregorian_date.year,
+        gregorian_date.month,
+        gregorian_date.day,
+    )
 
 
 def h_date_db_to_res(h_date_str: str) -> str:
     """Format Hebrew date string (from DB) for dashboard."""
 
-    date_parts = [int(x) for x in h_date_str.split('-')]
-    h_date = dates.HebrewDate(date_parts[0], date_parts[1], date_parts[2])
-    return h_date_stringify_res(h_date)
+    return formatting.hebrew_db_to_res(h_date_str)
 
 
 def g_date_db_to_res(g_date_str: str) -> str:
     """Format Hebrew date string (from DB) for dashboard."""
 
-    date_parts = [int(x) for x in g_date_str.split('-')]
-    g_date = dates.GregorianDate(date_parts[0], date_parts[1], date_parts[2])
-    return g_date_stringify_res(g_date)
+    return formatting.gregorian_db_to_res(g_date_str)
 
 
-def get_following_dates(
+class FollowingDate(NamedTuple):
+    """A future yahrzeit as a pair of Hebrew and Gregorian dates."""
+
+    hebrew: dates.HebrewDate
+    gregorian: dates.GregorianDate
+
+    @property
+    def hebrew_res(self) -> str:
+        """Hebrew date formatted for result."""
+
+        return h_date_stringify_res(self.hebrew)
+
+    @property
+    def gregorian_res(self) -> str:
+        """Gregorian date formatted for result."""
+
+        return g_date_stringify_res(self.gregorian)
+
+    def to_json(self) -> dict:
+        """Return the dates in storage and result formats for JSON."""
+
+        return {
+            'date_h': h_date_stringify_db(self.hebrew),
+            'date_g': g_date_stringify_db(self.gregorian),
+            'date_h_res': self.hebrew_res,
+            'date_g_res': self.gregorian_res,
+        }
+
+
+def iter_following_dates(
     next_date_h: dates.HebrewDate,
-    num_years: int,
-) -> Dict:
-    """Return dictionary of hebrew and gregorian dates for specified number
-    of future years.
+    offset: int = 0,
+    anniversary: Tuple[int, int] = None,
+) -> Iterator[FollowingDate]:
+    """Lazily yield yahrzeits for the years after next_date_h.
+
+    The first date yielded is offset + 1 years after next_date_h. Dates
+    fall on next_date_h's month and day, or on an anniversary's (month,
+    day) if given, which keeps an Adar II anniversary in Adar II when
+    next_date_h is in a common year's Adar. The generator doesn't end, so
+    slice it with itertools.islice.
 
     """
 
-    following_dates = {}
+    month, day = anniversary or (next_date_h.month, next_date_h.day)
 
-    for num in range(1, num_years+1):
-        following_date_h = dates.HebrewDate(
-            next_date_h.year+num,
-            adjust_adar_leap(next_date_h.month, next_date_h.year+num),
-            next_date_h.day,
+    for num in count(offset + 1):
+        year = next_date_h.year + num
+        ordinal = hebrew_calendar.hebrew_to_ordinal(
+            year,
+            adjust_adar_leap(month, year),
+            day,
         )
-        following_date_g = following_date_h.to_greg()
 
-        following_dates[
-            h_date_stringify_res(following_date_h)
-        ] = g_date_stringify_res(following_date_g)
+        yield FollowingDate(
+            hebrew_calendar.hebrew_from_ordinal(ordinal),
+            hebrew_calendar.gregorian_from_ordinal(ordinal),
+        )
+
+
+def get_following_dates(
+    next_date_h: dates.HebrewDate,
+    num_years: int,
+    offset: int = 0,
+    anniversary: Tuple[int, int] = None,
+) -> List[FollowingDate]:
+    """Return list of hebrew and gregorian dates for specified number of
+    future years, in order. See iter_following_dates for anniversary.
+
+    """
 
-    return following_dates
+    return list(islice(
+        iter_following_dates(next_date_h, offset, anniversary),
+        max(num_years, 0),
+    ))
 
 
 def geocode_address(location: str) -> list:
-    """Geocode an address."""
+    """Geocode an address with the configured geocoder.
+
+    Raises maps.MapsUnavailableError if Google Maps is unavailable and
+    maps.MapsRequestError if it rejects the request.
 
-    gmaps = googlemaps.Client(key=gmaps_key)
+    """
 
-    return gmaps.geocode(location)
+    if settings.GEOCODER == 'local':
+        return gazetteer.geocode(location)
+
+    return maps.call('geocode', location)
 
 
 def get_timezone(coordinates: tuple) -> str:
-    """Get timezone from address."""
+    """Get timezone from address.
 
-    gmaps = googlemaps.Client(key=gmaps_key)
+    Raises maps.MapsUnavailableError if Google Maps is unavailable and
+    maps.MapsRequestError if it rejects the request.
 
-    return gmaps.timezone(coordinates)
+    """
 
+    return maps.call('timezone', coordinates)
 
-def get_sunset_time(
-    date_string: str,
-    location_string: str,
-) -> Union[str, None]:
-    """Get time of sunset on given day at given location."""
 
-    location_data = geocode_address(location_string)
+def fetch_location(location_string: str) -> Union[LocationInfo, None]:
+    """Geocode a location remotely and look up its timezone.
+
+    The timezone is looked up offline, falling back to Google Maps for
+    coordinates that timezones.timezone_at can't resolve. Return None if the
+    location can't be found or Google Maps rejects it as invalid. Raises
+    maps.MapsUnavailableError if Google Maps is unavailable.
+
+    """
+
+    try:
+        location_data = geocode_address(location_string)
+
+    except maps.MapsRequestError:
+        return
+
+    if not location_data:
+        return
+
     coordinates = location_data[0]['geometry']['location']
     location_name = location_data[0]['address_components'][0]['long_name']
     location_region = location_data[0]['address_components'][-1]['long_name']
-    tz = get_timezone(coordinates)['timeZoneId']
+    tz = timezones.timezone_at(coordinates['lat'], coordinates['lng'])
+
+    if tz is None:
+        tz = get_timezone(coordinates)['timeZoneId']
 
-    location = LocationInfo(
+    return LocationInfo(
         location_name,
         location_region,
         tz,
@@ -183,14 +537,57 @@ def get_sunset_time(
         coordinates['lng'],
     )
 
+
+def get_sunset_time_at(
+    date_string: str,
+    location: LocationInfo,
+) -> Union[str, None]:
+    """Get time of sunset on given day at a resolved location."""
+
     try:
         sunset = sun.sunset(
             location.observer,
             date_from_string(date_string),
-            tz,
+            location.timezone,
         )
 
     except ValueError:
         return
 
-    return (datetime.strftime(sunset, '%-I:%M %p'))
+    return formatting.time_res(sunset)
+
+
+def get_erev_sunset_times(
+    location: LocationInfo,
+    g_dates: Sequence[date],
+) -> List[Union[str, None]]:
+    """Get the sunset times on the eves of yahrzeits at a location.
+
+    A yahrzeit begins at sunset on the day before its Gregorian date, when
+    the memorial candle is lit. All of the sunsets are calculated at once.
+    Days without a sunset are None.
+
+    """
+
+    sunsets = solar.sunsets_on(
+        location,
+        [g_date - timedelta(days=1) for g_date in g_dates],
+    )
+
+    return [
+        formatting.time_res(sunset) if sunset else None for sunset in sunsets
+    ]
+
+
+def get_sunset_time(
+    date_string: str,
+    location_string: str,
+) -> Union[str, None]:
+    """Get time of sunset on given day at given location."""
+
+    location = fetch_location(location_string)
+
+    if location is None:
+        return
+
+    return get_sunset_time_at(date_string, location)
@@ -0,0 +1,166 @@
+"""Management command that measures worker startup time."""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules that are imported on first use and shouldn't load at startup.
+DEFERRED_MODULES = ('numpy', 'googlemaps', 'requests', 'timezonefinder')
+
+DEFAULT_PATHS = (
+    '/yahrzeit/',
+    '/yahrzeit/calculate?date=2022-02-01&tod=before-sunset&years=3',
+)
+
+# Run in a fresh interpreter for each run, so that nothing is imported yet.
+# Takes the paths and DEFERRED_MODULES as JSON arguments and prints the
+# timings as JSON.
+BENCHMARK_SCRIPT = '''
+import json
+import sys
+import time
+
+start = time.perf_counter()
+
+import django
+from django.urls import get_resolver
+
+django.setup()
+get_resolver().url_patterns
+imported = time.perf_counter()
+loaded = [name for name in json.loads(sys.argv[2]) if name in sys.modules]
+
+from django.conf import settings
+from django.test import Client
+
+host = next(
+    (host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'),
+    'localhost',
+)
+client = Client(HTTP_HOST=host)
+requests = []
+
+for path in json.loads(sys.argv[1]):
+    request_start = time.perf_counter()
+    status_code = client.get(path).status_code
+    requests.append([path, status_code, time.perf_counter() - request_start])
+
+print(json.dumps({
+    'import': imported - start,
+    'requests': requests,
+    'loaded': loaded,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure how long a fresh process takes to import the project and '
+        'to serve its first requests.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            default=DEFAULT_PATHS,
+            help='Paths to request, in order, after startup.',
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=5,
+            help='Number of fresh processes to time.',
+        )
+        parser.add_argument(
+            '--max-import-time',
+            type=float,
+            help='Fail if the median import time exceeds this many '
+                 'milliseconds.',
+        )
+        parser.add_argument(
+            '--max-first-request',
+            type=float,
+            help='Fail if the median first request to any path exceeds '
+                 'this many milliseconds.',
+        )
+
+    def handle(self, *args, **options):
+        runs = options['runs']
+        paths = list(options['paths'])
+
+        if runs < 1:
+            raise CommandError('--runs must be positive.')
+
+        timings = [self.run_once(paths) for _ in range(runs)]
+
+        import_time = statistics.median(
+            timing['import'] for timing in timings
+        ) * 1000
+        self.stdout.write(f'Median import time: {import_time:.1f} ms')
+
+        request_times = {}
+        for i, path in enumerate(paths):
+            request_times[path] = statistics.median(
+                timing['requests'][i][2] for timing in timings
+            ) * 1000
+            status_code = timings[-1]['requests'][i][1]
+            self.stdout.write(
+                f'Median first request to {path}: '
+                f'{request_times[path]:.1f} ms ({status_code})'
+            )
+
+        loaded = sorted({
+            name for timing in timings for name in timing['loaded']
+        })
+        self.stdout.write(
+            f'Deferred modules loaded at startup: '
+            f'{", ".join(loaded) or "none"}'
+        )
+
+        max_import_time = options['max_import_time']
+        if max_import_time is not None and import_time > max_import_time:
+            raise CommandError(
+                f'Import time {import_time:.1f} ms is over '
+                f'{max_import_time:g} ms.'
+            )
+
+        max_first_request = options['max_first_request']
+        if max_first_request is not None:
+            for path, request_time in request_times.items():
+                if request_time > max_first_request:
+                    raise CommandError(
+                        f'First request to {path} took {request_time:.1f} '
+                        f'ms, over {max_first_request:g} ms.'
+                    )
+
+    def run_once(self, paths: list) -> dict:
+        """Time startup and the first requests in a fresh process."""
+
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+
+        process = subprocess.run(
+            [
+                sys.executable,
+                '-c',
+                BENCHMARK_SCRIPT,
+                json.dumps(paths),
+                json.dumps(DEFERRED_MODULES),
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+
+        if process.returncode:
+            raise CommandError(
+                f'Benchmark process failed:\n{process.stderr.strip()}'
+            )
+
+        return json.loads(process.stdout.strip().splitlines()[-1])
@@ -0,0 +1,86 @@
+"""Management command that deletes expired and anonymous sessions."""
+
+from importlib import import_module
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired sessions and, with --anonymous, sessions that no '
+        'user is logged in to.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--anonymous',
+            action='store_true',
+            help='Also delete sessions without a logged in user, such as '
+                 'the ones calculations used to create.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of sessions read and deleted at a time.',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be positive.')
+
+        expired, _ = Session.objects.filter(
+            expire_date__lt=timezone.now(),
+        ).delete()
+        self.stdout.write(f'Deleted {expired} expired sessions')
+
+        if options['anonymous']:
+            anonymous = self.delete_anonymous(chunk_size)
+            self.stdout.write(f'Deleted {anonymous} anonymous sessions')
+
+    def delete_anonymous(self, chunk_size: int) -> int:
+        """Delete sessions without a logged in user and return how many.
+
+        Sessions are decoded a chunk at a time, in key order. Copies held by
+        a cached session engine are deleted too. Expired copies clear
+        themselves, since they are cached until their session expires.
+
+        """
+
+        store_class = import_module(settings.SESSION_ENGINE).SessionStore
+        cache_key_prefix = getattr(store_class, 'cache_key_prefix', None)
+        deleted = 0
+        last_key = ''
+
+        while True:
+            sessions = list(
+                Session.objects.filter(
+                    session_key__gt=last_key,
+                ).order_by('session_key')[:chunk_size]
+            )
+
+            if not sessions:
+                return deleted
+
+            anonymous = [
+                session.session_key
+                for session in sessions
+                if SESSION_KEY not in session.get_decoded()
+            ]
+            count, _ = Session.objects.filter(
+                session_key__in=anonymous,
+            ).delete()
+            deleted += count
+
+            if cache_key_prefix:
+                caches[settings.SESSION_CACHE_ALIAS].delete_many(
+                    [cache_key_prefix + key for key in anonymous],
+                )
+
+            last_key = sessions[-1].session_key
@@ -0,0 +1,205 @@
+"""Management command that rolls over stale yahrzeit dates for all users."""
+
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from datetime import date
+import logging
+import time
+from typing import Iterator, List, Tuple
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from yahrzeit_app import crud, formatting, helpers
+from yahrzeit_app.models import Anniversary
+
+Row = Tuple[int, int, int]
+Update = Tuple[int, int, date]
+
+logger = logging.getLogger(__name__)
+
+
+def compute_chunk(rows: List[Row], today_ordinal: int) -> List[Update]:
+    """Return (pk, next_date_hebrew, next_date_gregorian) for stale rows.
+
+    Rows are (pk, month, day) anniversaries. Runs in worker processes, so it
+    doesn't touch the database. Rows with no date in the year they would
+    move to, like 30 Cheshvan when Cheshvan has 29 days, are logged and
+    left out.
+
+    """
+
+    today = date.fromordinal(today_ordinal)
+    updates = []
+
+    for pk, month, day in rows:
+        try:
+            next_date_h, next_date_g, _ = (
+                helpers.get_next_date_for_anniversary(month, day, today)
+            )
+
+        except ValueError as e:
+            logger.warning(
+                'Could not roll over anniversary %s (%s/%s): %s',
+                pk,
+                month,
+                day,
+                e,
+            )
+            continue
+
+        updates.append((
+            pk,
+            formatting.pack_hebrew(*next_date_h),
+            next_date_g.to_pydate(),
+        ))
+
+    return updates
+
+
+class InlineExecutor(Executor):
+    """Executor that runs work in the calling process."""
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+class Command(BaseCommand):
+    help = (
+        'Move next yahrzeit dates that have passed to the following year, '
+        'for every anniversary.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of anniversaries read and written at a time.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes calculating dates (1 calculates '
+                 'in this process).',
+        )
+        parser.add_argument(
+            '--as-of',
+            type=formatting.parse_date,
+            default=None,
+            help='Roll over as if today were this YYYY-MM-DD date.',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        today = options['as_of'] or helpers.today_date()
+
+        if chunk_size < 1 or workers < 1:
+            raise CommandError('--chunk-size and --workers must be positive.')
+
+        start = time.perf_counter()
+        updated = 0
+
+        if workers > 1:
+            # Workers only calculate dates, they never use the database.
+            executor = ProcessPoolExecutor(max_workers=workers)
+
+        else:
+            executor = InlineExecutor()
+
+        with executor:
+            pending = deque()
+
+            for rows in self.iter_stale_chunks(today, chunk_size):
+                pending.append(
+                    executor.submit(compute_chunk, rows, today.toordinal()),
+                )
+
+                if len(pending) > workers:
+                    updated += self.write_updates(
+                        pending.popleft().result(),
+                        today,
+                    )
+
+            while pending:
+                updated += self.write_updates(
+                    pending.popleft().result(),
+                    today,
+                )
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'Rolled over {updated} anniversaries in {elapsed:.2f}s '
+            f'({updated / elapsed if elapsed else 0:.0f}/s)'
+        )
+
+    def iter_stale_chunks(
+        self,
+        today: date,
+        chunk_size: int,
+    ) -> Iterator[List[Row]]:
+        """Yield chunks of stale (pk, month, day) rows in pk order."""
+
+        last_pk = 0
+
+        while True:
+            rows = list(
+                Anniversary.objects.filter(
+                    pk__gt=last_pk,
+                    next_date_gregorian__lt=today,
+                ).order_by('pk').values_list('pk', 'month', 'day')[:chunk_size]
+            )
+
+            if not rows:
+                return
+
+            yield rows
+            last_pk = rows[-1][0]
+
+    def write_updates(self, updates: List[Update], today: date) -> int:
+        """Save calculated dates and return how many rows were written.
+
+        Rows are locked first and only rows that are still stale are
+        written, and the users with decedents on them get their decedents
+        version bumped. Where the database supports it, rows locked by a web
+        worker that is rolling them over are skipped instead of waited on.
+
+        """
+
+        if not updates:
+            return 0
+
+        by_pk = {
+            pk: (packed_date, g_date) for pk, packed_date, g_date in updates
+        }
+
+        with transaction.atomic():
+            stale = Anniversary.objects.filter(
+                pk__in=by_pk,
+                next_date_gregorian__lt=today,
+            )
+
+            if connection.features.has_select_for_update_skip_locked:
+                stale = stale.select_for_update(skip_locked=True)
+
+            anniversaries = [
+                Anniversary(
+                    pk=pk,
+                    next_date_hebrew=by_pk[pk][0],
+                    next_date_gregorian=by_pk[pk][1],
+                )
+                for pk in stale.values_list('pk', flat=True)
+            ]
+            Anniversary.objects.bulk_update(
+                anniversaries,
+                ['next_date_hebrew', 'next_date_gregorian'],
+            )
+
+            if anniversaries:
+                crud.bump_decedents_version(
+                    crud.users_with_anniversaries(anniversaries),
+                )
+
+        return len(anniversaries)
@@ -0,0 +1,62 @@
+"""Management command that pre-warms the location cache."""
+
+from django.core.management.base import BaseCommand, CommandError
+from yahrzeit_app import geocoding, maps
+from yahrzeit_app.models import GeocodedLocation
+
+
+class Command(BaseCommand):
+    help = (
+        'Look up locations ahead of time so that sunset requests for them '
+        'are served from the cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'locations',
+            nargs='*',
+            help='Location strings to look up.',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=0,
+            help='Also refresh this many of the most looked up cached '
+                 'locations.',
+        )
+        parser.add_argument(
+            '--evict',
+            action='store_true',
+            help='Delete expired locations first.',
+        )
+
+    def handle(self, *args, **options):
+        top = options['top']
+
+        if top < 0:
+            raise CommandError('--top must not be negative.')
+
+        if options['evict']:
+            evicted = geocoding.evict_expired_locations()
+            self.stdout.write(f'Evicted {evicted} expired locations')
+
+        location_strings = list(options['locations'])
+        if top:
+            # Rank by every hit this process has counted so far.
+            geocoding.flush_hits()
+            location_strings.extend(
+                GeocodedLocation.objects.order_by('-hits').values_list(
+                    'key',
+                    flat=True,
+                )[:top]
+            )
+
+        try:
+            found = geocoding.warm_locations(location_strings)
+
+        except maps.MapsUnavailableError as e:
+            raise CommandError(f'Google Maps is unavailable: {e}')
+
+        self.stdout.write(
+            f'Warmed {found} of {len(location_strings)} locations'
+        )
@@ -0,0 +1,266 @@
+"""Shared Google Maps client for Yahrzeit app.
+
+One client, and so one pooled HTTPS session, is created lazily per process
+and reused by every request. Calls have strict timeouts and a bounded retry
+window, and go through a circuit breaker: after FAILURE_THRESHOLD failures
+in a row, calls fail immediately for RESET_TIMEOUT seconds instead of tying
+up a worker, and then a single trial call decides whether to close it again.
+Callers handle MapsUnavailableError by falling back to cached data. Errors
+caused by the request itself, like an invalid address, raise
+MapsRequestError and don't count towards the breaker.
+
+googlemaps and requests are imported when the client is first built, so
+processes that never call Google Maps don't pay for importing them.
+
+"""
+
+from threading import Lock
+import time
+from typing import TYPE_CHECKING, Any, Callable, Tuple, Union
+from django.conf import settings
+
+if TYPE_CHECKING:
+    import googlemaps
+
+# (connect, read) timeouts in seconds for each HTTP request.
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 5
+# Seconds after the first attempt that retries of a failing call stop.
+RETRY_TIMEOUT = 4
+POOL_SIZE = 10
+
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30
+
+# ApiError statuses that mean Google Maps is failing, rather than that the
+# request was bad.
+FAILURE_STATUSES = ('OVER_DAILY_LIMIT', 'OVER_QUERY_LIMIT', 'UNKNOWN_ERROR')
+
+_client = None
+_client_lock = Lock()
+_client_options = {}
+
+
+class MapsUnavailableError(Exception):
+    """Raised when Google Maps is failing or the circuit breaker is open."""
+
+
+class MapsRequestError(ValueError):
+    """Raised when Google Maps rejects a request, like an invalid address."""
+
+
+def failures() -> Tuple[type, ...]:
+    """Return the googlemaps exceptions that can count as failures.
+
+    An ApiError only counts if is_failure says so.
+
+    """
+
+    import googlemaps
+
+    return (
+        googlemaps.exceptions.ApiError,
+        googlemaps.exceptions.HTTPError,
+        googlemaps.exceptions.Timeout,
+        googlemaps.exceptions.TransportError,
+    )
+
+
+def is_failure(error: Exception) -> bool:
+    """Whether one of failures() means Google Maps is failing.
+
+    Transport errors, timeouts and HTTP errors do, and so does an ApiError
+    with one of FAILURE_STATUSES. Other ApiErrors were caused by the
+    request.
+
+    """
+
+    import googlemaps
+
+    if isinstance(error, googlemaps.exceptions.ApiError):
+        return error.status in FAILURE_STATUSES
+
+    return True
+
+
+class CircuitBreaker:
+    """Circuit breaker that stops calls to a failing service.
+
+    Closed, it counts failures in a row and opens at failure_threshold.
+    Open, it rejects calls until reset_timeout seconds have passed. Then it
+    is half-open and lets one call through: success closes it and failure
+    opens it again.
+
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are currently rejected."""
+
+        with self.lock:
+            return self._rejects()
+
+    def _rejects(self) -> bool:
+        """Whether to reject a call. Must be called with the lock held."""
+
+        if self.opened_at is None:
+            return False
+
+        if self.clock() - self.opened_at < self.reset_timeout:
+            return True
+
+        return self.trial_running
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Call fn unless the breaker is open.
+
+        Raises MapsUnavailableError if the breaker is open or fn raises one
+        of failures() that is_failure counts, and MapsRequestError for the
+        others, which don't count towards the breaker.
+
+        """
+
+        with self.lock:
+            if self._rejects():
+                raise MapsUnavailableError('Circuit breaker is open.')
+
+            if self.opened_at is not None:
+                self.trial_running = True
+
+        try:
+            result = fn(*args, **kwargs)
+
+        # The except expression is only evaluated once fn has raised.
+        except failures() as e:
+            if not is_failure(e):
+                with self.lock:
+                    self.trial_running = False
+                raise MapsRequestError(str(e)) from e
+
+            self.record_failure()
+            raise MapsUnavailableError(str(e)) from e
+
+        except Exception:
+            with self.lock:
+                self.trial_running = False
+            raise
+
+        self.record_success()
+
+        return result
+
+    def record_success(self) -> None:
+        """Close the breaker."""
+
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the breaker at the threshold."""
+
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+
+            if (
+                self.opened_at is not None
+                or self.failures >= self.failure_threshold
+            ):
+                self.opened_at = self.clock()
+
+    def reset(self) -> None:
+        """Close the breaker and forget past failures."""
+
+        self.record_success()
+
+
+breaker = CircuitBreaker()
+
+
+def _build_client(
+    key: Union[str, None] = None,
+    base_url: Union[str, None] = None,
+    connect_timeout: float = CONNECT_TIMEOUT,
+    read_timeout: float = READ_TIMEOUT,
+    retry_timeout: float = RETRY_TIMEOUT,
+) -> 'googlemaps.Client':
+    """Create a client with a pooled session."""
+
+    import googlemaps
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return googlemaps.Client(
+        key=key or settings.GMAPS_KEY,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        retry_timeout=retry_timeout,
+        requests_session=session,
+        base_url=base_url or settings.GMAPS_BASE_URL,
+    )
+
+
+def get_client() -> 'googlemaps.Client':
+    """Return the process-wide client, creating it on first use."""
+
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client(**_client_options)
+
+    return _client
+
+
+def configure(**options) -> None:
+    """Replace the client's options and reset the client and breaker.
+
+    Takes the keyword arguments of _build_client. The new client is created
+    on next use.
+
+    """
+
+    global _client
+
+    with _client_lock:
+        if _client is not None:
+            _client.session.close()
+
+        _client = None
+        _client_options.clear()
+        _client_options.update(options)
+
+    breaker.reset()
+
+
+def call(method: str, *args, **kwargs) -> Any:
+    """Call a client method, like 'geocode', through the circuit breaker.
+
+    Raises MapsUnavailableError if the call fails or the breaker is open,
+    and MapsRequestError if Google Maps rejects the request.
+
+    """
+
+    return breaker.call(getattr(get_client(), method), *args, **kwargs)
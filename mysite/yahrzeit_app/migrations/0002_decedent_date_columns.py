@@ -0,0 +1,44 @@
+# Generated by Django 4.2.3 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("yahrzeit_app", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="decedent",
+            name="death_date_hebrew_packed",
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="decedent",
+            name="next_date_hebrew_packed",
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="decedent",
+            name="next_date_gregorian_date",
+            field=models.DateField(null=True),
+        ),
+        # Let the old columns go empty so this can be reversed after 0004.
+        migrations.AlterField(
+            model_name="decedent",
+            name="death_date_hebrew",
+            field=models.CharField(max_length=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name="decedent",
+            name="next_date_hebrew",
+            field=models.CharField(max_length=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name="decedent",
+            name="next_date_gregorian",
+            field=models.CharField(max_length=10, null=True),
+        ),
+    ]
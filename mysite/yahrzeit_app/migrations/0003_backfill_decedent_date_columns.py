@@ -0,0 +1,102 @@
+"""Backfill the new date columns on Decedent in chunks.
+
+Runs outside of a transaction so each chunk is committed on its own, and only
+touches rows that haven't been filled yet, so it can be rerun if interrupted.
+
+"""
+
+from datetime import date
+from django.db import migrations
+
+CHUNK_SIZE = 1000
+
+
+def pack(date_string):
+    """Pack a YYYY-MM-DD Hebrew date string into an integer."""
+
+    year, month, day = (int(part) for part in date_string.split("-"))
+    return year * 10000 + month * 100 + day
+
+
+def unpack(packed):
+    """Unpack an integer Hebrew date into a YYYY-MM-DD string."""
+
+    return f"{packed // 10000}-{packed // 100 % 100:02d}-{packed % 100:02d}"
+
+
+def backfill(apps, schema_editor):
+    Decedent = apps.get_model("yahrzeit_app", "Decedent")
+    last_pk = 0
+
+    while True:
+        chunk = list(
+            Decedent.objects.filter(
+                pk__gt=last_pk,
+                next_date_gregorian_date__isnull=True,
+            ).order_by("pk")[:CHUNK_SIZE]
+        )
+
+        if not chunk:
+            break
+
+        for decedent in chunk:
+            decedent.death_date_hebrew_packed = pack(
+                decedent.death_date_hebrew,
+            )
+            decedent.next_date_hebrew_packed = pack(decedent.next_date_hebrew)
+            decedent.next_date_gregorian_date = date.fromisoformat(
+                decedent.next_date_gregorian,
+            )
+
+        Decedent.objects.bulk_update(
+            chunk,
+            [
+                "death_date_hebrew_packed",
+                "next_date_hebrew_packed",
+                "next_date_gregorian_date",
+            ],
+        )
+        last_pk = chunk[-1].pk
+
+
+def backfill_reverse(apps, schema_editor):
+    Decedent = apps.get_model("yahrzeit_app", "Decedent")
+    last_pk = 0
+
+    while True:
+        chunk = list(
+            Decedent.objects.filter(pk__gt=last_pk).order_by("pk")[:CHUNK_SIZE]
+        )
+
+        if not chunk:
+            break
+
+        for decedent in chunk:
+            decedent.death_date_hebrew = unpack(
+                decedent.death_date_hebrew_packed,
+            )
+            decedent.next_date_hebrew = unpack(
+                decedent.next_date_hebrew_packed,
+            )
+            decedent.next_date_gregorian = (
+                decedent.next_date_gregorian_date.isoformat()
+            )
+
+        Decedent.objects.bulk_update(
+            chunk,
+            ["death_date_hebrew", "next_date_hebrew", "next_date_gregorian"],
+        )
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("yahrzeit_app", "0002_decedent_date_columns"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, backfill_reverse),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.3 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("yahrzeit_app", "0003_backfill_decedent_date_columns"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="decedent",
+            name="death_date_hebrew",
+        ),
+        migrations.RemoveField(
+            model_name="decedent",
+            name="next_date_hebrew",
+        ),
+        migrations.RemoveField(
+            model_name="decedent",
+            name="next_date_gregorian",
+        ),
+        migrations.RenameField(
+            model_name="decedent",
+            old_name="death_date_hebrew_packed",
+            new_name="death_date_hebrew",
+        ),
+        migrations.RenameField(
+            model_name="decedent",
+            old_name="next_date_hebrew_packed",
+            new_name="next_date_hebrew",
+        ),
+        migrations.RenameField(
+            model_name="decedent",
+            old_name="next_date_gregorian_date",
+            new_name="next_date_gregorian",
+        ),
+        migrations.AlterField(
+            model_name="decedent",
+            name="death_date_hebrew",
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name="decedent",
+            name="next_date_hebrew",
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name="decedent",
+            name="next_date_gregorian",
+            field=models.DateField(),
+        ),
+    ]
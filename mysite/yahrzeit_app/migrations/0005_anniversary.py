@@ -0,0 +1,60 @@
+# Generated by Django 4.2.3 on 2026-10-18 11:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("yahrzeit_app", "0004_decedent_swap_date_columns"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Anniversary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.PositiveSmallIntegerField()),
+                ("day", models.PositiveSmallIntegerField()),
+                ("next_date_hebrew", models.PositiveIntegerField()),
+                ("next_date_gregorian", models.DateField(db_index=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("month", "day"),
+                        name="anniversary_month_day_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name="decedent",
+            name="anniversary",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="yahrzeit_app.anniversary",
+            ),
+        ),
+        # Let the old columns go empty so this can be reversed after 0007.
+        migrations.AlterField(
+            model_name="decedent",
+            name="next_date_hebrew",
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="decedent",
+            name="next_date_gregorian",
+            field=models.DateField(null=True),
+        ),
+    ]
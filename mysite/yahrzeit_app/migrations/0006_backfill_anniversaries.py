@@ -0,0 +1,119 @@
+"""Create an Anniversary for every Hebrew month and day that Decedents have
+and point the Decedents at them, in chunks.
+
+Runs outside of a transaction so each chunk is committed on its own, and only
+touches Decedents that aren't linked yet, so it can be rerun if interrupted.
+Each Anniversary takes the latest next date of its Decedents; stale ones are
+fixed by the next rollover.
+
+"""
+
+from django.db import migrations
+
+CHUNK_SIZE = 1000
+
+
+def anniversary_key(death_date_hebrew, next_date_hebrew):
+    """Return the (month, day) anniversary for packed Hebrew dates.
+
+    Same rule as helpers.get_anniversary.
+
+    """
+
+    month = next_date_hebrew // 100 % 100
+    day = next_date_hebrew % 100
+
+    if month == 12 and death_date_hebrew // 100 % 100 == 13:
+        month = 13
+
+    return (month, day)
+
+
+def backfill(apps, schema_editor):
+    Anniversary = apps.get_model("yahrzeit_app", "Anniversary")
+    Decedent = apps.get_model("yahrzeit_app", "Decedent")
+
+    anniversaries = {
+        (anniversary.month, anniversary.day): anniversary
+        for anniversary in Anniversary.objects.all()
+    }
+    last_pk = 0
+
+    while True:
+        chunk = list(
+            Decedent.objects.filter(
+                pk__gt=last_pk,
+                anniversary__isnull=True,
+            ).order_by("pk")[:CHUNK_SIZE]
+        )
+
+        if not chunk:
+            break
+
+        for decedent in chunk:
+            key = anniversary_key(
+                decedent.death_date_hebrew,
+                decedent.next_date_hebrew,
+            )
+            anniversary = anniversaries.get(key)
+
+            if anniversary is None:
+                anniversary = Anniversary.objects.create(
+                    month=key[0],
+                    day=key[1],
+                    next_date_hebrew=decedent.next_date_hebrew,
+                    next_date_gregorian=decedent.next_date_gregorian,
+                )
+                anniversaries[key] = anniversary
+
+            elif (
+                decedent.next_date_gregorian > anniversary.next_date_gregorian
+            ):
+                anniversary.next_date_hebrew = decedent.next_date_hebrew
+                anniversary.next_date_gregorian = decedent.next_date_gregorian
+                anniversary.save()
+
+            decedent.anniversary = anniversary
+
+        Decedent.objects.bulk_update(chunk, ["anniversary"])
+        last_pk = chunk[-1].pk
+
+
+def backfill_reverse(apps, schema_editor):
+    Decedent = apps.get_model("yahrzeit_app", "Decedent")
+    last_pk = 0
+
+    while True:
+        chunk = list(
+            Decedent.objects.filter(pk__gt=last_pk)
+            .select_related("anniversary")
+            .order_by("pk")[:CHUNK_SIZE]
+        )
+
+        if not chunk:
+            break
+
+        for decedent in chunk:
+            decedent.next_date_hebrew = decedent.anniversary.next_date_hebrew
+            decedent.next_date_gregorian = (
+                decedent.anniversary.next_date_gregorian
+            )
+
+        Decedent.objects.bulk_update(
+            chunk,
+            ["next_date_hebrew", "next_date_gregorian"],
+        )
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("yahrzeit_app", "0005_anniversary"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, backfill_reverse),
+    ]
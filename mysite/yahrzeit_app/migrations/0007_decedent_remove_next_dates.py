@@ -0,0 +1,30 @@
+# Generated by Django 4.2.3 on 2026-10-18 11:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("yahrzeit_app", "0006_backfill_anniversaries"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="decedent",
+            name="next_date_gregorian",
+        ),
+        migrations.RemoveField(
+            model_name="decedent",
+            name="next_date_hebrew",
+        ),
+        migrations.AlterField(
+            model_name="decedent",
+            name="anniversary",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                to="yahrzeit_app.anniversary",
+            ),
+        ),
+    ]
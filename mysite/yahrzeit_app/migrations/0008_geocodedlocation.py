@@ -0,0 +1,35 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("yahrzeit_app", "0007_decedent_remove_next_dates"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeocodedLocation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=255, unique=True)),
+                ("name", models.CharField(max_length=255)),
+                ("region", models.CharField(max_length=255)),
+                ("timezone", models.CharField(max_length=64)),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                ("hits", models.PositiveIntegerField(default=0)),
+                ("fetched_at", models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
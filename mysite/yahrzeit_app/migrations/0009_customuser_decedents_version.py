@@ -0,0 +1,24 @@
+# Generated by Django 4.2.3 on 2026-10-18 09:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("yahrzeit_app", "0008_geocodedlocation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="decedents_modified",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="decedents_version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -2,6 +2,7 @@
 
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
+from django.utils import timezone
 
 
 class CustomUserManager(BaseUserManager):
@@ -21,11 +22,19 @@ class CustomUserManager(BaseUserManager):
 
 
 class CustomUser(AbstractBaseUser):
-    """Model for a User."""
+    """Model for a User.
+
+    decedents_version and decedents_modified change whenever the user's
+    decedents or their next dates do (see crud.bump_decedents_version), so
+    views can answer conditional requests without querying decedents.
+
+    """
 
     email = models.EmailField(max_length=255, unique=True)
     is_active = models.BooleanField(default=True)
     is_admin = models.BooleanField(default=False)
+    decedents_version = models.PositiveIntegerField(default=0)
+    decedents_modified = models.DateTimeField(default=timezone.now)
 
     objects = CustomUserManager()
 
@@ -41,16 +50,73 @@ class CustomUser(AbstractBaseUser):
         return self.is_admin
 
 
+class Anniversary(models.Model):
+    """Model for a Hebrew anniversary shared by all Decedents who died on it.
+
+    Keyed by Hebrew month and day, and holding the next occurrence, so a
+    rollover only has to update the few hundred anniversaries that exist.
+    Hebrew dates are packed into integers as year * 10000 + month * 100 + day
+    (see formatting.pack_hebrew).
+
+    """
+
+    month = models.PositiveSmallIntegerField()
+    day = models.PositiveSmallIntegerField()
+    next_date_hebrew = models.PositiveIntegerField()
+    next_date_gregorian = models.DateField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['month', 'day'],
+                name='anniversary_month_day_unique',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """String representation for Anniversary."""
+
+        return f"<Anniversary month={self.month} day={self.day}>"
+
+
 class Decedent(models.Model):
-    """Model for a Decedent."""
+    """Model for a Decedent.
+
+    The death date is packed like Anniversary's Hebrew dates.
+
+    """
 
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     name = models.CharField(max_length=50)
-    death_date_hebrew = models.CharField(max_length=10)
-    next_date_hebrew = models.CharField(max_length=10)
-    next_date_gregorian = models.CharField(max_length=10)
+    death_date_hebrew = models.PositiveIntegerField()
+    anniversary = models.ForeignKey(Anniversary, on_delete=models.PROTECT)
 
     def __str__(self) -> str:
         """String representation for Decedent."""
 
         return f"<Decedent name={self.name}>"
+
+
+class GeocodedLocation(models.Model):
+    """Model for a cached geocoding and timezone lookup.
+
+    Keyed by the normalized location string that was looked up (see
+    geocoding.normalize_location). Entries expire geocoding.CACHE_TTL after
+    they were fetched, and hits counts lookups so that popular locations can
+    be warmed before they expire.
+
+    """
+
+    key = models.CharField(max_length=255, unique=True)
+    name = models.CharField(max_length=255)
+    region = models.CharField(max_length=255)
+    timezone = models.CharField(max_length=64)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    hits = models.PositiveIntegerField(default=0)
+    fetched_at = models.DateTimeField(db_index=True)
+
+    def __str__(self) -> str:
+        """String representation for GeocodedLocation."""
+
+        return f"<GeocodedLocation key={self.key}>"
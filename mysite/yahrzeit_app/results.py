@@ -0,0 +1,95 @@
+"""Calculation results kept in a signed cookie for Yahrzeit app.
+
+The latest calculation result is kept on the client until the visitor
+saves it, logs in or creates an account, so calculating doesn't write a
+session row for every anonymous visitor. The cookie holds the result
+compactly, with the Hebrew dates packed as in the database (see
+formatting.pack_hebrew) and the Gregorian date as an ordinal, and is
+signed so that it can't be edited.
+
+Results are handled as dicts of YYYY-MM-DD strings, the form the session
+used to hold them in and crud.create_decedent takes.
+
+"""
+
+from datetime import date
+from typing import Union
+from django.conf import settings
+from django.core import signing
+from django.http import HttpRequest, HttpResponse
+from yahrzeit_app import formatting
+
+COOKIE_NAME = 'yahrzeit_result'
+SALT = 'yahrzeit_app.results'
+MAX_AGE = settings.SESSION_COOKIE_AGE
+
+DORMANT = 'dormant'
+ACTIVE = 'active'
+
+
+def pack_result(result: dict) -> list:
+    """Pack a result dict into a compact list."""
+
+    return [
+        result['decedent_name'],
+        formatting.pack_hebrew_string(result['death_date_h']),
+        formatting.pack_hebrew_string(result['next_date_h']),
+        formatting.parse_date(result['next_date_g']).toordinal(),
+        int(result['status'] == ACTIVE),
+        int(result['after_sunset']),
+    ]
+
+
+def unpack_result(packed: list) -> dict:
+    """Unpack a list made by pack_result into a result dict.
+
+    Cookies set before after_sunset was kept don't have it, and are taken
+    to be before sunset.
+
+    """
+
+    name, death_date_h, next_date_h, next_date_g, active = packed[:5]
+    after_sunset = packed[5] if len(packed) > 5 else 0
+
+    return {
+        'decedent_name': name,
+        'death_date_h': formatting.db(*formatting.unpack_hebrew(death_date_h)),
+        'next_date_h': formatting.db(*formatting.unpack_hebrew(next_date_h)),
+        'next_date_g': date.fromordinal(next_date_g).isoformat(),
+        'after_sunset': bool(after_sunset),
+        'status': ACTIVE if active else DORMANT,
+    }
+
+
+def get_result(request: HttpRequest) -> Union[dict, None]:
+    """Return the request's result, or None if it has no valid one."""
+
+    value = request.COOKIES.get(COOKIE_NAME)
+
+    if not value:
+        return
+
+    try:
+        return unpack_result(signing.loads(value, salt=SALT, max_age=MAX_AGE))
+
+    except (signing.BadSignature, TypeError, ValueError):
+        return
+
+
+def set_result(response: HttpResponse, result: dict) -> None:
+    """Store a result in the response's cookie."""
+
+    response.set_cookie(
+        COOKIE_NAME,
+        signing.dumps(pack_result(result), salt=SALT, compress=True),
+        max_age=MAX_AGE,
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite='Lax',
+    )
+
+
+def delete_result(response: HttpResponse) -> None:
+    """Delete the result cookie."""
+
+    response.delete_cookie(COOKIE_NAME, samesite='Lax')
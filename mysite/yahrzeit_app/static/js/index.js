@@ -1,6 +1,23 @@
 'use strict';
 
 
+function showSunsetTimes(dateString, location) {
+    const TODRadios = document.getElementById('TOD-radios');
+    const url = `api/get-sunset-time/${dateString}/${location}`;
+    fetch(url)
+        .then((res) => res.json())
+        .then((resData) => {
+            let sunsetTime = resData['sunset_time'];
+            if (sunsetTime === null) {
+                sunsetTime = '\'Sunset\'';
+            }
+            document.getElementById('before-sunset-label').innerHTML = `Before ${sunsetTime}`;
+            document.getElementById('after-sunset-label').innerHTML = `After ${sunsetTime}`;
+            TODRadios.style.display = 'block';
+        });
+}
+
+
 function useAutocomplete() {
     const dateInput = document.getElementById('decedent-date');
     const TODRadios = document.getElementById('TOD-radios');
@@ -19,18 +36,7 @@ function useAutocomplete() {
     function getSunsetTimes() {
         if (dateInput.value && autoComplete.getPlace()) {
             const place = autoComplete.getPlace();
-            const url = `api/get-sunset-time/${dateInput.value}/${place.formatted_address}`;
-            fetch(url)
-                .then((res) => res.json())
-                .then((resData) => {
-                    let sunsetTime = resData['sunset_time'];
-                    if (sunsetTime === null) {
-                        sunsetTime = '\'Sunset\'';
-                    }
-                    document.getElementById('before-sunset-label').innerHTML = `Before ${sunsetTime}`;
-                    document.getElementById('after-sunset-label').innerHTML = `After ${sunsetTime}`;
-                    TODRadios.style.display = 'block';
-                });
+            showSunsetTimes(dateInput.value, place.formatted_address);
         }
     }
 
@@ -38,3 +44,38 @@ function useAutocomplete() {
 
     autoComplete.addListener('place_changed', getSunsetTimes);
 }
+
+
+function useLocalAutocomplete() {
+    const dateInput = document.getElementById('decedent-date');
+    const TODRadios = document.getElementById('TOD-radios');
+    TODRadios.style.display = 'none';
+
+    const locationInput = document.getElementById('location');
+    const locationOptions = document.getElementById('location-options');
+    let labels = [];
+
+    function getLocations() {
+        const url = `api/locations?q=${encodeURIComponent(locationInput.value)}`;
+        fetch(url)
+            .then((res) => res.json())
+            .then((resData) => {
+                labels = resData['locations'].map((location) => location['label']);
+                locationOptions.replaceChildren(...labels.map((label) => {
+                    const option = document.createElement('option');
+                    option.value = label;
+                    return option;
+                }));
+            });
+    }
+
+    function getSunsetTimes() {
+        if (dateInput.value && labels.includes(locationInput.value)) {
+            showSunsetTimes(dateInput.value, locationInput.value);
+        }
+    }
+
+    locationInput.addEventListener('input', getLocations);
+    locationInput.addEventListener('change', getSunsetTimes);
+    dateInput.addEventListener('change', getSunsetTimes);
+}
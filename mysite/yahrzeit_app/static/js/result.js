@@ -1,19 +1,43 @@
 'use strict';
 
-const csrfToken = Cookies.get('csrftoken');
+// Shared result pages carry the result to save, since they are served
+// without cookies. Other result pages save the result in the cookie.
+const saveDataElement = document.getElementById('save-data');
+const saveData = saveDataElement ? saveDataElement.textContent : undefined;
 
 
-if (document.getElementById('create-acct')) {
-    document.getElementById('create-acct').addEventListener('click', () => {
-        fetch('api/activate-res', {
+function getCsrfToken() {
+    const csrfToken = Cookies.get('csrftoken');
+
+    if (csrfToken) {
+        return Promise.resolve(csrfToken);
+    }
+
+    return fetch('/yahrzeit/api/csrf').then(() => {
+        return Cookies.get('csrftoken');
+    });
+}
+
+
+function postResult(url) {
+    return getCsrfToken().then((csrfToken) => {
+        return fetch(url, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
                 'X-CSRFToken': csrfToken,
             },
-        }).then((res) => {
-            return res.json();
-        }).then((resData) => {
+            body: saveData,
+        });
+    }).then((res) => {
+        return res.json();
+    });
+}
+
+
+if (document.getElementById('create-acct')) {
+    document.getElementById('create-acct').addEventListener('click', () => {
+        postResult('/yahrzeit/api/activate-res').then((resData) => {
             console.log(resData.status);
             window.location.href = '/yahrzeit/create-account-form';
         });
@@ -21,33 +45,28 @@ if (document.getElementById('create-acct')) {
 
 
     document.getElementById('login').addEventListener('click', () => {
-        fetch('api/activate-res', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': csrfToken,
-            },
-        }).then((res) => {
-            return res.json();
-        }).then((resData) => {
+        postResult('/yahrzeit/api/activate-res').then((resData) => {
             console.log(resData.status);
             window.location.href = '/yahrzeit/login-form';
         });
     });
+}
+
 
-} else {
+if (document.getElementById('save-res')) {
     document.getElementById('save-res').addEventListener('click', () => {
-        fetch('api/save-res', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': csrfToken,
-            },
-        }).then((res) => {
-            return res.json();
-        }).then((resData) => {
+        postResult('/yahrzeit/api/save-res').then((resData) => {
             console.log(resData.status);
-            window.location.href = '/yahrzeit/dashboard';
+
+            const saveOptions = document.getElementById('save-options');
+
+            if (resData.status !== 'success' && saveOptions) {
+                // Not logged in, so offer to create an account or log in.
+                document.getElementById('save-res').style.display = 'none';
+                saveOptions.style.display = 'block';
+            } else {
+                window.location.href = '/yahrzeit/dashboard';
+            }
         });
     });
 }
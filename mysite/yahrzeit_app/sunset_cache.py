@@ -0,0 +1,292 @@
+"""Coalesced, cached sunset lookups for Yahrzeit app.
+
+Sunset times are cached by date and by coordinates rounded to
+COORDINATE_PLACES decimal places (about a kilometre), so every spelling of
+a place shares an entry. They are calculated at the rounded coordinates, so
+an entry doesn't depend on which spelling filled it. Moving a kilometre
+east or west moves sunset by a few seconds.
+
+Concurrent lookups of the same date and location string share one
+in-flight calculation instead of each resolving the location and
+calculating the sunset. The in-flight table and the cache are guarded by
+locks, so this works for threads under WSGI. Async views use
+aget_sunset_time, which also coalesces on the event loop, so that requests
+waiting on the same lookup don't each hold a worker thread.
+
+"""
+
+import asyncio
+from collections import Counter, OrderedDict
+from threading import Event, Lock
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, Union
+from asgiref.sync import sync_to_async
+from astral import LocationInfo
+from django.db import close_old_connections
+from yahrzeit_app import geocoding, helpers
+
+COORDINATE_PLACES = 2
+CACHE_SIZE = 10000
+
+
+class SingleFlight:
+    """Runs one call at a time per key and shares its result.
+
+    Callers that ask for a key while a call for it is running wait for that
+    call and get its result, or its exception, instead of calling again.
+
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.calls = {}
+        self.counters = Counter()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Call fn, or wait for the running call for key."""
+
+        with self.lock:
+            call = self.calls.get(key)
+
+            if call is None:
+                call = self.calls[key] = {'done': Event()}
+                leader = True
+
+            else:
+                self.counters['coalesced'] += 1
+                leader = False
+
+        if not leader:
+            call['done'].wait()
+
+            if 'error' in call:
+                raise call['error']
+
+            return call['result']
+
+        try:
+            call['result'] = fn()
+
+        except Exception as e:
+            call['error'] = e
+            raise
+
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+            call['done'].set()
+
+        return call['result']
+
+
+class AsyncSingleFlight:
+    """Runs one coroutine at a time per key and event loop.
+
+    Coroutines that ask for a key while one for it is running await that
+    one instead. Waiters are shielded from each other, so a cancelled
+    request doesn't cancel the shared coroutine.
+
+    """
+
+    def __init__(self):
+        self.tasks = {}
+        self.counters = Counter()
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Await fn(), or the running coroutine for key."""
+
+        loop = asyncio.get_running_loop()
+        # Tasks can only be awaited on their own loop, and under WSGI every
+        # request runs on a loop of its own.
+        loop_key = (loop, key)
+        task = self.tasks.get(loop_key)
+
+        if task is None:
+            task = self.tasks[loop_key] = loop.create_task(fn())
+            task.add_done_callback(
+                lambda _: self.tasks.pop(loop_key, None),
+            )
+
+        else:
+            self.counters['coalesced'] += 1
+
+        return await asyncio.shield(task)
+
+
+class LRUCache:
+    """Thread-safe least recently used cache that counts hits and misses."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.lock = Lock()
+        self.entries = OrderedDict()
+        self.counters = Counter()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the value for key, or default if it isn't cached."""
+
+        with self.lock:
+            if key not in self.entries:
+                self.counters['misses'] += 1
+                return default
+
+            self.counters['hits'] += 1
+            self.entries.move_to_end(key)
+
+            return self.entries[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Cache a value, evicting the least recently used one if full."""
+
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Empty the cache."""
+
+        with self.lock:
+            self.entries.clear()
+
+
+_flights = SingleFlight()
+_async_flights = AsyncSingleFlight()
+_cache = LRUCache(CACHE_SIZE)
+# Distinguishes a cached None (no sunset that day) from a miss.
+_MISSING = object()
+
+
+def quantize(location: LocationInfo) -> Tuple[float, float, str]:
+    """Return the rounded coordinates and timezone of a location."""
+
+    return (
+        round(location.latitude, COORDINATE_PLACES),
+        round(location.longitude, COORDINATE_PLACES),
+        location.timezone,
+    )
+
+
+def get_sunset_time_at(
+    date_string: str,
+    location: LocationInfo,
+) -> Union[str, None]:
+    """Get time of sunset on given day at a resolved location, cached."""
+
+    latitude, longitude, tz = quantize(location)
+    key = (latitude, longitude, tz, helpers.date_from_string(date_string))
+
+    sunset_time = _cache.get(key, _MISSING)
+
+    if sunset_time is _MISSING:
+        sunset_time = helpers.get_sunset_time_at(
+            date_string,
+            LocationInfo(
+                location.name,
+                location.region,
+                tz,
+                latitude,
+                longitude,
+            ),
+        )
+        _cache.set(key, sunset_time)
+
+    return sunset_time
+
+
+def get_sunset_time(
+    date_string: str,
+    location_string: str,
+) -> Union[str, None]:
+    """Get time of sunset on given day at given location.
+
+    Concurrent calls for the same date and location share one lookup.
+    Return None if the location can't be found or the sun doesn't set.
+    Raises ValueError for a malformed date and maps.MapsUnavailableError if
+    the location can't be resolved.
+
+    """
+
+    def lookup() -> Union[str, None]:
+        location = geocoding.lookup_location(location_string)
+
+        if location is None:
+            return
+
+        return get_sunset_time_at(date_string, location)
+
+    return _flights.do(
+        (date_string, geocoding.normalize_location(location_string)),
+        lookup,
+    )
+
+
+def _get_sunset_time_in_worker(
+    date_string: str,
+    location_string: str,
+) -> Union[str, None]:
+    """Call get_sunset_time in an executor thread.
+
+    Django only closes database connections in request threads. So this
+    closes the thread's connection afterwards, as CONN_MAX_AGE says.
+
+    """
+
+    try:
+        return get_sunset_time(date_string, location_string)
+
+    finally:
+        close_old_connections()
+
+
+async def aget_sunset_time(
+    date_string: str,
+    location_string: str,
+) -> Union[str, None]:
+    """Async version of get_sunset_time.
+
+    The lookup makes blocking calls to Google Maps and the database, so it
+    runs in a worker thread, and concurrent calls for the same date and
+    location share that thread. The thread's database connection is closed
+    once the lookup is done.
+
+    """
+
+    return await _async_flights.do(
+        (date_string, geocoding.normalize_location(location_string)),
+        lambda: sync_to_async(
+            _get_sunset_time_in_worker,
+            thread_sensitive=False,
+        )(
+            date_string,
+            location_string,
+        ),
+    )
+
+
+def stats() -> Dict[str, int]:
+    """Return the hit, miss and coalesce counters for this process."""
+
+    return {
+        'hits': _cache.counters['hits'],
+        'misses': _cache.counters['misses'],
+        'coalesced': (
+            _flights.counters['coalesced']
+            + _async_flights.counters['coalesced']
+        ),
+    }
+
+
+def reset() -> None:
+    """Empty the cache and zero the counters."""
+
+    _cache.clear()
+    _cache.counters.clear()
+    _flights.counters.clear()
+    _async_flights.counters.clear()
@@ -0,0 +1,167 @@
+"""Unit tests for calendar_feed module."""
+
+from unittest import mock
+from django.core import signing
+from django.core.cache import cache
+from django.test import Client, TestCase
+from .. import calendar_feed, crud
+from ..models import CustomUser
+
+c = Client()
+
+
+class CalendarFeedTestCase(TestCase):
+    """Tests for iCalendar feeds."""
+
+    def setUp(self):
+        """Set-up to happen before each test.
+
+        Empty the cache and create a user with two decedents.
+
+        """
+
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email='test@test.test',
+            password='testpassword',
+        )
+        crud.create_decedent(
+            self.user,
+            'TestDecedent1',
+            '5782-11-30',
+            '5784-11-30',
+            '2024-02-09',
+        )
+        crud.create_decedent(
+            self.user,
+            'Test, Decedent; 2',
+            '5783-12-09',
+            '5784-12-09',
+            '2024-02-18',
+        )
+        token = calendar_feed.feed_token(self.user)
+        self.url = f'/yahrzeit/calendar/{token}.ics'
+
+    def test_feed_token(self):
+        """Test that feed tokens round trip and can't be forged."""
+
+        token = calendar_feed.feed_token(self.user)
+
+        self.assertEqual(calendar_feed.user_pk_from_token(token), self.user.pk)
+
+        with self.assertRaises(signing.BadSignature):
+            calendar_feed.user_pk_from_token(f'{self.user.pk + 1}:x')
+
+    def test_fold(self):
+        """Test that long lines are folded without splitting characters."""
+
+        line = 'SUMMARY:' + 'א' * 60
+        folded = calendar_feed.fold(line)
+
+        self.assertTrue(folded.endswith('\r\n'))
+        self.assertEqual(folded.replace('\r\n ', '')[:-2], line)
+
+        for part in folded[:-2].split('\r\n'):
+            self.assertLessEqual(len(part.encode()), 75)
+
+    def test_get_calendar_feed(self):
+        """Test the get_calendar_feed view function.
+
+        Verify that the feed streams an event for each of a decedent's years
+        with escaped text, and that a bad token is not found.
+
+        """
+
+        response = c.get(self.url, {'years': 3})
+        feed = b''.join(response.streaming_content).decode()
+
+        self.assertEqual(
+            response['Content-Type'],
+            'text/calendar; charset=utf-8',
+        )
+        self.assertTrue(feed.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(feed.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(feed.count('BEGIN:VEVENT'), 6)
+        self.assertIn('DTSTART;VALUE=DATE:20240209\r\n', feed)
+        self.assertIn(
+            "SUMMARY:Test\\, Decedent\\; 2's yahrzeit\r\n",
+            feed,
+        )
+
+        self.assertEqual(c.get('/yahrzeit/calendar/1:x.ics').status_code, 404)
+
+    def test_adar_two_feed(self):
+        """Test that an Adar II anniversary stays in Adar II.
+
+        Create a decedent who died in Adar II whose next yahrzeit is in a
+        common year's Adar, and verify that the following leap year's event
+        is on 9 Adar II, not 9 Adar I.
+
+        """
+
+        user = CustomUser.objects.create_user(
+            email='adar@test.test',
+            password='testpassword',
+        )
+        crud.create_decedent(
+            user,
+            'TestDecedent3',
+            '5784-13-09',
+            '5786-12-09',
+            '2026-02-26',
+        )
+
+        feed = ''.join(calendar_feed.iter_feed(user, 3))
+
+        self.assertIn('DTSTART;VALUE=DATE:20260226\r\n', feed)
+        self.assertIn(
+            'DTSTART;VALUE=DATE:20270318\r\n',
+            feed,
+            'The leap year yahrzeit should be on 9 Adar II 5787',
+        )
+        self.assertNotIn('DTSTART;VALUE=DATE:20270216\r\n', feed)
+        self.assertIn('DTSTART;VALUE=DATE:20280307\r\n', feed)
+
+    def test_feed_caching(self):
+        """Test that feeds are cheap to serve repeatedly.
+
+        Verify that a repeat request with the feed's ETag gets a 304, that
+        events are built once per decedent and reused, and that adding a
+        decedent changes the ETag and builds only its events.
+
+        """
+
+        with mock.patch.object(
+            calendar_feed,
+            'build_events',
+            wraps=calendar_feed.build_events,
+        ) as build_events:
+            response = c.get(self.url)
+            b''.join(response.streaming_content)
+            etag = response['ETag']
+            self.assertEqual(build_events.call_count, 2)
+
+            cached_response = c.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(cached_response.status_code, 304)
+
+            crud.create_decedent(
+                self.user,
+                'TestDecedent3',
+                '5783-12-10',
+                '5784-12-10',
+                '2024-02-19',
+            )
+            response = c.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            feed = b''.join(response.streaming_content).decode()
+
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            self.assertEqual(
+                feed.count('BEGIN:VEVENT'),
+                3 * calendar_feed.FEED_YEARS,
+            )
+            self.assertEqual(
+                build_events.call_count,
+                3,
+                "Only the new decedent's events should be built",
+            )
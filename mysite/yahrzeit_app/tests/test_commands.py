@@ -0,0 +1,278 @@
+"""Unit tests for management commands."""
+
+from datetime import date
+from io import StringIO
+from importlib import import_module
+import os
+from unittest import mock
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from ..models import CustomUser, Anniversary, Decedent
+
+
+class RolloverYahrzeitsTestCase(TestCase):
+    """Tests for the rollover_yahrzeits command."""
+
+    def setUp(self):
+        """Set-up to happen before each test.
+
+        Create five stale anniversaries in Iyar, one stale anniversary in
+        Teves and one current anniversary, with decedents for two users.
+
+        """
+
+        test_user1 = CustomUser.objects.create_user(
+            email='test1@test.test',
+            password='testpassword',
+        )
+        test_user2 = CustomUser.objects.create_user(
+            email='test2@test.test',
+            password='testpassword',
+        )
+
+        for day in range(21, 26):
+            Decedent.objects.create(
+                user=test_user1 if day % 2 else test_user2,
+                name=f'StaleDecedent{day}',
+                death_date_hebrew=57810200 + day,
+                anniversary=Anniversary.objects.create(
+                    month=2,
+                    day=day,
+                    next_date_hebrew=57820200 + day,
+                    next_date_gregorian=date(2022, 5, day + 1),
+                ),
+            )
+        Decedent.objects.create(
+            user=test_user1,
+            name='StaleDecedentTeves',
+            death_date_hebrew=57801020,
+            anniversary=Anniversary.objects.create(
+                month=10,
+                day=20,
+                next_date_hebrew=57811020,
+                next_date_gregorian=date(2021, 1, 4),
+            ),
+        )
+        Decedent.objects.create(
+            user=test_user2,
+            name='CurrentDecedent',
+            death_date_hebrew=57831116,
+            anniversary=Anniversary.objects.create(
+                month=11,
+                day=16,
+                next_date_hebrew=57841116,
+                next_date_gregorian=date(2024, 1, 26),
+            ),
+        )
+
+    def assert_rolled_over(self):
+        """Verify the dates of every anniversary after a rollover."""
+
+        for day in range(21, 26):
+            anniversary = Anniversary.objects.get(month=2, day=day)
+            self.assertEqual(
+                (
+                    anniversary.next_date_hebrew,
+                    anniversary.next_date_gregorian,
+                ),
+                (57830200 + day, date(2023, 5, day - 9)),
+                f'{day} Iyar was not rolled over correctly',
+            )
+
+        anniversary = Anniversary.objects.get(month=10, day=20)
+        self.assertEqual(
+            (anniversary.next_date_hebrew, anniversary.next_date_gregorian),
+            (57841020, date(2024, 1, 1)),
+            '20 Teves was not rolled over correctly',
+        )
+
+        anniversary = Anniversary.objects.get(month=11, day=16)
+        self.assertEqual(
+            (anniversary.next_date_hebrew, anniversary.next_date_gregorian),
+            (57841116, date(2024, 1, 26)),
+            '16 Shevat is not stale and should not change',
+        )
+
+    def test_rollover_yahrzeits(self):
+        """Test the command in a single process with small chunks.
+
+        Verify that every stale anniversary is rolled over, across chunks,
+        and that the command reports how many were updated.
+
+        """
+
+        out = StringIO()
+        call_command(
+            'rollover_yahrzeits',
+            '--as-of=2023-03-11',
+            '--chunk-size=2',
+            stdout=out,
+        )
+
+        self.assert_rolled_over()
+        self.assertIn('Rolled over 6 anniversaries', out.getvalue())
+
+        out = StringIO()
+        call_command('rollover_yahrzeits', '--as-of=2023-03-11', stdout=out)
+        self.assertIn(
+            'Rolled over 0 anniversaries',
+            out.getvalue(),
+            'A second run should have nothing to do',
+        )
+
+    def test_rollover_yahrzeits_workers(self):
+        """Test the command with a pool of worker processes."""
+
+        out = StringIO()
+        call_command(
+            'rollover_yahrzeits',
+            '--as-of=2023-03-11',
+            '--chunk-size=2',
+            '--workers=2',
+            stdout=out,
+        )
+
+        self.assert_rolled_over()
+        self.assertIn('Rolled over 6 anniversaries', out.getvalue())
+
+    def test_rollover_yahrzeits_missing_day(self):
+        """Test the command with an anniversary that has no date next year.
+
+        Verify that 30 Cheshvan, rolled over into a year when Cheshvan has
+        29 days, is logged and left as it is, and that the other stale
+        anniversaries in its chunk are still rolled over.
+
+        """
+
+        Anniversary.objects.create(
+            month=8,
+            day=30,
+            next_date_hebrew=57870830,
+            next_date_gregorian=date(2026, 11, 10),
+        )
+
+        out = StringIO()
+        with self.assertLogs(
+            'yahrzeit_app.management.commands.rollover_yahrzeits',
+            level='WARNING',
+        ):
+            call_command(
+                'rollover_yahrzeits',
+                '--as-of=2027-12-05',
+                '--chunk-size=10',
+                stdout=out,
+            )
+
+        self.assertIn('Rolled over 7 anniversaries', out.getvalue())
+
+        anniversary = Anniversary.objects.get(month=8, day=30)
+        self.assertEqual(
+            (anniversary.next_date_hebrew, anniversary.next_date_gregorian),
+            (57870830, date(2026, 11, 10)),
+            '30 Cheshvan has no date in 5789 and should not change',
+        )
+        self.assertFalse(
+            Anniversary.objects.exclude(month=8).filter(
+                next_date_gregorian__lt=date(2027, 12, 5),
+            ).exists(),
+            'Every other anniversary should be rolled over',
+        )
+
+
+class PruneSessionsTestCase(TestCase):
+    """Test for the prune_sessions command."""
+
+    def test_prune_sessions(self):
+        """Test the prune_sessions command.
+
+        Create an expired session, an anonymous session and a logged in
+        user's session. Verify that by default only the expired session is
+        deleted, and that --anonymous also deletes the anonymous one.
+
+        """
+
+        store_class = import_module(settings.SESSION_ENGINE).SessionStore
+
+        expired = store_class()
+        expired['result'] = {}
+        expired.set_expiry(-1)
+        expired.create()
+        anonymous = store_class()
+        anonymous['result'] = {}
+        anonymous.create()
+
+        CustomUser.objects.create_user(
+            email='test@test.test',
+            password='testpassword',
+        )
+        client = Client()
+        client.login(email='test@test.test', password='testpassword')
+
+        out = StringIO()
+        call_command('prune_sessions', stdout=out)
+        self.assertIn('Deleted 1 expired sessions', out.getvalue())
+        self.assertEqual(Session.objects.count(), 2)
+
+        call_command('prune_sessions', '--anonymous', '--chunk-size=1',
+                     stdout=out)
+        self.assertIn('Deleted 1 anonymous sessions', out.getvalue())
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)),
+            [client.session.session_key],
+            "Only the logged in user's session should be left",
+        )
+        self.assertFalse(
+            store_class().exists(anonymous.session_key),
+            'The anonymous session should be gone from the cache too',
+        )
+
+
+class BenchmarkStartupTestCase(TestCase):
+    """Test for the benchmark_startup command."""
+
+    def test_benchmark_startup(self):
+        """Test the benchmark_startup command.
+
+        Run it without the Google Maps keys set, and verify that the project
+        still starts and serves the calculator, that none of the deferred
+        modules are imported at startup, and that a time limit that can't
+        be met fails the command.
+
+        """
+
+        environ = {
+            key: value for key, value in os.environ.items()
+            if key not in ('GMAPS_KEY', 'JS_KEY')
+        }
+
+        with mock.patch.dict(os.environ, environ, clear=True):
+            out = StringIO()
+            call_command(
+                'benchmark_startup',
+                '/yahrzeit/',
+                '--runs=1',
+                stdout=out,
+            )
+            self.assertIn('Median import time', out.getvalue())
+            self.assertIn(
+                'Median first request to /yahrzeit/',
+                out.getvalue(),
+            )
+            self.assertIn('(200)', out.getvalue())
+            self.assertIn(
+                'Deferred modules loaded at startup: none',
+                out.getvalue(),
+                'NumPy, googlemaps and timezonefinder should load on first '
+                'use',
+            )
+
+            with self.assertRaises(CommandError):
+                call_command(
+                    'benchmark_startup',
+                    '/yahrzeit/',
+                    '--runs=1',
+                    '--max-import-time=0',
+                    stdout=StringIO(),
+                )
@@ -1,8 +1,10 @@
 """Unit tests for CRUD module."""
 
+from datetime import date
+from unittest import mock
 from django.test import TestCase
 from .. import crud
-from ..models import CustomUser, Decedent
+from ..models import CustomUser, Anniversary, Decedent
 
 
 class CRUDUserTestCase(TestCase):
@@ -102,44 +104,68 @@ class CRUDDecedentTestCase(TestCase):
         Decedent.objects.create(
             user=self.test_user1,
             name='TestDecedent1',
-            death_date_hebrew='5783-10-11',
-            next_date_hebrew='5784-10-11',
-            next_date_gregorian='2023-12-23',
+            death_date_hebrew=57831011,
+            anniversary=Anniversary.objects.create(
+                month=10,
+                day=11,
+                next_date_hebrew=57841011,
+                next_date_gregorian=date(2023, 12, 23),
+            ),
         )
         Decedent.objects.create(
             user=self.test_user1,
             name='TestDecedent2',
-            death_date_hebrew='5779-03-22',
-            next_date_hebrew='5783-03-22',
-            next_date_gregorian='2023-06-11',
+            death_date_hebrew=57790322,
+            anniversary=Anniversary.objects.create(
+                month=3,
+                day=22,
+                next_date_hebrew=57830322,
+                next_date_gregorian=date(2023, 6, 11),
+            ),
         )
         Decedent.objects.create(
             user=self.test_user1,
             name='TestDecedent3',
-            death_date_hebrew='5778-08-28',
-            next_date_hebrew='5784-08-28',
-            next_date_gregorian='2023-11-12',
+            death_date_hebrew=57780828,
+            anniversary=Anniversary.objects.create(
+                month=8,
+                day=28,
+                next_date_hebrew=57840828,
+                next_date_gregorian=date(2023, 11, 12),
+            ),
         )
         Decedent.objects.create(
             user=self.test_user2,
             name='TestDecedent4',
-            death_date_hebrew='5783-11-16',
-            next_date_hebrew='5784-11-16',
-            next_date_gregorian='2024-01-26',
+            death_date_hebrew=57831116,
+            anniversary=Anniversary.objects.create(
+                month=11,
+                day=16,
+                next_date_hebrew=57841116,
+                next_date_gregorian=date(2024, 1, 26),
+            ),
         )
         Decedent.objects.create(
             user=self.test_user2,
             name='TestDecedent5',
-            death_date_hebrew='5781-02-21',
-            next_date_hebrew='5782-02-21',
-            next_date_gregorian='2022-05-22',
+            death_date_hebrew=57810221,
+            anniversary=Anniversary.objects.create(
+                month=2,
+                day=21,
+                next_date_hebrew=57820221,
+                next_date_gregorian=date(2022, 5, 22),
+            ),
         )
         Decedent.objects.create(
             user=self.test_user2,
             name='TestDecedent6',
-            death_date_hebrew='5780-10-20',
-            next_date_hebrew='5781-10-20',
-            next_date_gregorian='2021-01-04',
+            death_date_hebrew=57801020,
+            anniversary=Anniversary.objects.create(
+                month=10,
+                day=20,
+                next_date_hebrew=57811020,
+                next_date_gregorian=date(2021, 1, 4),
+            ),
         )
 
     def test_create_decedent(self):
@@ -165,59 +191,158 @@ class CRUDDecedentTestCase(TestCase):
         test_decedent = Decedent.objects.filter(name='TestDecedent7').first()
         self.assertEqual(
             test_decedent.death_date_hebrew,
-            '5783-12-09',
+            57831209,
             'death_date_hebrew should equal corresponding argument',
         )
         self.assertEqual(
-            test_decedent.next_date_hebrew,
-            '5784-12-09',
+            (test_decedent.anniversary.month, test_decedent.anniversary.day),
+            (12, 9),
+            'Decedent should be linked to the 9 Adar anniversary',
+        )
+        self.assertEqual(
+            test_decedent.anniversary.next_date_hebrew,
+            57841209,
             'next_date_hebrew should equal corresponding argument',
         )
         self.assertEqual(
-            test_decedent.next_date_gregorian,
-            '2024-02-18',
+            test_decedent.anniversary.next_date_gregorian,
+            date(2024, 2, 18),
             'next_date_gregorian should equal corresponding argument',
         )
 
-    def test_get_decedents_for_user(self):
-        """Test the get_decedents_for_user function.
+        crud.create_decedent(
+            CustomUser.objects.get(pk=2),
+            'TestDecedent8',
+            '5782-12-09',
+            '5784-12-09',
+            '2024-02-18',
+        )
+        self.assertEqual(
+            Decedent.objects.get(name='TestDecedent8').anniversary,
+            test_decedent.anniversary,
+            'Decedents with the same yahrzeit should share an anniversary',
+        )
+
+        crud.create_decedent(
+            CustomUser.objects.get(pk=2),
+            'TestDecedent9',
+            '5782-13-09',
+            '5783-12-09',
+            '2023-03-02',
+        )
+        self.assertEqual(
+            Decedent.objects.get(name='TestDecedent9').anniversary.month,
+            13,
+            'A death in Adar II should keep an Adar II anniversary',
+        )
+
+        crud.create_decedent(
+            CustomUser.objects.get(pk=2),
+            'TestDecedent10',
+            '5782-12-30',
+            '5783-12-01',
+            '2023-02-22',
+            after_sunset=True,
+        )
+        self.assertEqual(
+            (
+                Decedent.objects.get(name='TestDecedent10').anniversary.month,
+                Decedent.objects.get(name='TestDecedent10').anniversary.day,
+            ),
+            (13, 1),
+            'A death after sunset on 30 Adar I should be on 1 Adar II',
+        )
+
+    async def test_acreate_decedent(self):
+        """Test the acreate_decedent function.
 
-        Check that the QuerySet returned by the function when it is called
-        on user 1 has a length of 3 and that the names for the three decedents
-        match those of the decedents instantiated in setUp. Verify that the
-        QuerySet returned for a nonexistant user and the QuerySet returned for
-        a user with no decedents have lengths of 0.
+        Verify that the async version creates a decedent linked to the same
+        anniversary that create_decedent would use, and that acreate_user
+        creates a user only for an unused email.
 
         """
 
-        user1_decedents = crud.get_decedents_for_user(self.test_user1)
-        self.assertEqual(
-            len(user1_decedents),
-            3,
-            'User 1 should have three decedents',
+        await crud.acreate_decedent(
+            self.test_user3,
+            'TestDecedent10',
+            '5783-12-09',
+            '5784-12-09',
+            '2024-02-18',
         )
 
+        test_decedent = await Decedent.objects.select_related(
+            'anniversary',
+        ).aget(name='TestDecedent10')
+        self.assertEqual(test_decedent.death_date_hebrew, 57831209)
         self.assertEqual(
-            set(user1_decedents.keys()),
-            {
-                'TestDecedent1',
-                'TestDecedent2',
-                'TestDecedent3',
-            },
-            'Decedent names should match TestDecedent(1,2,3)',
+            (test_decedent.anniversary.month, test_decedent.anniversary.day),
+            (12, 9),
+            'Decedent should be linked to the 9 Adar anniversary',
         )
 
-        # self.assertEqual(
-        #     len(crud.get_decedents_for_user(4)),
-        #     0,
-        #     'A nonexistant user should have no decedents',
-        # )
+        self.assertIsNotNone(
+            await crud.acreate_user('test4@test.test', 'testpassword'),
+        )
+        self.assertIsNone(
+            await crud.acreate_user('test4@test.test', 'testpassword'),
+            'acreate_user should return None because that email is taken',
+        )
+
+    def test_get_decedents_page(self):
+        """Test the get_decedents_page function.
+
+        Check that the rows returned for user 1 are its three decedents
+        ordered by next yahrzeit, and that the rows returned for a user with
+        no decedents are empty. Page through user 1's decedents one at a time
+        and verify that the pages continue from each other, that decedents
+        sharing a name and a yahrzeit are all returned, and that a malformed
+        cursor raises ValueError.
+
+        """
+
+        user1_decedents, next_cursor = crud.get_decedents_page(
+            self.test_user1,
+        )
         self.assertEqual(
-            len(crud.get_decedents_for_user(self.test_user3)),
-            0,
+            [decedent.name for decedent in user1_decedents],
+            ['TestDecedent2', 'TestDecedent3', 'TestDecedent1'],
+            'Decedents should be ordered by next yahrzeit',
+        )
+        self.assertIsNone(next_cursor, 'There should be no next page')
+        self.assertEqual(
+            crud.get_decedents_page(self.test_user3),
+            ([], None),
             'User 3 should have no decedents',
         )
 
+        duplicate = Decedent.objects.get(name='TestDecedent3')
+        duplicate.pk = None
+        duplicate.save()
+
+        names = []
+        next_cursor = None
+        for _ in range(4):
+            page, next_cursor = crud.get_decedents_page(
+                self.test_user1,
+                next_cursor,
+                limit=1,
+            )
+            names.extend(decedent.name for decedent in page)
+        self.assertEqual(
+            names,
+            [
+                'TestDecedent2',
+                'TestDecedent3',
+                'TestDecedent3',
+                'TestDecedent1',
+            ],
+            'Pages should include every decedent exactly once',
+        )
+        self.assertIsNone(next_cursor, 'The last page should have no cursor')
+
+        with self.assertRaises(ValueError):
+            crud.get_decedents_page(self.test_user1, 'not-a-cursor')
+
     def test_update_decedents_for_user(self):
         """Test the update_decedents_for_user function.
 
@@ -226,23 +351,180 @@ class CRUDDecedentTestCase(TestCase):
         """
 
         crud.update_decedents_for_user(CustomUser.objects.get(pk=2))
+        anniversary5 = Decedent.objects.get(name='TestDecedent5').anniversary
+        anniversary6 = Decedent.objects.get(name='TestDecedent6').anniversary
         self.assertEqual(
-            Decedent.objects.get(name='TestDecedent5').next_date_hebrew,
-            '5783-02-21',
+            anniversary5.next_date_hebrew,
+            57830221,
             'TestDecedent5\'s next_date_hebrew should update to 5783-02-21',
         )
         self.assertEqual(
-            Decedent.objects.get(name='TestDecedent5').next_date_gregorian,
-            '2023-05-12',
+            anniversary5.next_date_gregorian,
+            date(2023, 5, 12),
             'TestDecedent5\'s next_date_gregorian should update to 2023-05-12',
         )
         self.assertEqual(
-            Decedent.objects.get(name='TestDecedent6').next_date_hebrew,
-            '5784-10-20',
+            anniversary6.next_date_hebrew,
+            57841020,
             'TestDecedent6\'s next_date_hebrew should update to 5784-10-20',
         )
         self.assertEqual(
-            Decedent.objects.get(name='TestDecedent6').next_date_gregorian,
-            '2024-01-01',
+            anniversary6.next_date_gregorian,
+            date(2024, 1, 1),
             'TestDecedent6\'s next_date_gregorian should update to 2024-01-01',
         )
+
+    def test_update_decedents_for_user_grouped(self):
+        """Test update_decedents_for_user on a fixed day.
+
+        Add a second decedent sharing TestDecedent5's anniversary and verify
+        that the anniversary is rolled over once for both, in a single
+        UPDATE, and that an anniversary still ahead isn't touched.
+
+        """
+
+        Decedent.objects.create(
+            user=self.test_user2,
+            name='TestDecedent7',
+            death_date_hebrew=57800221,
+            anniversary=Decedent.objects.get(
+                name='TestDecedent5',
+            ).anniversary,
+        )
+
+        with mock.patch.object(
+            crud,
+            'today_date',
+            return_value=date(2023, 3, 11),
+        ):
+            # SELECT of stale anniversaries, one bulk UPDATE, one UPDATE
+            # of the users' decedents versions, and the savepoint around
+            # them.
+            with self.assertNumQueries(5):
+                crud.update_decedents_for_user(self.test_user2)
+
+        for name in ('TestDecedent5', 'TestDecedent7'):
+            decedent = Decedent.objects.get(name=name)
+            self.assertEqual(
+                (
+                    decedent.anniversary.next_date_hebrew,
+                    decedent.anniversary.next_date_gregorian,
+                ),
+                (57830221, date(2023, 5, 12)),
+                f'{name} should update to 5783-02-21',
+            )
+
+        decedent = Decedent.objects.get(name='TestDecedent6')
+        self.assertEqual(
+            (
+                decedent.anniversary.next_date_hebrew,
+                decedent.anniversary.next_date_gregorian,
+            ),
+            (57841020, date(2024, 1, 1)),
+            'TestDecedent6 should update to 5784-10-20',
+        )
+
+        decedent = Decedent.objects.get(name='TestDecedent4')
+        self.assertEqual(
+            (
+                decedent.anniversary.next_date_hebrew,
+                decedent.anniversary.next_date_gregorian,
+            ),
+            (57841116, date(2024, 1, 26)),
+            'TestDecedent4 is not stale and should not change',
+        )
+
+    def test_update_decedents_for_user_missing_day(self):
+        """Test update_decedents_for_user with a day missing next year.
+
+        Give user 2 a decedent on 30 Cheshvan and roll over into a year when
+        Cheshvan has 29 days. Verify that the anniversary is logged and left
+        as it is, and that the user's other anniversaries still update.
+
+        """
+
+        Decedent.objects.create(
+            user=self.test_user2,
+            name='TestDecedent7',
+            death_date_hebrew=57860830,
+            anniversary=Anniversary.objects.create(
+                month=8,
+                day=30,
+                next_date_hebrew=57870830,
+                next_date_gregorian=date(2026, 11, 10),
+            ),
+        )
+
+        with mock.patch.object(
+            crud,
+            'today_date',
+            return_value=date(2027, 12, 5),
+        ):
+            with self.assertLogs('yahrzeit_app.crud', level='WARNING'):
+                crud.update_decedents_for_user(self.test_user2)
+
+        anniversary = Decedent.objects.get(name='TestDecedent7').anniversary
+        self.assertEqual(
+            (anniversary.next_date_hebrew, anniversary.next_date_gregorian),
+            (57870830, date(2026, 11, 10)),
+            '30 Cheshvan has no date in 5789 and should not change',
+        )
+
+        anniversary = Decedent.objects.get(name='TestDecedent5').anniversary
+        self.assertGreaterEqual(
+            anniversary.next_date_gregorian,
+            date(2027, 12, 5),
+            'TestDecedent5 should still be rolled over',
+        )
+
+    def test_decedents_version(self):
+        """Test that decedent changes bump users' decedents versions.
+
+        Verify that creating a decedent bumps only its user, that catching
+        up a stale shared anniversary bumps everyone on it, and that a
+        rollover bumps only the users whose anniversaries moved.
+
+        """
+
+        def versions():
+            return list(
+                CustomUser.objects.order_by('pk').values_list(
+                    'decedents_version',
+                    flat=True,
+                ),
+            )
+
+        crud.create_decedent(
+            self.test_user3,
+            'TestDecedent7',
+            '5783-12-09',
+            '5784-12-09',
+            '2024-02-18',
+        )
+        self.assertEqual(versions(), [0, 0, 1])
+
+        crud.create_decedent(
+            self.test_user3,
+            'TestDecedent8',
+            '5781-02-21',
+            '5783-02-21',
+            '2023-05-12',
+        )
+        self.assertEqual(
+            versions(),
+            [0, 1, 2],
+            'Users sharing the caught up anniversary should be bumped',
+        )
+
+        with mock.patch.object(
+            crud,
+            'today_date',
+            return_value=date(2023, 12, 1),
+        ):
+            crud.update_decedents_for_user(self.test_user1)
+
+        self.assertEqual(
+            versions(),
+            [1, 1, 2],
+            'Only the owner of the rolled over anniversary should be bumped',
+        )
@@ -0,0 +1,115 @@
+"""Unit tests for formatting module."""
+
+from datetime import date
+from django.test import TestCase
+from pyluach import dates
+from .. import formatting, hebrew_calendar
+
+
+class ParsingTestCase(TestCase):
+    """Tests for date string parsing."""
+
+    def test_parse_date(self):
+        """Test the parse_date function.
+
+        Verify that padded and unpadded strings parse and that malformed or
+        nonexistent dates raise ValueError.
+
+        """
+
+        self.assertEqual(
+            formatting.parse_date('2023-03-11'),
+            date(2023, 3, 11),
+            'Date was not parsed correctly',
+        )
+        self.assertEqual(
+            formatting.parse_date('2023-3-1'),
+            date(2023, 3, 1),
+            'Date was not parsed correctly',
+        )
+
+        for bad_string in ('2023-02-30', '2023/03/11', '2023-03', ''):
+            with self.assertRaises(ValueError):
+                formatting.parse_date(bad_string)
+
+
+class DisplayTestCase(TestCase):
+    """Tests for display formatting."""
+
+    def test_matches_pyluach(self):
+        """Test the display functions against pyluach's formatting.
+
+        Walk several years, including leap years, and verify that display
+        strings match pyluach's %-d %B %Y output for both calendars.
+
+        """
+
+        start = hebrew_calendar.hebrew_to_ordinal(5780, 7, 1)
+        end = hebrew_calendar.hebrew_to_ordinal(5790, 7, 1)
+
+        for ordinal in range(start, end):
+            h_date = dates.HebrewDate(*hebrew_calendar.ordinal_to_hebrew(
+                ordinal,
+            ))
+            g_date = dates.GregorianDate.from_pydate(date.fromordinal(ordinal))
+
+            self.assertEqual(
+                formatting.hebrew_db_to_res(f'{h_date:%Y-%m-%d}'),
+                f'{h_date:%-d %B %Y}',
+                f'Display string for {h_date} is incorrect',
+            )
+            self.assertEqual(
+                formatting.gregorian_db_to_res(f'{g_date:%Y-%m-%d}'),
+                f'{g_date:%-d %B %Y}',
+                f'Display string for {g_date} is incorrect',
+            )
+
+    def test_hebrew_db_to_res(self):
+        """Test the hebrew_db_to_res function.
+
+        Verify Adar naming in common and leap years, and that a nonexistent
+        date raises ValueError.
+
+        """
+
+        self.assertEqual(
+            formatting.hebrew_db_to_res('5783-12-18'),
+            '18 Adar 5783',
+            'Date string should equal \'18 Adar 5783\'',
+        )
+        self.assertEqual(
+            formatting.hebrew_db_to_res('5784-12-18'),
+            '18 Adar 1 5784',
+            'Date string should equal \'18 Adar 1 5784\'',
+        )
+        self.assertEqual(
+            formatting.hebrew_db_to_res('5784-13-18'),
+            '18 Adar 2 5784',
+            'Date string should equal \'18 Adar 2 5784\'',
+        )
+
+        with self.assertRaises(ValueError):
+            formatting.hebrew_db_to_res('5783-13-18')
+
+
+class PackingTestCase(TestCase):
+    """Tests for packing Hebrew dates into integers."""
+
+    def test_pack_hebrew(self):
+        """Test that packing and unpacking a Hebrew date round-trips."""
+
+        self.assertEqual(
+            formatting.pack_hebrew_string('5783-12-18'),
+            57831218,
+            'Packed date should equal 57831218',
+        )
+        self.assertEqual(
+            formatting.unpack_hebrew(57841318),
+            (5784, 13, 18),
+            'Unpacked date should equal (5784, 13, 18)',
+        )
+        self.assertEqual(
+            formatting.hebrew_packed_to_res(57841318),
+            '18 Adar 2 5784',
+            'Date string should equal \'18 Adar 2 5784\'',
+        )
@@ -0,0 +1,94 @@
+"""Unit tests for gazetteer module."""
+
+from unittest import mock
+from astral import LocationInfo
+from django.test import TestCase, override_settings
+from .. import gazetteer, helpers, maps
+
+PLACES = (
+    LocationInfo('Springfield', 'Illinois', 'America/Chicago', 39.8, -89.6),
+    LocationInfo('Springfield', 'Missouri', 'America/Chicago', 37.2, -93.3),
+    LocationInfo('Spring', 'Texas', 'America/Chicago', 30.1, -95.4),
+    LocationInfo('Sprague', 'Washington', 'America/Los_Angeles', 47.3, -117.9),
+)
+
+
+class GazetteerTestCase(TestCase):
+    """Tests for the prefix index."""
+
+    def setUp(self):
+        """Set-up to happen before each test."""
+
+        self.gazetteer = gazetteer.Gazetteer(PLACES)
+
+    def test_search(self):
+        """Test the search method.
+
+        Verify that places come back in name order, once each, that the
+        limit applies, and that case, commas and extra spaces are ignored.
+
+        """
+
+        self.assertEqual(
+            self.gazetteer.search('spr'),
+            [PLACES[3], PLACES[2], PLACES[0], PLACES[1]],
+            'All four places should match by name prefix, in name order',
+        )
+        self.assertEqual(
+            self.gazetteer.search('SPRINGFIELD,  mis'),
+            [PLACES[1]],
+            'Name and region prefix should match Springfield, Missouri',
+        )
+        self.assertEqual(len(self.gazetteer.search('spr', 2)), 2)
+        self.assertEqual(self.gazetteer.search(''), [])
+        self.assertEqual(self.gazetteer.search('x'), [])
+
+    def test_resolve(self):
+        """Test the resolve method.
+
+        Verify that exact names and names with regions resolve, that the
+        first place loaded wins a shared name, and that prefixes don't.
+
+        """
+
+        self.assertEqual(self.gazetteer.resolve('Springfield'), PLACES[0])
+        self.assertEqual(
+            self.gazetteer.resolve('springfield, missouri'),
+            PLACES[1],
+        )
+        self.assertIsNone(self.gazetteer.resolve('Springf'))
+
+    def test_bundled_locations(self):
+        """Test that the bundled gazetteer loads and resolves places."""
+
+        location = gazetteer.get_gazetteer().resolve('Jerusalem, Israel')
+
+        self.assertEqual(location.timezone, 'Asia/Jerusalem')
+        self.assertIs(gazetteer.get_gazetteer(), gazetteer.get_gazetteer())
+
+
+class LocalGeocoderTestCase(TestCase):
+    """Test for the local geocoder backend."""
+
+    def test_fetch_location(self):
+        """Test that the local backend resolves locations offline.
+
+        Make every Google Maps call fail, then verify that fetch_location
+        still resolves a bundled city and returns None for an unknown one.
+
+        """
+
+        with override_settings(GEOCODER='local'), \
+                mock.patch.object(
+                    maps,
+                    'call',
+                    side_effect=maps.MapsUnavailableError,
+                ):
+            location = helpers.fetch_location('jerusalem')
+            nowhere = helpers.fetch_location('nowhere')
+
+        self.assertEqual(
+            (location.name, location.region, location.timezone),
+            ('Jerusalem', 'Israel', 'Asia/Jerusalem'),
+        )
+        self.assertIsNone(nowhere)
@@ -0,0 +1,167 @@
+"""Unit tests for geocoding module."""
+
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from astral import LocationInfo
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from .. import geocoding, helpers
+from ..models import GeocodedLocation
+
+ALAMEDA = LocationInfo(
+    'Alameda',
+    'United States',
+    'America/Los_Angeles',
+    37.7652,
+    -122.2416,
+)
+
+
+class LookupLocationTestCase(TestCase):
+    """Tests for cached location lookups."""
+
+    def setUp(self):
+        """Set-up to happen before each test.
+
+        Empty the in-process cache and replace remote lookups with a mock
+        that returns Alameda for any location but 'nowhere'.
+
+        """
+
+        geocoding.clear_lru()
+        geocoding.flush_hits()
+        patcher = mock.patch.object(
+            helpers,
+            'fetch_location',
+            side_effect=lambda s: None if s == 'nowhere' else ALAMEDA,
+        )
+        self.fetch_location = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(geocoding.clear_lru)
+        self.addCleanup(geocoding.flush_hits)
+
+    def test_lookup_location(self):
+        """Test the lookup_location function.
+
+        Verify that the first lookup goes remote and is stored, that a
+        repeat lookup with different spacing and case neither goes remote
+        nor queries the database, and that the database serves lookups once
+        the in-process cache is emptied. Verify that every lookup counts as
+        a hit once the counts are flushed.
+
+        """
+
+        self.assertEqual(geocoding.lookup_location('Alameda, CA'), ALAMEDA)
+        self.assertEqual(self.fetch_location.call_count, 1)
+        self.assertEqual(
+            GeocodedLocation.objects.get(key='alameda, ca').timezone,
+            'America/Los_Angeles',
+            'The lookup should be stored in the database',
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                geocoding.lookup_location('  ALAMEDA,   ca '),
+                ALAMEDA,
+            )
+
+        geocoding.clear_lru()
+        self.assertEqual(geocoding.lookup_location('alameda, ca'), ALAMEDA)
+        self.assertEqual(
+            self.fetch_location.call_count,
+            1,
+            'Repeat lookups should not go remote',
+        )
+        self.assertEqual(GeocodedLocation.objects.get().hits, 0)
+
+        with self.assertNumQueries(1):
+            geocoding.flush_hits()
+
+        self.assertEqual(
+            GeocodedLocation.objects.get().hits,
+            3,
+            'Lookups served in process should count too',
+        )
+
+    def test_flush_hits(self):
+        """Test that hit counts are flushed in batches.
+
+        Verify that lookups of locations with different counts are flushed
+        with one query per count, and that counts flush by themselves
+        after HITS_FLUSH_SIZE lookups.
+
+        """
+
+        for location_string in ('Alameda', 'Oakland', 'Berkeley'):
+            geocoding.lookup_location(location_string)
+        geocoding.lookup_location('Alameda')
+
+        with self.assertNumQueries(2):
+            geocoding.flush_hits()
+
+        self.assertEqual(
+            dict(GeocodedLocation.objects.values_list('key', 'hits')),
+            {'alameda': 2, 'oakland': 1, 'berkeley': 1},
+        )
+
+        with mock.patch.object(geocoding, 'HITS_FLUSH_SIZE', 3):
+            for _ in range(3):
+                geocoding.lookup_location('Oakland')
+
+        self.assertEqual(
+            GeocodedLocation.objects.get(key='oakland').hits,
+            4,
+            'Counts should flush once HITS_FLUSH_SIZE lookups are pending',
+        )
+
+    def test_expiry(self):
+        """Test that expired locations are fetched again and evicted.
+
+        Age a stored location past the TTL and verify that it is fetched
+        remotely on the next lookup, then age it again and verify that
+        evict_expired_locations deletes it. Verify that locations that
+        can't be found aren't cached.
+
+        """
+
+        geocoding.lookup_location('Alameda, CA')
+        stale = timezone.now() - geocoding.CACHE_TTL - timedelta(minutes=1)
+        GeocodedLocation.objects.update(fetched_at=stale)
+        geocoding.clear_lru()
+
+        geocoding.lookup_location('Alameda, CA')
+        self.assertEqual(
+            self.fetch_location.call_count,
+            2,
+            'An expired location should be fetched again',
+        )
+
+        GeocodedLocation.objects.update(fetched_at=stale)
+        self.assertEqual(geocoding.evict_expired_locations(), 1)
+        self.assertFalse(GeocodedLocation.objects.exists())
+
+        self.assertIsNone(geocoding.lookup_location('nowhere'))
+        self.assertFalse(GeocodedLocation.objects.exists())
+
+    def test_warm_locations_command(self):
+        """Test the warm_locations command.
+
+        Verify that the given locations are stored, and that --top refreshes
+        the most looked up location.
+
+        """
+
+        out = StringIO()
+        call_command('warm_locations', 'Alameda, CA', 'nowhere', stdout=out)
+        self.assertIn('Warmed 1 of 2 locations', out.getvalue())
+        self.assertTrue(GeocodedLocation.objects.filter(key='alameda, ca'))
+
+        call_command('warm_locations', '--top', '5', '--evict', stdout=out)
+        self.assertEqual(self.fetch_location.call_count, 3)
+        self.assertEqual(
+            self.fetch_location.call_args,
+            mock.call('alameda, ca'),
+            '--top should refresh the cached location',
+        )
@@ -0,0 +1,151 @@
+"""Unit tests for hebrew_calendar module."""
+
+from datetime import date
+from django.test import TestCase
+import numpy as np
+from pyluach import dates, utils
+from .. import hebrew_calendar
+
+
+class YearTableTestCase(TestCase):
+    """Tests for the precomputed year tables."""
+
+    def test_year_info(self):
+        """Test the year_info function.
+
+        Verify that the start, length, leap status and month lengths of every
+        year in the table (and a few years on either side of it) match
+        pyluach.
+
+        """
+
+        for year in range(
+            hebrew_calendar.FIRST_YEAR - 5,
+            hebrew_calendar.LAST_YEAR + 6,
+        ):
+            info = hebrew_calendar.year_info(year)
+            self.assertEqual(
+                info.start,
+                dates.HebrewDate(year, 7, 1).to_pydate().toordinal(),
+                f'Start of {year} should match pyluach',
+            )
+            self.assertEqual(
+                info.length,
+                utils._days_in_year(year),
+                f'Length of {year} should match pyluach',
+            )
+            self.assertEqual(
+                info.leap,
+                utils._is_leap(year),
+                f'Leap status of {year} should match pyluach',
+            )
+            for month in info.months:
+                self.assertEqual(
+                    hebrew_calendar.month_length(year, month),
+                    utils._month_length(year, month),
+                    f'Length of month {month} in {year} should match pyluach',
+                )
+
+    def test_invalid_dates(self):
+        """Test that nonexistent Hebrew dates raise ValueError."""
+
+        with self.assertRaises(ValueError):
+            hebrew_calendar.hebrew_to_ordinal(5783, 13, 1)
+        with self.assertRaises(ValueError):
+            hebrew_calendar.hebrew_to_ordinal(5784, 8, 30)
+        with self.assertRaises(ValueError):
+            hebrew_calendar.hebrew_to_ordinal(5783, 14, 1)
+
+
+class ConversionsTestCase(TestCase):
+    """Tests for conversions between ordinals and Hebrew dates."""
+
+    def test_ordinal_to_hebrew(self):
+        """Test the ordinal_to_hebrew and hebrew_to_ordinal functions.
+
+        Walk the whole table range (plus some years outside of it) a few days
+        at a time and verify that both conversions agree with pyluach.
+
+        """
+
+        start = hebrew_calendar.hebrew_to_ordinal(
+            hebrew_calendar.FIRST_YEAR - 3, 7, 1,
+        )
+        end = hebrew_calendar.hebrew_to_ordinal(
+            hebrew_calendar.LAST_YEAR + 3, 7, 1,
+        )
+
+        for ordinal in range(start, end, 11):
+            expected = dates.HebrewDate.from_pydate(date.fromordinal(ordinal))
+            self.assertEqual(
+                hebrew_calendar.ordinal_to_hebrew(ordinal),
+                expected.tuple(),
+                f'Hebrew date for {date.fromordinal(ordinal)} is incorrect',
+            )
+            self.assertEqual(
+                hebrew_calendar.hebrew_to_ordinal(*expected.tuple()),
+                ordinal,
+                f'Ordinal for {expected} is incorrect',
+            )
+
+    def test_pyluach_dates(self):
+        """Test the functions that return pyluach date objects.
+
+        Verify that the returned dates compare equal to the ones pyluach
+        computes itself.
+
+        """
+
+        self.assertEqual(
+            hebrew_calendar.hebrew_date(5783, 12, 18),
+            dates.HebrewDate(5783, 12, 18),
+            'Hebrew date should equal 18 Adar 5783',
+        )
+        self.assertEqual(
+            hebrew_calendar.hebrew_from_pydate(date(2023, 3, 11)),
+            dates.HebrewDate(5783, 12, 18),
+            'Hebrew date should equal 18 Adar 5783',
+        )
+        self.assertEqual(
+            hebrew_calendar.gregorian_from_ordinal(
+                date(2023, 3, 11).toordinal(),
+            ),
+            dates.GregorianDate(2023, 3, 11),
+            'Gregorian date should equal 11 March 2023',
+        )
+
+
+class ArrayConversionsTestCase(TestCase):
+    """Tests for the vectorized conversions."""
+
+    def test_ordinals_to_hebrew(self):
+        """Test the ordinals_to_hebrew and hebrew_to_ordinals functions.
+
+        Verify that converting every day of several years at once gives the
+        same dates as the scalar conversions, and that dates outside of the
+        table or nonexistent dates raise ValueError.
+
+        """
+
+        start = hebrew_calendar.hebrew_to_ordinal(5780, 7, 1)
+        end = hebrew_calendar.hebrew_to_ordinal(5790, 7, 1)
+        ordinals = np.arange(start, end)
+
+        years, months, days = hebrew_calendar.ordinals_to_hebrew(ordinals)
+        self.assertEqual(
+            list(zip(years.tolist(), months.tolist(), days.tolist())),
+            [hebrew_calendar.ordinal_to_hebrew(o) for o in range(start, end)],
+            'Array conversion should match scalar conversion',
+        )
+        self.assertTrue(
+            np.array_equal(
+                hebrew_calendar.hebrew_to_ordinals(years, months, days),
+                ordinals,
+            ),
+            'Converting back should return the original ordinals',
+        )
+
+        with self.assertRaises(ValueError):
+            hebrew_calendar.ordinals_to_hebrew([date(1700, 1, 1).toordinal()])
+        with self.assertRaises(ValueError):
+            hebrew_calendar.hebrew_to_ordinals([5783], [13], [1])
@@ -1,8 +1,10 @@
 """Unit tests for helpers module."""
 
-from unittest import skip
-from datetime import date
+from unittest import skip, mock
+from datetime import date, timedelta
+from astral import LocationInfo, sun
 from django.test import TestCase
+import numpy as np
 from pyluach import dates
 from .. import helpers
 
@@ -105,17 +107,350 @@ class FutureDatesTestCase(TestCase):
 
     def test_get_following_dates(self):
         self.assertEqual(
-            helpers.get_following_dates(dates.HebrewDate(5784, 11, 11), 5),
-            {
-                '11 Shevat 5785': '9 February 2025',
-                '11 Shevat 5786': '29 January 2026',
-                '11 Shevat 5787': '19 January 2027',
-                '11 Shevat 5788': '8 February 2028',
-                '11 Shevat 5789': '27 January 2029',
-            },
+            [
+                (following_date.hebrew_res, following_date.gregorian_res)
+                for following_date in helpers.get_following_dates(
+                    dates.HebrewDate(5784, 11, 11),
+                    5,
+                )
+            ],
+            [
+                ('11 Shevat 5785', '9 February 2025'),
+                ('11 Shevat 5786', '29 January 2026'),
+                ('11 Shevat 5787', '19 January 2027'),
+                ('11 Shevat 5788', '8 February 2028'),
+                ('11 Shevat 5789', '27 January 2029'),
+            ],
             'Future dates did not calculate correctly',
         )
 
+    def test_iter_following_dates(self):
+        """Test the iter_following_dates generator.
+
+        Verify that an offset skips that many years, and that the generator
+        keeps going past a hundred years.
+
+        """
+
+        following_dates = helpers.iter_following_dates(
+            dates.HebrewDate(5784, 11, 11),
+            offset=2,
+        )
+        self.assertEqual(
+            next(following_dates),
+            helpers.FollowingDate(
+                dates.HebrewDate(5787, 11, 11),
+                dates.GregorianDate(2027, 1, 19),
+            ),
+            'First date should be three years after the given date',
+        )
+
+        self.assertEqual(
+            len(helpers.get_following_dates(
+                dates.HebrewDate(5784, 11, 11),
+                150,
+            )),
+            150,
+            'There should be 150 following dates',
+        )
+
+
+class NextDateCacheTestCase(TestCase):
+    """Tests for memoization of get_next_date."""
+
+    def test_get_next_date_as_of(self):
+        """Test get_next_date with an explicit today.
+
+        Verify that the result depends on the given day rather than the
+        clock, including the day of the yahrzeit itself.
+
+        """
+
+        self.assertEqual(
+            helpers.get_next_date('2023-02-01', False, date(2023, 3, 11)),
+            (
+                dates.HebrewDate(5784, 11, 10),
+                dates.GregorianDate(2024, 1, 20),
+                False,
+            ),
+            'Incorrect yahrzeit calculation',
+        )
+        self.assertEqual(
+            helpers.get_next_date('2022-03-20', True, date(2023, 3, 11)),
+            (
+                dates.HebrewDate(5784, 13, 18),
+                dates.GregorianDate(2024, 3, 28),
+                True,
+            ),
+            'Today should be the yahrzeit',
+        )
+
+    def test_day_rollover(self):
+        """Test that memoized dates are dropped when the day changes.
+
+        Call get_next_date twice on one day and verify the second call is a
+        cache hit, then move the clock a day forward and verify the cache
+        was cleared and the new day's result is returned.
+
+        """
+
+        with mock.patch.object(
+            helpers,
+            'today_date',
+            return_value=date(2023, 3, 11),
+        ):
+            helpers.get_next_date('2022-03-20', True)
+            hits = helpers._next_date_for_anniversary.cache_info().hits
+            self.assertTrue(
+                helpers.get_next_date('2022-03-20', True)[2],
+                'Today should be the yahrzeit',
+            )
+            self.assertEqual(
+                helpers._next_date_for_anniversary.cache_info().hits,
+                hits + 1,
+                'Second call should be a cache hit',
+            )
+
+        with mock.patch.object(
+            helpers,
+            'today_date',
+            return_value=date(2023, 3, 12),
+        ):
+            next_date_h, _, is_it_today = helpers.get_next_date(
+                '2022-03-20',
+                True,
+            )
+            self.assertEqual(
+                helpers._next_date_for_anniversary.cache_info().currsize,
+                1,
+                'Cache should only hold the new day\'s result',
+            )
+            self.assertEqual(
+                next_date_h,
+                dates.HebrewDate(5784, 13, 18),
+                'Next yahrzeit should be next year',
+            )
+            self.assertFalse(is_it_today, 'Yesterday was the yahrzeit')
+
+
+class BatchFutureDatesTestCase(TestCase):
+    """Test for the vectorized yahrzeit calculation."""
+
+    def test_get_next_dates_batch(self):
+        """Test the get_next_dates_batch function.
+
+        Verify that the function returns the same dates as get_next_date for
+        death dates spread over several decades, before and after sunset.
+
+        """
+
+        death_dates = [
+            (date(1960, 1, 1) + timedelta(days=days)).isoformat()
+            for days in range(0, 60 * 365, 17)
+        ]
+        after_sunset = [days % 2 == 0 for days in range(len(death_dates))]
+
+        next_dates_h, next_dates_g, is_it_today = (
+            helpers.get_next_dates_batch(death_dates, after_sunset)
+        )
+
+        for i, death_date in enumerate(death_dates):
+            next_date_h, next_date_g, today = helpers.get_next_date(
+                death_date,
+                after_sunset[i],
+            )
+            self.assertEqual(
+                tuple(next_dates_h[i]),
+                next_date_h.tuple(),
+                f'Hebrew date for {death_date} should match get_next_date',
+            )
+            self.assertEqual(
+                next_dates_g[i].astype(date),
+                next_date_g.to_pydate(),
+                f'Gregorian date for {death_date} should match get_next_date',
+            )
+            self.assertEqual(
+                is_it_today[i],
+                today,
+                f'is_it_today for {death_date} should match get_next_date',
+            )
+
+    def test_get_next_dates_batch_today(self):
+        """Test get_next_dates_batch with an explicit today.
+
+        Verify that an anniversary later in the year stays in the current
+        year, that one earlier in the year moves to the next, and that one
+        falling on today is flagged.
+
+        """
+
+        next_dates_h, next_dates_g, is_it_today = (
+            helpers.get_next_dates_batch(
+                np.array(['2023-02-01', '2022-04-01', '2022-03-13'],
+                         dtype='datetime64[D]'),
+                np.array([False, False, True]),
+                today=date(2023, 3, 11),
+            )
+        )
+
+        self.assertEqual(
+            next_dates_h.tolist(),
+            [[5784, 11, 10], [5783, 12, 29], [5784, 13, 11]],
+            'Hebrew dates are incorrect',
+        )
+        self.assertEqual(
+            next_dates_g.tolist(),
+            [date(2024, 1, 20), date(2023, 3, 22), date(2024, 3, 21)],
+            'Gregorian dates are incorrect',
+        )
+        self.assertEqual(
+            is_it_today.tolist(),
+            [False, False, False],
+            'None of the yahrzeits are today',
+        )
+
+        is_it_today = helpers.get_next_dates_batch(
+            ['2022-03-21'],
+            [False],
+            today=date(2023, 3, 11),
+        )[2]
+        self.assertTrue(is_it_today[0], 'Today should be the yahrzeit')
+
+    def test_get_yahrzeits_batch(self):
+        """Test the get_yahrzeits_batch function.
+
+        Verify that each result matches get_next_date and
+        get_following_dates, and that deaths with the same anniversary
+        share their following dates even when they ask for different
+        numbers of years.
+
+        """
+
+        death_dates = ['2022-02-01', '1990-05-05', '2022-02-01', '2021-01-13']
+        after_sunset = [False, True, False, False]
+        num_years = [3, 2, 5, 1]
+
+        results = helpers.get_yahrzeits_batch(
+            death_dates,
+            after_sunset,
+            num_years,
+        )
+
+        for i, result in enumerate(results):
+            next_date_h, next_date_g, is_it_today = helpers.get_next_date(
+                death_dates[i],
+                after_sunset[i],
+            )
+            self.assertEqual(
+                (result['next_date_h'], result['next_date_g']),
+                (
+                    helpers.h_date_stringify_db(next_date_h),
+                    helpers.g_date_stringify_db(next_date_g),
+                ),
+                f'Next date for {death_dates[i]} should match get_next_date',
+            )
+            self.assertEqual(result['is_it_today'], is_it_today)
+            self.assertEqual(
+                result['following_dates'],
+                [
+                    following_date.to_json()
+                    for following_date in helpers.get_following_dates(
+                        next_date_h,
+                        num_years[i] - 1,
+                    )
+                ],
+                f'Following dates for {death_dates[i]} are incorrect',
+            )
+
+        self.assertIs(
+            results[0]['following_dates'][0],
+            results[2]['following_dates'][0],
+            'Identical anniversaries should share their following dates',
+        )
+
+    def test_get_yahrzeits_batch_adar(self):
+        """Test get_yahrzeits_batch with deaths in Adar I and Adar II.
+
+        From a common year, both deaths have their next yahrzeit in Adar.
+        Verify that they still get separate following dates, in Adar I and
+        Adar II in the next leap year, matching the following dates for
+        their anniversaries.
+
+        """
+
+        death_dates = ['2024-02-19', '2024-03-20']
+        results = helpers.get_yahrzeits_batch(
+            death_dates,
+            [False, False],
+            [4, 4],
+            today=date(2027, 10, 18),
+        )
+
+        self.assertEqual(
+            [result['next_date_h'] for result in results],
+            ['5788-12-10', '5788-12-10'],
+        )
+        self.assertEqual(
+            [result['following_dates'][1]['date_h'] for result in results],
+            ['5790-12-10', '5790-13-10'],
+            'Adar I and Adar II deaths should stay apart in a leap year',
+        )
+
+        for result, anniversary in zip(results, [(12, 10), (13, 10)]):
+            self.assertEqual(
+                result['following_dates'],
+                [
+                    following_date.to_json()
+                    for following_date in helpers.get_following_dates(
+                        dates.HebrewDate(5788, 12, 10),
+                        3,
+                        anniversary=anniversary,
+                    )
+                ],
+                f'Following dates for {anniversary} are incorrect',
+            )
+
+
+class ErevSunsetTimesTestCase(TestCase):
+    """Test for the batched erev yahrzeit sunset times."""
+
+    def test_get_erev_sunset_times(self):
+        """Test the get_erev_sunset_times function.
+
+        Verify that each time is the sunset on the day before the given date,
+        as astral calculates it, and that a day without a sunset is None.
+
+        """
+
+        alameda = LocationInfo(
+            'Alameda',
+            'United States',
+            'America/Los_Angeles',
+            37.7652,
+            -122.2416,
+        )
+        g_dates = [date(2024, 2, 9), date(2025, 1, 29), date(2026, 2, 17)]
+
+        self.assertEqual(
+            helpers.get_erev_sunset_times(alameda, g_dates),
+            [
+                sun.sunset(
+                    alameda.observer,
+                    g_date - timedelta(days=1),
+                    alameda.timezone,
+                ).strftime('%-I:%M %p')
+                for g_date in g_dates
+            ],
+            'Erev sunset times should match astral',
+        )
+
+        tromso = LocationInfo('Tromso', 'Norway', 'Europe/Oslo', 69.65, 18.96)
+        self.assertEqual(
+            helpers.get_erev_sunset_times(tromso, [date(2024, 6, 22)]),
+            [None],
+            'There should be no sunset at Tromso in June',
+        )
+
 
 @skip('Reduce api calls')
 class SunsetTimeTestCase(TestCase):
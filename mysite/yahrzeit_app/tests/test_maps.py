@@ -0,0 +1,211 @@
+"""Unit tests for maps module, run against a local stub Maps server."""
+
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Thread
+import time
+from django.test import TestCase
+from django.utils import timezone
+from .. import geocoding, helpers, maps
+from ..models import GeocodedLocation
+
+GEOCODE_RESPONSE = {
+    'status': 'OK',
+    'results': [{
+        'geometry': {'location': {'lat': 37.7652, 'lng': -122.2416}},
+        'address_components': [
+            {'long_name': 'Alameda'},
+            {'long_name': 'United States'},
+        ],
+    }],
+}
+TIMEZONE_RESPONSE = {'status': 'OK', 'timeZoneId': 'America/Los_Angeles'}
+
+
+class StubMapsHandler(BaseHTTPRequestHandler):
+    """Request handler that answers like the geocoding and timezone APIs.
+
+    Set delay to answer slowly, status to answer with an HTTP error and
+    api_status to answer with an API error status.
+
+    """
+
+    delay = 0
+    status = 200
+    api_status = None
+    paths = []
+
+    def do_GET(self):
+        StubMapsHandler.paths.append(self.path)
+        time.sleep(self.delay)
+
+        if self.path.startswith('/maps/api/timezone/'):
+            body = TIMEZONE_RESPONSE
+        else:
+            body = GEOCODE_RESPONSE
+
+        if self.api_status:
+            body = {'status': self.api_status, 'results': []}
+
+        try:
+            self.send_response(self.status)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(body).encode())
+
+        except OSError:
+            # The client timed out and closed the connection.
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MapsClientTestCase(TestCase):
+    """Tests for the shared Maps client and its circuit breaker."""
+
+    def setUp(self):
+        """Set-up to happen before each test.
+
+        Start a stub Maps server on a free local port and point the shared
+        client at it with short timeouts.
+
+        """
+
+        StubMapsHandler.delay = 0
+        StubMapsHandler.status = 200
+        StubMapsHandler.api_status = None
+        StubMapsHandler.paths = []
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubMapsHandler)
+        server.daemon_threads = True
+        Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        maps.configure(
+            key='AIzaTestKey',
+            base_url=f'http://127.0.0.1:{server.server_port}',
+            connect_timeout=1,
+            read_timeout=0.2,
+            retry_timeout=0.1,
+        )
+        self.addCleanup(maps.configure)
+        geocoding.clear_lru()
+        self.addCleanup(geocoding.clear_lru)
+
+    def test_shared_client(self):
+        """Test that lookups reuse one client and one session.
+
+        Verify that the location is parsed from the stub's responses.
+
+        """
+
+        client = maps.get_client()
+        location = helpers.fetch_location('Alameda, CA')
+        helpers.fetch_location('Alameda, CA')
+
+        self.assertIs(maps.get_client(), client, 'Client should be reused')
+        self.assertEqual(location.name, 'Alameda')
+        self.assertEqual(location.timezone, 'America/Los_Angeles')
+        self.assertEqual(
+            StubMapsHandler.paths.count('/maps/api/timezone/json'),
+            0,
+            'Timezone should be resolved offline',
+        )
+
+    def test_timeout(self):
+        """Test that a slow upstream fails quickly."""
+
+        StubMapsHandler.delay = 1
+        start = time.monotonic()
+
+        with self.assertRaises(maps.MapsUnavailableError):
+            helpers.fetch_location('Alameda, CA')
+
+        self.assertLess(time.monotonic() - start, 1, 'Call should time out')
+
+    def test_circuit_breaker(self):
+        """Test the circuit breaker.
+
+        Verify that after FAILURE_THRESHOLD failed calls, calls are rejected
+        without reaching the server. Once the reset timeout passes, verify
+        that a successful trial call closes the breaker.
+
+        """
+
+        now = [0]
+        maps.breaker.clock = lambda: now[0]
+        self.addCleanup(setattr, maps.breaker, 'clock', time.monotonic)
+        StubMapsHandler.status = 500
+
+        for _ in range(maps.FAILURE_THRESHOLD):
+            with self.assertRaises(maps.MapsUnavailableError):
+                helpers.geocode_address('Alameda, CA')
+
+        self.assertTrue(maps.breaker.is_open, 'Breaker should be open')
+        num_requests = len(StubMapsHandler.paths)
+        with self.assertRaises(maps.MapsUnavailableError):
+            helpers.geocode_address('Alameda, CA')
+        self.assertEqual(
+            len(StubMapsHandler.paths),
+            num_requests,
+            'An open breaker should not call the server',
+        )
+
+        now[0] += maps.RESET_TIMEOUT
+        StubMapsHandler.status = 200
+        self.assertEqual(
+            helpers.geocode_address('Alameda, CA'),
+            GEOCODE_RESPONSE['results'],
+        )
+        self.assertFalse(maps.breaker.is_open, 'Breaker should be closed')
+
+    def test_request_errors(self):
+        """Test that errors caused by the request don't open the breaker.
+
+        Verify that INVALID_REQUEST raises MapsRequestError however often
+        it happens, that fetch_location treats it as not found, and that
+        UNKNOWN_ERROR counts as a failure.
+
+        """
+
+        StubMapsHandler.api_status = 'INVALID_REQUEST'
+
+        for _ in range(maps.FAILURE_THRESHOLD):
+            with self.assertRaises(maps.MapsRequestError):
+                helpers.geocode_address(' ')
+
+        self.assertFalse(maps.breaker.is_open, 'Breaker should be closed')
+        self.assertIsNone(helpers.fetch_location(' '))
+
+        StubMapsHandler.api_status = 'UNKNOWN_ERROR'
+
+        for _ in range(maps.FAILURE_THRESHOLD):
+            with self.assertRaises(maps.MapsUnavailableError):
+                helpers.geocode_address('Alameda, CA')
+
+        self.assertTrue(maps.breaker.is_open, 'Breaker should be open')
+
+    def test_stale_fallback(self):
+        """Test that an expired location is served while Maps is down.
+
+        Verify that a location that was never looked up fails instead.
+
+        """
+
+        geocoding.lookup_location('Alameda, CA')
+        GeocodedLocation.objects.update(
+            fetched_at=timezone.now() - geocoding.CACHE_TTL - timedelta(1),
+        )
+        geocoding.clear_lru()
+        StubMapsHandler.status = 500
+
+        self.assertEqual(
+            geocoding.lookup_location('Alameda, CA').name,
+            'Alameda',
+            'Expired location should be served',
+        )
+        with self.assertRaises(maps.MapsUnavailableError):
+            geocoding.lookup_location('Oakland, CA')
@@ -0,0 +1,105 @@
+"""Unit tests for results module."""
+
+from django.contrib.sessions.models import Session
+from django.test import Client, TestCase
+from .. import results
+from ..models import CustomUser, Decedent
+
+RESULT = {
+    'decedent_name': 'testdecedent',
+    'death_date_h': '5782-11-30',
+    'next_date_h': '5784-11-30',
+    'next_date_g': '2024-02-09',
+    'after_sunset': False,
+    'status': results.DORMANT,
+}
+
+
+class ResultCookieTestCase(TestCase):
+    """Tests for results kept in a signed cookie."""
+
+    def setUp(self):
+        """Set-up to happen before each test."""
+
+        self.client = Client()
+        CustomUser.objects.create_user(
+            email='test@test.test',
+            password='testpassword',
+        )
+
+    def calculate(self):
+        """Post a calculation for testdecedent."""
+
+        return self.client.post(
+            '/yahrzeit/calculate',
+            {
+                'decedent-name': 'testdecedent',
+                'decedent-date': '2022-02-01',
+                'TOD': 'before-sunset',
+                'number': '1',
+            },
+        )
+
+    def test_pack_result(self):
+        """Test that results round trip through their packed form."""
+
+        packed = results.pack_result(RESULT)
+
+        self.assertEqual(packed[1:], [57821130, 57841130, 738925, 0, 0])
+        self.assertEqual(results.unpack_result(packed), RESULT)
+        self.assertEqual(
+            results.unpack_result(packed[:5]),
+            RESULT,
+            'Cookies without after_sunset should be before sunset',
+        )
+
+    def test_calculate_without_session(self):
+        """Test that an anonymous calculation writes no session.
+
+        Verify that the result is in a signed cookie instead, and that a
+        tampered cookie is ignored.
+
+        """
+
+        self.calculate()
+
+        self.assertEqual(Session.objects.count(), 0)
+        self.assertIn(results.COOKIE_NAME, self.client.cookies)
+
+        value = self.client.cookies[results.COOKIE_NAME].value
+        self.client.cookies[results.COOKIE_NAME] = 'x' + value
+        self.assertEqual(
+            self.client.post('/yahrzeit/api/activate-res').json()['status'],
+            'failure',
+            'A tampered result should be ignored',
+        )
+
+    def test_activate_and_login(self):
+        """Test saving a result by activating it and logging in.
+
+        Verify that activating a result doesn't write a session, and that
+        logging in saves the decedent and deletes the cookie.
+
+        """
+
+        self.calculate()
+        activate_response = self.client.post('/yahrzeit/api/activate-res')
+
+        self.assertEqual(activate_response.json()['status'], 'success')
+        self.assertEqual(Session.objects.count(), 0)
+
+        login_response = self.client.post(
+            '/yahrzeit/login',
+            {'email': 'test@test.test', 'password': 'testpassword'},
+        )
+
+        self.assertEqual(
+            Decedent.objects.get().name,
+            'testdecedent',
+            'Logging in should save the active result',
+        )
+        self.assertEqual(
+            login_response.cookies[results.COOKIE_NAME].value,
+            '',
+            'The result cookie should be deleted',
+        )
@@ -0,0 +1,55 @@
+"""Unit tests for solar module."""
+
+from astral import LocationInfo, sun
+from django.test import TestCase
+from .. import solar
+
+LOCATIONS = (
+    LocationInfo('Alameda', 'USA', 'America/Los_Angeles', 37.7652, -122.2416),
+    LocationInfo('Jerusalem', 'Israel', 'Asia/Jerusalem', 31.7683, 35.2137),
+    LocationInfo('Sydney', 'Australia', 'Australia/Sydney', -33.87, 151.21),
+    LocationInfo('Tromso', 'Norway', 'Europe/Oslo', 69.6492, 18.9553),
+    LocationInfo('Kiritimati', 'Kiribati', 'Pacific/Kiritimati', 1.87, -157.4),
+)
+
+
+class SunsetTableTestCase(TestCase):
+    """Tests for the vectorized sunset calculation."""
+
+    def test_matches_astral(self):
+        """Test the sunset_table function against astral.
+
+        For a full year at places in both hemispheres, including one north
+        of the Arctic Circle and one far from its timezone's meridian,
+        verify that every sunset is within TOLERANCE of astral's and that
+        days without a sunset are the same.
+
+        """
+
+        for location in LOCATIONS:
+            for year in (2024, 2027):
+                for day, sunset in solar.sunset_table(location, year):
+                    try:
+                        expected = sun.sunset(
+                            location.observer,
+                            day,
+                            location.timezone,
+                        )
+
+                    except ValueError:
+                        expected = None
+
+                    if expected is None:
+                        self.assertIsNone(
+                            sunset,
+                            f'There should be no sunset at {location.name} '
+                            f'on {day}',
+                        )
+                        continue
+
+                    self.assertLessEqual(
+                        abs(sunset - expected),
+                        solar.TOLERANCE,
+                        f'Sunset at {location.name} on {day} is incorrect',
+                    )
+                    self.assertEqual(sunset.date(), day)
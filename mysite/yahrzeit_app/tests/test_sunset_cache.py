@@ -0,0 +1,194 @@
+"""Unit tests for sunset_cache module."""
+
+import asyncio
+from threading import Event, Thread
+import time
+from unittest import mock
+from astral import LocationInfo
+from django.test import TestCase
+from .. import geocoding, helpers, sunset_cache
+
+
+class SingleFlightTestCase(TestCase):
+    """Tests for coalescing concurrent calls."""
+
+    def run_concurrently(self, flight, fn, num_threads):
+        """Call flight.do from several threads while fn blocks.
+
+        Return what each thread got back, or the exception it raised.
+
+        """
+
+        results = [None] * num_threads
+
+        def worker(index):
+            try:
+                results[index] = flight.do('key', fn)
+
+            except Exception as e:
+                results[index] = e
+
+        threads = [
+            Thread(target=worker, args=(index,))
+            for index in range(num_threads)
+        ]
+        for thread in threads:
+            thread.start()
+
+        deadline = time.monotonic() + 5
+        while (
+            flight.counters['coalesced'] < num_threads - 1
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.01)
+
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def test_coalescing(self):
+        """Test that concurrent calls for a key share one call.
+
+        Block the first call until every thread is waiting, then verify that
+        the function ran once and every thread got its result. Verify that an
+        exception reaches every waiting thread too.
+
+        """
+
+        flight = sunset_cache.SingleFlight()
+        self.release = Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            self.release.wait()
+            return '7:15 PM'
+
+        results = self.run_concurrently(flight, fn, 8)
+        self.assertEqual(len(calls), 1, 'Function should run once')
+        self.assertEqual(results, ['7:15 PM'] * 8)
+        self.assertEqual(flight.counters['coalesced'], 7)
+        self.assertEqual(flight.calls, {}, 'Finished calls should be removed')
+
+        self.release = Event()
+
+        def failing_fn():
+            self.release.wait()
+            raise ValueError('Bad date')
+
+        results = self.run_concurrently(flight, failing_fn, 4)
+        self.assertTrue(
+            all(isinstance(result, ValueError) for result in results),
+            'Every caller should get the exception',
+        )
+
+
+class AsyncSingleFlightTestCase(TestCase):
+    """Tests for coalescing concurrent lookups on the event loop."""
+
+    def setUp(self):
+        """Set-up to happen before each test.
+
+        Empty the cache and zero the counters.
+
+        """
+
+        sunset_cache.reset()
+        self.addCleanup(sunset_cache.reset)
+
+    async def test_aget_sunset_time(self):
+        """Test the aget_sunset_time function.
+
+        Mock a slow lookup, make concurrent requests for the same date and
+        location with different spellings, and verify that the lookup ran
+        once and the other requests were coalesced, and that the worker
+        thread's database connection was closed.
+
+        """
+
+        calls = []
+
+        def slow_lookup(date_string, location_string):
+            calls.append(location_string)
+            time.sleep(0.2)
+            return '7:16 PM'
+
+        with mock.patch.object(
+            sunset_cache,
+            'get_sunset_time',
+            side_effect=slow_lookup,
+        ), mock.patch.object(
+            sunset_cache,
+            'close_old_connections',
+        ) as close_old_connections:
+            results = await asyncio.gather(*(
+                sunset_cache.aget_sunset_time('2024-03-15', spelling)
+                for spelling in ('Alameda, CA', 'alameda,  ca') * 5
+            ))
+
+        self.assertEqual(results, ['7:16 PM'] * 10)
+        self.assertEqual(len(calls), 1, 'The lookup should run once')
+        close_old_connections.assert_called_once_with()
+        self.assertEqual(sunset_cache.stats()['coalesced'], 9)
+
+
+class QuantizedCacheTestCase(TestCase):
+    """Tests for caching sunsets by rounded coordinates."""
+
+    def setUp(self):
+        """Set-up to happen before each test.
+
+        Empty the cache and zero the counters.
+
+        """
+
+        sunset_cache.reset()
+        self.addCleanup(sunset_cache.reset)
+
+    def test_get_sunset_time(self):
+        """Test the get_sunset_time function.
+
+        Mock two spellings of a place that geocode a few metres apart and
+        verify that the second is served from the cache. Verify that a new
+        date is a miss and that the counters add up.
+
+        """
+
+        locations = {
+            'Alameda, CA': LocationInfo(
+                'Alameda', 'USA', 'America/Los_Angeles', 37.7652, -122.2416,
+            ),
+            '1517 Fountain St, Alameda': LocationInfo(
+                'Alameda', 'USA', 'America/Los_Angeles', 37.7658, -122.2419,
+            ),
+        }
+
+        with mock.patch.object(
+            geocoding,
+            'lookup_location',
+            side_effect=locations.get,
+        ), mock.patch.object(
+            helpers,
+            'get_sunset_time_at',
+            wraps=helpers.get_sunset_time_at,
+        ) as get_sunset_time_at:
+            first = sunset_cache.get_sunset_time('2024-03-15', 'Alameda, CA')
+            second = sunset_cache.get_sunset_time(
+                '2024-03-15',
+                '1517 Fountain St, Alameda',
+            )
+            sunset_cache.get_sunset_time('2024-03-16', 'Alameda, CA')
+
+        self.assertEqual(first, '7:16 PM')
+        self.assertEqual(second, first)
+        self.assertEqual(
+            get_sunset_time_at.call_count,
+            2,
+            'Nearby spellings of a place should share a cache entry',
+        )
+        self.assertEqual(
+            sunset_cache.stats(),
+            {'hits': 1, 'misses': 2, 'coalesced': 0},
+        )
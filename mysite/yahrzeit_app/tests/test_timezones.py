@@ -0,0 +1,73 @@
+"""Unit tests for timezones module."""
+
+from unittest import mock
+from django.test import TestCase
+from .. import helpers, timezones
+
+
+class TimezoneAtTestCase(TestCase):
+    """Tests for offline timezone lookup."""
+
+    def test_timezone_at(self):
+        """Test the timezone_at function.
+
+        Verify the zones of a few places on either side of timezone
+        boundaries, and that the finder is created once.
+
+        """
+
+        places = (
+            (37.7652, -122.2416, 'America/Los_Angeles'),
+            (40.7128, -74.0060, 'America/New_York'),
+            (31.7683, 35.2137, 'Asia/Jerusalem'),
+            (69.6492, 18.9553, 'Europe/Oslo'),
+            (-33.8688, 151.2093, 'Australia/Sydney'),
+        )
+
+        for lat, lng, tz in places:
+            self.assertEqual(
+                timezones.timezone_at(lat, lng),
+                tz,
+                f'Timezone at {lat}, {lng} should be {tz}',
+            )
+
+        self.assertIs(timezones.get_finder(), timezones.get_finder())
+
+    def test_remote_fallback(self):
+        """Test that fetch_location only looks up unresolved zones remotely.
+
+        Mock the geocoding response, then verify that get_timezone is not
+        called for resolvable coordinates and is called when timezone_at
+        returns None.
+
+        """
+
+        geocoded = [{
+            'geometry': {'location': {'lat': 31.7683, 'lng': 35.2137}},
+            'address_components': [
+                {'long_name': 'Jerusalem'},
+                {'long_name': 'Israel'},
+            ],
+        }]
+
+        with mock.patch.object(
+            helpers,
+            'geocode_address',
+            return_value=geocoded,
+        ), mock.patch.object(
+            helpers,
+            'get_timezone',
+            return_value={'timeZoneId': 'Asia/Jerusalem'},
+        ) as get_timezone:
+            location = helpers.fetch_location('Jerusalem')
+            self.assertEqual(location.timezone, 'Asia/Jerusalem')
+            get_timezone.assert_not_called()
+
+            with mock.patch.object(
+                timezones,
+                'timezone_at',
+                return_value=None,
+            ):
+                location = helpers.fetch_location('Jerusalem')
+            self.assertEqual(location.timezone, 'Asia/Jerusalem')
+            get_timezone.assert_called_once()
@@ -1,10 +1,14 @@
 """Unit tests for views module."""
 
-from datetime import date
-from django.test import TestCase, Client
+from datetime import date, datetime, timezone
+from unittest import mock
+from astral import LocationInfo
+from django.core import signing
+from django.core.cache import caches
+from django.test import TestCase, Client, override_settings
 from django.http import HttpResponse, JsonResponse
-from ..helpers import js_key
-from ..models import CustomUser, Decedent
+from .. import crud, geocoding, helpers, maps, results, views
+from ..models import CustomUser, Anniversary, Decedent
 
 
 c = Client()
@@ -52,6 +56,30 @@ class IndexTestCase(TestCase):
         self.assertIsInstance(logged_in_idx_response, HttpResponse)
         self.assertContains(logged_in_idx_response, 'Dashboard')
 
+    def test_index_conditional(self):
+        """Test conditional requests for the index.
+
+        Verify that once the client has a CSRF cookie, a request with the
+        index's ETag gets a 304, and that logging in changes the ETag.
+
+        """
+
+        c.get('/yahrzeit/')
+        idx_response = c.get('/yahrzeit/')
+        etag = idx_response['ETag']
+        self.assertEqual(
+            idx_response['Cache-Control'],
+            'private, no-cache',
+        )
+
+        cached_response = c.get('/yahrzeit/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached_response.status_code, 304)
+
+        c.login(email='test@test.test', password='testpassword')
+        logged_in_response = c.get('/yahrzeit/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(logged_in_response.status_code, 200)
+        c.logout()
+
 
 class CreateAccountTestCase(TestCase):
     """Tests for views pertaining to creating an account."""
@@ -234,9 +262,13 @@ class DashboardTestCase(TestCase):
         self.new_dec = Decedent.objects.create(
             user=self.test_user,
             name='testdecedent',
-            death_date_hebrew='5782-11-30',
-            next_date_hebrew='5784-11-30',
-            next_date_gregorian='2024-02-09',
+            death_date_hebrew=57821130,
+            anniversary=Anniversary.objects.create(
+                month=11,
+                day=30,
+                next_date_hebrew=57841130,
+                next_date_gregorian=date(2024, 2, 9),
+            ),
         )
 
     def test_dashboard(self):
@@ -266,6 +298,93 @@ class DashboardTestCase(TestCase):
             'testdecedent\'s next yahrzeit is 30 Shevat 5784 / 9 February 2024',
         )
 
+    def test_dashboard_conditional(self):
+        """Test conditional requests for the dashboard.
+
+        Verify that a request with the dashboard's ETag gets a 304 until a
+        decedent is added, and that the response must be revalidated.
+
+        """
+
+        c.login(email='test@test.test', password='testpassword')
+        dash_response = c.get('/yahrzeit/dashboard')
+        etag = dash_response['ETag']
+        self.assertIn('private', dash_response['Cache-Control'])
+        self.assertIn('Last-Modified', dash_response)
+
+        cached_response = c.get(
+            '/yahrzeit/dashboard',
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(cached_response.status_code, 304)
+
+        crud.create_decedent(
+            self.test_user,
+            'otherdecedent',
+            '5783-12-09',
+            '5784-12-09',
+            '2024-02-18',
+        )
+        changed_response = c.get(
+            '/yahrzeit/dashboard',
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(changed_response.status_code, 200)
+        self.assertContains(changed_response, 'otherdecedent')
+        self.assertNotEqual(changed_response['ETag'], etag)
+
+    def test_get_decedents(self):
+        """Test the get_decedents view function.
+
+        Verify that an anonymous request fails. Log in, add a decedent with
+        the same name and yahrzeit, and request one decedent per page. Verify
+        that both decedents are returned across the two pages and that a
+        malformed cursor or limit fails.
+
+        """
+
+        anon_response = c.get('/yahrzeit/api/decedents').json()
+        self.assertEqual(anon_response['status'], 'failure')
+
+        c.login(email='test@test.test', password='testpassword')
+        Decedent.objects.create(
+            user=self.test_user,
+            name='testdecedent',
+            death_date_hebrew=57821130,
+            anniversary=self.new_dec.anniversary,
+        )
+
+        first_page = c.get('/yahrzeit/api/decedents', {'limit': 1}).json()
+        self.assertEqual(first_page['status'], 'success')
+        self.assertEqual(
+            first_page['decedents'][0],
+            {
+                'id': self.new_dec.pk,
+                'name': 'testdecedent',
+                'next_date_h': '5784-11-30',
+                'next_date_g': '2024-02-09',
+                'next_date_h_res': '30 Shevat 5784',
+                'next_date_g_res': '9 February 2024',
+            },
+        )
+
+        second_page = c.get(
+            '/yahrzeit/api/decedents',
+            {'limit': 1, 'after': first_page['next_cursor']},
+        ).json()
+        self.assertEqual(len(second_page['decedents']), 1)
+        self.assertNotEqual(
+            second_page['decedents'][0]['id'],
+            self.new_dec.pk,
+            'Second page should hold the other decedent',
+        )
+        self.assertIsNone(second_page['next_cursor'])
+
+        bad_cursor = c.get('/yahrzeit/api/decedents', {'after': 'x'}).json()
+        self.assertEqual(bad_cursor['status'], 'failure')
+        bad_limit = c.get('/yahrzeit/api/decedents', {'limit': 0}).json()
+        self.assertEqual(bad_limit['status'], 'failure')
+
 
 class CalculateTestCase(TestCase):
     def setUp(self):
@@ -286,3 +405,554 @@ class CalculateTestCase(TestCase):
             anon_user_calc_response,
             'testdecedent\'s next yahrzeit is 30 Shevat 5784 which is 9 February 2024',
         )
+
+
+class CalculateCacheTestCase(TestCase):
+    """Test for the cached calculation results."""
+
+    def setUp(self):
+        """Set-up to happen before each test."""
+
+        caches['results'].clear()
+
+    def calculate(self, name, number='3', location=''):
+        """Post a calculation for 2022-02-01 before sunset."""
+
+        return c.post(
+            '/yahrzeit/calculate',
+            {
+                'decedent-name': name,
+                'decedent-date': '2022-02-01',
+                'TOD': 'before-sunset',
+                'number': number,
+                'location': location,
+            },
+        )
+
+    def test_calculate_cached(self):
+        """Test that calculate reuses results for the same inputs.
+
+        Verify that a second calculation with another name skips the date
+        calculation but still shows its name and stores it in the result
+        cookie, that a different number of years is calculated again, and
+        that a result missing candle-lighting times because Google Maps was
+        unavailable isn't cached.
+
+        """
+
+        with mock.patch.object(
+            helpers,
+            'get_next_date',
+            wraps=helpers.get_next_date,
+        ) as get_next_date:
+            first = self.calculate('firstdecedent')
+            second = self.calculate('seconddecedent')
+
+            self.assertEqual(get_next_date.call_count, 1)
+            self.assertContains(second, 'seconddecedent\'s next yahrzeit')
+            self.assertNotContains(second, 'firstdecedent')
+            self.assertEqual(
+                results.unpack_result(signing.loads(
+                    second.cookies[results.COOKIE_NAME].value,
+                    salt=results.SALT,
+                ))['decedent_name'],
+                'seconddecedent',
+            )
+            self.assertEqual(
+                first.content.replace(b'firstdecedent', b'seconddecedent'),
+                second.content,
+                'Only the name should differ between the two pages',
+            )
+
+            self.calculate('firstdecedent', number='4')
+            self.assertEqual(get_next_date.call_count, 2)
+
+            with mock.patch.object(
+                geocoding,
+                'lookup_location',
+                side_effect=maps.MapsUnavailableError,
+            ):
+                self.calculate('firstdecedent', location='Alameda')
+                self.calculate('firstdecedent', location='Alameda')
+
+            self.assertEqual(get_next_date.call_count, 4)
+
+
+class SharedCalculateTestCase(TestCase):
+    """Test for the shared, cacheable result pages."""
+
+    def setUp(self):
+        """Set-up to happen before each test."""
+
+        caches['results'].clear()
+        CustomUser.objects.create_user(
+            email='test1@test.test',
+            password='testpassword',
+        )
+
+    def test_calculate_shared(self):
+        """Test that a GET to calculate renders a public result page.
+
+        Verify that the page is cacheable until midnight, sets no cookies
+        and doesn't vary on them, whether or not the visitor is logged in,
+        carries the result to save, and that malformed parameters redirect
+        to the calculator.
+
+        """
+
+        c.login(email='test1@test.test', password='testpassword')
+        shared_response = c.get(
+            '/yahrzeit/calculate',
+            {
+                'name': 'testdecedent',
+                'date': '2022-02-01',
+                'tod': 'before-sunset',
+                'years': '3',
+            },
+        )
+        self.assertContains(shared_response, 'testdecedent\'s next yahrzeit')
+        self.assertContains(shared_response, 'id="save-data"')
+        self.assertIn('public', shared_response['Cache-Control'])
+        self.assertIn('max-age=', shared_response['Cache-Control'])
+        self.assertNotIn(
+            'Cookie',
+            shared_response.get('Vary', ''),
+            'The page should be the same for every visitor',
+        )
+        self.assertEqual(
+            len(shared_response.cookies),
+            0,
+            'The page should not set cookies',
+        )
+
+        for params in (
+            {'date': 'not-a-date'},
+            {'date': '2022-02-01', 'tod': 'at-noon'},
+            {'date': '2022-02-01', 'years': '0'},
+        ):
+            self.assertRedirects(
+                c.get('/yahrzeit/calculate', params),
+                '/yahrzeit/',
+                fetch_redirect_response=False,
+            )
+
+        c.logout()
+
+    def test_calculate_shared_degraded(self):
+        """Test a shared result page while Google Maps is unavailable.
+
+        Verify that a page missing its candle-lighting times isn't public
+        or kept until midnight, and that the same page is once Maps is
+        back.
+
+        """
+
+        params = {
+            'name': 'testdecedent',
+            'date': '2022-02-01',
+            'years': '3',
+            'location': 'Alameda',
+        }
+
+        with mock.patch.object(
+            geocoding,
+            'lookup_location',
+            side_effect=maps.MapsUnavailableError,
+        ):
+            degraded_response = c.get('/yahrzeit/calculate', params)
+
+        self.assertContains(degraded_response, 'testdecedent')
+        self.assertIn('no-cache', degraded_response['Cache-Control'])
+        self.assertNotIn('public', degraded_response['Cache-Control'])
+        self.assertNotIn('max-age=', degraded_response['Cache-Control'])
+
+        with mock.patch.object(
+            views,
+            '_lookup_erev_sunset_times',
+            return_value=[None] * 3,
+        ):
+            response = c.get('/yahrzeit/calculate', params)
+
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+
+    def test_save_posted_result(self):
+        """Test that save_res and activate_res take a result in the body.
+
+        Verify that an anonymous save fails, that activating stores the
+        result in the cookie, and that a logged-in save creates the
+        decedent.
+
+        """
+
+        save_data = (
+            '{"name": "testdecedent", "date": "2022-02-01",'
+            ' "tod": "before-sunset"}'
+        )
+
+        anon_save_response = c.post(
+            '/yahrzeit/api/save-res',
+            save_data,
+            content_type='application/json',
+        )
+        self.assertJSONEqual(
+            anon_save_response.content,
+            {'status': 'failure'},
+        )
+
+        activate_response = c.post(
+            '/yahrzeit/api/activate-res',
+            save_data,
+            content_type='application/json',
+        )
+        self.assertJSONEqual(activate_response.content, {'status': 'success'})
+        result = results.unpack_result(signing.loads(
+            activate_response.cookies[results.COOKIE_NAME].value,
+            salt=results.SALT,
+        ))
+        self.assertEqual(result['decedent_name'], 'testdecedent')
+        self.assertEqual(result['status'], results.ACTIVE)
+        c.cookies.pop(results.COOKIE_NAME)
+
+        c.login(email='test1@test.test', password='testpassword')
+        save_response = c.post(
+            '/yahrzeit/api/save-res',
+            save_data,
+            content_type='application/json',
+        )
+        self.assertJSONEqual(save_response.content, {'status': 'success'})
+        self.assertTrue(
+            Decedent.objects.filter(name='testdecedent').exists(),
+            'The posted result should be saved',
+        )
+        c.logout()
+
+
+class SecondsUntilTomorrowTestCase(TestCase):
+    """Test for the time until cached results expire."""
+
+    @override_settings(TIME_ZONE='America/Los_Angeles')
+    def test_seconds_until_tomorrow(self):
+        """Test that results expire at midnight in settings.TIME_ZONE.
+
+        At 07:00 UTC it is 23:00 in Los Angeles, an hour before midnight
+        there, whatever the system's timezone is.
+
+        """
+
+        with mock.patch(
+            'django.utils.timezone.now',
+            return_value=datetime(2024, 1, 1, 7, tzinfo=timezone.utc),
+        ):
+            self.assertEqual(views._seconds_until_tomorrow(), 3600)
+
+
+class CalculateBatchTestCase(TestCase):
+    """Test for the batch calculation API."""
+
+    def test_calculate_batch(self):
+        """Test the calculate_batch view function.
+
+        Post a batch with a repeated anniversary and verify the results are
+        in order, named and sized by years. Verify that malformed items and
+        dates that can't be calculated fail on their own, and that a
+        non-list body and a batch that is too big fail as a whole.
+
+        """
+
+        batch = [
+            {'name': 'a', 'date': '2022-02-01', 'years': 3},
+            {'name': 'b', 'date': '1990-05-05', 'after_sunset': True},
+            {'name': 'c', 'date': '2022-02-01', 'years': 2},
+        ]
+
+        res = c.post(
+            '/yahrzeit/api/calculate-batch',
+            batch,
+            content_type='application/json',
+        ).json()
+
+        self.assertEqual(res['status'], 'success')
+        self.assertEqual(
+            [result['name'] for result in res['results']],
+            ['a', 'b', 'c'],
+        )
+        self.assertEqual(
+            [result['status'] for result in res['results']],
+            ['success'] * 3,
+        )
+        self.assertEqual(
+            [len(result['following_dates']) for result in res['results']],
+            [2, 0, 1],
+            'Each result should have years - 1 following dates',
+        )
+        self.assertEqual(
+            res['results'][0]['next_date_h'],
+            res['results'][2]['next_date_h'],
+        )
+
+        res = c.post(
+            '/yahrzeit/api/calculate-batch',
+            [
+                {'name': 'a', 'date': '2022-13-01'},
+                {'name': 'b', 'date': '2022-02-01', 'years': 0},
+                {'name': 'c'},
+                1,
+                {'name': 'e', 'date': '1700-01-01'},
+                {'name': 'f', 'date': '2022-11-24', 'years': 3},
+                {'name': 'g', 'date': '2022-02-01'},
+            ],
+            content_type='application/json',
+        ).json()
+        self.assertEqual(res['status'], 'success')
+        self.assertEqual(
+            [result['status'] for result in res['results']],
+            ['failure'] * 6 + ['success'],
+            'Only the bad items should fail',
+        )
+        self.assertEqual(res['results'][6]['name'], 'g')
+
+        for body in (
+            {'name': 'a', 'date': '2022-02-01'},
+            [{'date': '2022-02-01'}] * 1001,
+        ):
+            res = c.post(
+                '/yahrzeit/api/calculate-batch',
+                body,
+                content_type='application/json',
+            ).json()
+            self.assertEqual(
+                res['status'],
+                'failure',
+                f'Batch {str(body)[:40]} should fail',
+            )
+
+    def test_calculate_batch_csrf(self):
+        """Test that calculate_batch takes posts without a CSRF token."""
+
+        res = Client(enforce_csrf_checks=True).post(
+            '/yahrzeit/api/calculate-batch',
+            [{'name': 'a', 'date': '2022-02-01'}],
+            content_type='application/json',
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['status'], 'success')
+
+
+class FollowingDatesTestCase(TestCase):
+    """Test for the paginated following dates API."""
+
+    def test_get_following_dates(self):
+        """Test the get_following_dates view function.
+
+        Request two consecutive pages and verify that they continue from each
+        other. Verify that the limit is capped and that a bad date fails.
+
+        """
+
+        first_page = c.get(
+            '/yahrzeit/api/following-dates/2022-02-01',
+            {'TOD': 'before-sunset', 'limit': 2},
+        ).json()
+        self.assertEqual(first_page['status'], 'success')
+        self.assertEqual(len(first_page['following_dates']), 2)
+
+        second_page = c.get(
+            '/yahrzeit/api/following-dates/2022-02-01',
+            {
+                'TOD': 'before-sunset',
+                'offset': first_page['next_offset'],
+                'limit': 2,
+            },
+        ).json()
+        first_year = int(first_page['following_dates'][0]['date_h'][:4])
+        self.assertEqual(
+            [date['date_h'] for date in second_page['following_dates']],
+            [f'{first_year + 2}-11-30', f'{first_year + 3}-11-30'],
+            'Second page should continue from the first',
+        )
+
+        capped_page = c.get(
+            '/yahrzeit/api/following-dates/2022-02-01',
+            {'limit': 1000},
+        ).json()
+        self.assertEqual(capped_page['limit'], 100)
+        self.assertEqual(len(capped_page['following_dates']), 100)
+
+        bad_date = c.get('/yahrzeit/api/following-dates/2022-02-31').json()
+        self.assertEqual(bad_date['status'], 'failure')
+
+        for date_string, params in (
+            ('2020-01-05', {'offset': 10000000, 'limit': 2}),
+            ('2020-01-05', {'offset': 1000, 'limit': 2}),
+            # 30 Cheshvan 5783, which 5788 doesn't have.
+            ('2022-11-24', {'limit': 3}),
+        ):
+            page = c.get(
+                f'/yahrzeit/api/following-dates/{date_string}',
+                params,
+            )
+            self.assertEqual(page.status_code, 200)
+            self.assertEqual(
+                page.json()['status'],
+                'failure',
+                f'{date_string} with {params} should fail',
+            )
+
+    def test_erev_sunset_times(self):
+        """Test the get_following_dates view function with a location.
+
+        Mock the location lookup and verify that it happens once for a whole
+        page, and that every date gets the sunset on its eve.
+
+        """
+
+        alameda = LocationInfo(
+            'Alameda',
+            'United States',
+            'America/Los_Angeles',
+            37.7652,
+            -122.2416,
+        )
+
+        with mock.patch.object(
+            geocoding,
+            'lookup_location',
+            return_value=alameda,
+        ) as lookup_location:
+            page = c.get(
+                '/yahrzeit/api/following-dates/2022-02-01',
+                {'TOD': 'before-sunset', 'limit': 5, 'location': 'Alameda'},
+            ).json()
+
+        lookup_location.assert_called_once_with('Alameda')
+        self.assertEqual(len(page['following_dates']), 5)
+        for following_date in page['following_dates']:
+            self.assertRegex(
+                following_date['erev_sunset_time'],
+                r'^5:\d\d PM$',
+                'Erev sunset should be in the late afternoon in winter',
+            )
+
+    def test_following_dates_etag(self):
+        """Test the get_following_dates view function's ETag.
+
+        Verify that the ETag depends on the location, that the response is
+        private, and that a page missing erev sunsets because Google Maps was
+        unavailable gets no ETag.
+
+        """
+
+        alameda = LocationInfo(
+            'Alameda',
+            'United States',
+            'America/Los_Angeles',
+            37.7652,
+            -122.2416,
+        )
+        url = '/yahrzeit/api/following-dates/2022-02-01'
+
+        with mock.patch.object(
+            geocoding,
+            'lookup_location',
+            return_value=alameda,
+        ):
+            alameda_page = c.get(url, {'limit': 2, 'location': 'Alameda'})
+            other_page = c.get(url, {'limit': 2, 'location': 'Oakland'})
+
+        self.assertIn('private', alameda_page['Cache-Control'])
+        self.assertNotEqual(alameda_page['ETag'], other_page['ETag'])
+
+        with mock.patch.object(
+            geocoding,
+            'lookup_location',
+            side_effect=maps.MapsUnavailableError,
+        ):
+            outage_page = c.get(url, {'limit': 2, 'location': 'Berkeley'})
+
+        self.assertIsNone(
+            outage_page.json()['following_dates'][0]['erev_sunset_time'],
+        )
+        self.assertFalse(
+            outage_page.has_header('ETag'),
+            'A page missing sunsets should not be revalidated',
+        )
+
+
+class SunsetTableTestCase(TestCase):
+    """Test for the sunset table API."""
+
+    def test_get_sunset_table(self):
+        """Test the get_sunset_table view function.
+
+        Mock the location lookup, request a leap year's table and verify that
+        it has a sunset for every day. Verify that a bad year or an unknown
+        location fails.
+
+        """
+
+        alameda = LocationInfo(
+            'Alameda',
+            'United States',
+            'America/Los_Angeles',
+            37.7652,
+            -122.2416,
+        )
+
+        with mock.patch.object(
+            geocoding,
+            'lookup_location',
+            return_value=alameda,
+        ):
+            table = c.get(
+                '/yahrzeit/api/sunset-table/Alameda',
+                {'year': 2024},
+            ).json()
+            bad_year = c.get(
+                '/yahrzeit/api/sunset-table/Alameda',
+                {'year': 'x'},
+            ).json()
+
+        self.assertEqual(table['status'], 'success')
+        self.assertEqual(len(table['sunset_times']), 366)
+        self.assertEqual(
+            table['sunset_times'][74],
+            {'date': '2024-03-15', 'sunset_time': '7:16 PM'},
+        )
+        self.assertEqual(bad_year['status'], 'failure')
+
+        with mock.patch.object(
+            geocoding,
+            'lookup_location',
+            return_value=None,
+        ):
+            unknown = c.get('/yahrzeit/api/sunset-table/nowhere').json()
+        self.assertEqual(unknown['status'], 'failure')
+
+
+class LocationsTestCase(TestCase):
+    """Test for the location autocomplete API."""
+
+    def test_get_locations(self):
+        """Test the get_locations view function.
+
+        Verify that a prefix returns matching places from the gazetteer,
+        that limit applies, and that a bad limit fails.
+
+        """
+
+        res = c.get('/yahrzeit/api/locations', {'q': 'jeru'}).json()
+        limited = c.get(
+            '/yahrzeit/api/locations',
+            {'q': 's', 'limit': 2},
+        ).json()
+        bad_limit = c.get(
+            '/yahrzeit/api/locations',
+            {'q': 's', 'limit': 0},
+        ).json()
+
+        self.assertEqual(res['status'], 'success')
+        self.assertEqual(res['locations'][0]['label'], 'Jerusalem, Israel')
+        self.assertEqual(res['locations'][0]['timezone'], 'Asia/Jerusalem')
+        self.assertEqual(len(limited['locations']), 2)
+        self.assertEqual(bad_limit['status'], 'failure')
@@ -0,0 +1,58 @@
+"""Offline timezone lookup for Yahrzeit app.
+
+Finds the IANA timezone for coordinates with timezonefinder, which tests
+points against timezone boundary polygons bundled with the package, using
+an H3 grid to pick the few polygons worth testing. The boundary data is
+memory-mapped rather than loaded, so it takes little memory and the pages
+are shared by every worker process on a host. timezonefinder itself is
+imported on first use, as only locations missing from the geocoding cache
+need it.
+
+"""
+
+from threading import Lock
+from typing import TYPE_CHECKING, Union
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+if TYPE_CHECKING:
+    from timezonefinder import TimezoneFinder
+
+_finder = None
+_finder_lock = Lock()
+
+
+def get_finder() -> 'TimezoneFinder':
+    """Return the process-wide TimezoneFinder, creating it on first use."""
+
+    global _finder
+
+    if _finder is None:
+        with _finder_lock:
+            if _finder is None:
+                from timezonefinder import TimezoneFinder
+
+                _finder = TimezoneFinder(in_memory=False)
+
+    return _finder
+
+
+def timezone_at(lat: float, lng: float) -> Union[str, None]:
+    """Return the timezone ID for coordinates.
+
+    Points at sea get an Etc/GMT zone. Return None if no zone is found or
+    the zone is missing from this system's timezone database.
+
+    """
+
+    tz = get_finder().timezone_at(lat=lat, lng=lng)
+
+    if tz is None:
+        return
+
+    try:
+        ZoneInfo(tz)
+
+    except ZoneInfoNotFoundError:
+        return
+
+    return tz
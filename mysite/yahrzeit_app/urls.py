@@ -16,12 +16,35 @@ urlpatterns = [
     path('login', views.do_login, name='login'),
     path('logout', views.do_logout, name='logout'),
     path('calculate', views.calculate, name='calculate'),
+    path(
+        'api/calculate-batch',
+        views.calculate_batch,
+        name='calculate_batch',
+    ),
+    path('api/csrf', views.get_csrf_cookie, name='csrf'),
     path('api/save-res', views.save_res, name='save_res'),
     path('api/activate-res', views.activate_res, name='activate_res'),
     path('dashboard', views.dashboard, name='dashboard'),
+    path('api/decedents', views.get_decedents, name='get_decedents'),
+    path(
+        'calendar/<str:token>.ics',
+        views.get_calendar_feed,
+        name='calendar_feed',
+    ),
     path(
         'api/get-sunset-time/<str:date_string>/<str:location_string>',
         views.get_sunset_time,
         name='get_sunset_time',
     ),
+    path(
+        'api/sunset-table/<str:location_string>',
+        views.get_sunset_table,
+        name='get_sunset_table',
+    ),
+    path('api/locations', views.get_locations, name='get_locations'),
+    path(
+        'api/following-dates/<str:date_string>',
+        views.get_following_dates,
+        name='get_following_dates',
+    ),
 ]
@@ -1,21 +1,160 @@
 """View functions for yahrzeit app."""
 
+from datetime import MAXYEAR, MINYEAR, date, datetime, time, timedelta
+from functools import wraps
+import hashlib
 import json
-from typing import Union
+from typing import List, Tuple, Union
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth import login, logout, authenticate
+from django.contrib.auth import login, logout, authenticate, get_user
+from django.contrib.auth.models import AnonymousUser
+from django.core import signing
+from django.core.cache import caches
 from django.http import (
+    Http404,
     HttpRequest,
     HttpResponse,
     HttpResponseRedirect,
     JsonResponse,
+    QueryDict,
+    StreamingHttpResponse,
 )
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.safestring import mark_safe
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from django.views.decorators.http import condition
+from yahrzeit_app import calendar_feed
+from yahrzeit_app import formatting
+from yahrzeit_app import gazetteer
+from yahrzeit_app import hebrew_calendar
 from yahrzeit_app import helpers
 from yahrzeit_app import crud
+from yahrzeit_app import geocoding
+from yahrzeit_app import maps
+from yahrzeit_app import results
+from yahrzeit_app import solar
+from yahrzeit_app import sunset_cache
+from yahrzeit_app.models import CustomUser
 
+FOLLOWING_DATES_MAX_LIMIT = 100
+DECEDENTS_MAX_LIMIT = 100
+LOCATIONS_MAX_LIMIT = 20
+CALCULATE_BATCH_MAX_SIZE = 1000
+RESULT_CACHE = 'results'
 
+
+def _etag(*parts) -> str:
+    """Return a strong ETag made from parts."""
+
+    digest = hashlib.sha256('|'.join(map(str, parts)).encode()).hexdigest()
+
+    return f'"{digest[:32]}"'
+
+
+def _page_etag(request: HttpRequest, *args, **kwargs) -> Union[str, None]:
+    """ETag for a page that changes only with the day, the logged in user
+    and the CSRF secret its form token is made from.
+
+    None, so the page is rendered, if a message is waiting to be shown or
+    the client has no CSRF cookie yet.
+
+    """
+
+    csrf_secret = request.META.get('CSRF_COOKIE')
+
+    if not csrf_secret or len(messages.get_messages(request)):
+        return
+
+    return _etag(helpers.today_date_string(), request.user.pk, csrf_secret)
+
+
+def _decedents_etag(
+    request: HttpRequest,
+    *args,
+    **kwargs,
+) -> Union[str, None]:
+    """ETag for the logged in user's decedents.
+
+    Made from the user's decedents version and the day, so a conditional
+    request is answered from the user row alone. None for anonymous users
+    or if a message is waiting to be shown.
+
+    """
+
+    user = request.user
+
+    if not user.is_authenticated or len(messages.get_messages(request)):
+        return
+
+    return _etag(
+        user.pk,
+        user.decedents_version,
+        helpers.today_date_string(),
+    )
+
+
+def _decedents_last_modified(
+    request: HttpRequest,
+    *args,
+    **kwargs,
+) -> Union[datetime, None]:
+    """Last-Modified for the logged in user's decedents.
+
+    The later of when they last changed and the start of today.
+
+    """
+
+    if _decedents_etag(request) is None:
+        return
+
+    return max(
+        request.user.decedents_modified,
+        timezone.make_aware(datetime.combine(helpers.today_date(), time.min)),
+    )
+
+
+def _following_dates_etag(request: HttpRequest, *args, **kwargs) -> str:
+    """ETag for get_following_dates, which changes with the day and the
+    location as well as the URL.
+
+    """
+
+    return _etag(
+        helpers.today_date_string(),
+        geocoding.normalize_location(request.GET.get('location', '')),
+    )
+
+
+def _drop_incomplete_etag(view_func):
+    """Remove the ETag from responses that the view marks incomplete.
+
+    A response is incomplete when a service it depends on was unavailable.
+    It mustn't be revalidated for the rest of the day, so it gets no ETag.
+
+    """
+
+    @wraps(view_func)
+    def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        response = view_func(request, *args, **kwargs)
+
+        if getattr(response, 'incomplete', False):
+            del response.headers['ETag']
+
+        return response
+
+    return wrapper
+
+
+@ensure_csrf_cookie
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_page_etag)
 def index(request: HttpRequest) -> Union[HttpResponse, HttpResponseRedirect]:
     """Render homepage."""
 
@@ -24,7 +163,8 @@ def index(request: HttpRequest) -> Union[HttpResponse, HttpResponseRedirect]:
     today = helpers.today_date_string()
 
     context = {
-        'js_key': helpers.js_key,
+        'js_key': settings.JS_KEY,
+        'local_geocoder': settings.GEOCODER == 'local',
         'today': today,
         'logged_in': logged_in,
     }
@@ -32,6 +172,8 @@ def index(request: HttpRequest) -> Union[HttpResponse, HttpResponseRedirect]:
     return render(request, 'index.html', context)
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_page_etag)
 def create_account_form(request: HttpRequest) -> Union[
     HttpResponse,
     HttpResponseRedirect,
@@ -44,40 +186,55 @@ def create_account_form(request: HttpRequest) -> Union[
     return render(request, 'create_account.html')
 
 
-def do_create_account(request: HttpRequest) -> JsonResponse:
+def _welcome_new_user(request: HttpRequest, user: CustomUser) -> None:
+    """Tell a new user their account was created and log them in.
+
+    Both use the session, which is synchronous, so do_create_account runs
+    them together in one sync_to_async call.
+
+    """
+
+    messages.add_message(
+        request,
+        messages.INFO,
+        'Account successfully created',
+    )
+    login(request, user=user)
+
+
+async def do_create_account(request: HttpRequest) -> JsonResponse:
     """API endpoint that performs checks and saves new account to database if checks pass."""
 
     request_data = json.loads(request.body)
     email = request_data['email']
     password = request_data['password']
 
-    user = crud.create_user(email, password)
+    user = await crud.acreate_user(email, password)
 
     if user:
-        messages.add_message(
-            request,
-            messages.INFO,
-            'Account successfully created',
-        )
-        login(request, user=user)
+        await sync_to_async(_welcome_new_user)(request, user)
 
-        result = request.session.get('result')
+        response = JsonResponse({'status': 'success'})
+        result = results.get_result(request)
 
-        if result and result['status'] == 'active':
-            crud.create_decedent(
+        if result and result['status'] == results.ACTIVE:
+            await crud.acreate_decedent(
                 user,
                 result['decedent_name'],
                 result['death_date_h'],
                 result['next_date_h'],
                 result['next_date_g'],
+                result['after_sunset'],
             )
-            del request.session['result']
+            results.delete_result(response)
 
-        return JsonResponse({'status': 'success'})
+        return response
 
     return JsonResponse({'status': 'failure'})
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_page_etag)
 def login_form(request: HttpRequest) -> Union[
     HttpResponse,
     HttpResponseRedirect,
@@ -103,19 +260,21 @@ def do_login(request: HttpRequest) -> HttpResponseRedirect:
 
         crud.update_decedents_for_user(user)
 
-        result = request.session.get('result')
+        response = redirect('dashboard')
+        result = results.get_result(request)
 
-        if result and result['status'] == 'active':
+        if result and result['status'] == results.ACTIVE:
             crud.create_decedent(
                 user,
                 result['decedent_name'],
                 result['death_date_h'],
                 result['next_date_h'],
                 result['next_date_g'],
+                result['after_sunset'],
             )
-            del request.session['result']
+            results.delete_result(response)
 
-        return redirect('dashboard')
+        return response
 
     messages.add_message(
         request,
@@ -135,24 +294,176 @@ def do_logout(request: HttpRequest) -> HttpResponseRedirect:
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(
+    etag_func=_decedents_etag,
+    last_modified_func=_decedents_last_modified,
+)
 def dashboard(request: HttpRequest) -> Union[
     HttpResponse,
     HttpResponseRedirect,
 ]:
-    """Render user dashboard."""
+    """Render a page of the user's dashboard.
+
+    Takes an after query parameter holding the cursor of the page to render.
+    A malformed cursor renders the first page.
+
+    """
+
+    after = request.GET.get('after')
 
-    decedents = crud.get_decedents_for_user(request.user)
+    try:
+        decedents, next_cursor = crud.get_decedents_page(request.user, after)
+
+    except ValueError:
+        after = None
+        decedents, next_cursor = crud.get_decedents_page(request.user)
 
     context = {
         'decedents': decedents,
+        'next_cursor': next_cursor,
+        'is_first_page': not after,
+        'feed_token': calendar_feed.feed_token(request.user),
     }
 
     return render(request, 'dashboard.html', context)
 
 
+def _erev_sunset_times(
+    location_string: Union[str, None],
+    g_dates: List[date],
+) -> List[Union[str, None]]:
+    """Look up a location once and get erev yahrzeit sunsets for dates.
+
+    Every time is None if no location is given or it can't be resolved.
+
+    """
+
+    try:
+        return _lookup_erev_sunset_times(location_string, g_dates)
+
+    except maps.MapsUnavailableError:
+        return [None] * len(g_dates)
+
+
+def _lookup_erev_sunset_times(
+    location_string: Union[str, None],
+    g_dates: List[date],
+) -> List[Union[str, None]]:
+    """Like _erev_sunset_times, but raises maps.MapsUnavailableError if the
+    location can't be looked up.
+
+    """
+
+    location = None
+
+    if location_string:
+        location = geocoding.lookup_location(location_string)
+
+    if location is None:
+        return [None] * len(g_dates)
+
+    return helpers.get_erev_sunset_times(location, g_dates)
+
+
+def _seconds_until_tomorrow() -> int:
+    """Return the number of seconds until midnight in settings.TIME_ZONE."""
+
+    now = timezone.localtime()
+    tomorrow = timezone.make_aware(
+        datetime.combine(now.date() + timedelta(days=1), time.min),
+    )
+
+    return max(int((tomorrow - now).total_seconds()), 1)
+
+
+def _calculate_result(
+    decedent_date: str,
+    after_sunset: bool,
+    num_years: int,
+    location_string: Union[str, None],
+) -> dict:
+    """Calculate a result page's dates and render its dates table.
+
+    The result only depends on the arguments and today's date, so it is
+    cached in the results cache, keyed on those, until midnight, when
+    today's date changes. A result whose candle-lighting times are missing
+    because Google Maps was unavailable isn't cached, and has 'cacheable'
+    set to False so that pages built from it aren't cached either.
+
+    """
+
+    death_date = formatting.parse_date(decedent_date)
+    location_key = geocoding.normalize_location(location_string or '')
+    key = 'result:{}:{}:{}:{}:{}'.format(
+        death_date.isoformat(),
+        int(after_sunset),
+        num_years,
+        helpers.today_date_string(),
+        hashlib.sha256(location_key.encode()).hexdigest()[:32],
+    )
+
+    result = caches[RESULT_CACHE].get(key)
+    if result is not None:
+        return result
+
+    next_date_h, next_date_g, is_it_today = helpers.get_next_date(
+        decedent_date,
+        after_sunset,
+    )
+
+    following_dates = helpers.get_following_dates(next_date_h, num_years-1)
+    g_dates = [next_date_g.to_pydate()] + [
+        following_date.gregorian.to_pydate()
+        for following_date in following_dates
+    ]
+    cacheable = True
+
+    try:
+        erevs = _lookup_erev_sunset_times(location_string, g_dates)
+
+    except maps.MapsUnavailableError:
+        erevs = [None] * len(g_dates)
+        cacheable = False
+
+    next_date_erev, *following_erevs = erevs
+
+    result = {
+        'death_date_h': helpers.greg_to_heb(decedent_date),
+        'next_date_h_db': helpers.h_date_stringify_db(next_date_h),
+        'next_date_g_db': helpers.g_date_stringify_db(next_date_g),
+        'next_date_h': helpers.h_date_stringify_res(next_date_h),
+        'next_date_g': helpers.g_date_stringify_res(next_date_g),
+        'is_it_today': is_it_today,
+        'cacheable': cacheable,
+        'dates_html': render_to_string(
+            'result_dates.html',
+            {
+                'next_date_erev': next_date_erev,
+                'following_dates': list(zip(
+                    following_dates,
+                    following_erevs,
+                )),
+            },
+        ),
+    }
+
+    if cacheable:
+        caches[RESULT_CACHE].set(key, result, _seconds_until_tomorrow())
+
+    return result
+
+
 def calculate(request: HttpRequest) -> HttpResponse:
-    """Calculate next yahrzeit date."""
-    # TODO Should this be GET since we're not writing to database?
+    """Calculate next yahrzeit date.
+
+    A GET is answered by calculate_shared. A POST from the calculator form
+    also stores the result in the result cookie, for saving later.
+
+    """
+
+    if request.method == 'GET':
+        return calculate_shared(request)
 
     decedent_name = request.POST['decedent-name']
     decedent_date = request.POST['decedent-date']
@@ -162,77 +473,613 @@ def calculate(request: HttpRequest) -> HttpResponse:
 
     num_years = int(request.POST['number'])
 
-    next_date_h, next_date_g, is_it_today = helpers.get_next_date(
+    result = _calculate_result(
         decedent_date,
         after_sunset,
+        num_years,
+        request.POST.get('location'),
     )
 
-    following_dates = helpers.get_following_dates(next_date_h, num_years-1)
-
-    next_date_h_db = helpers.h_date_stringify_db(next_date_h)
-    next_date_g_db = helpers.g_date_stringify_db(next_date_g)
-
-    result_for_sesh = {
+    template_context = {
+        'logged_in': True if request.user.is_authenticated else False,
+        'next_date_h': result['next_date_h'],
+        'next_date_g': result['next_date_g'],
+        'dates_html': mark_safe(result['dates_html']),
+        'is_it_today': result['is_it_today'],
         'decedent_name': decedent_name,
-        'death_date_h': helpers.greg_to_heb(decedent_date),
-        'next_date_h': next_date_h_db,
-        'next_date_g': next_date_g_db,
-        'status': 'dormant',
     }
 
-    request.session['result'] = result_for_sesh
+    response = render(request, 'result.html', template_context)
+    results.set_result(response, {
+        'decedent_name': decedent_name,
+        'death_date_h': result['death_date_h'],
+        'next_date_h': result['next_date_h_db'],
+        'next_date_g': result['next_date_g_db'],
+        'after_sunset': after_sunset,
+        'status': results.DORMANT,
+    })
+
+    return response
+
+
+def _shared_result_params(
+    query: QueryDict,
+) -> Tuple[str, str, bool, int, str]:
+    """Parse the query parameters of a shared result page.
+
+    Returns (name, date, after_sunset, years, location). Raises ValueError
+    if they are missing or malformed.
+
+    """
+
+    decedent_date = formatting.parse_date(query.get('date', '')).isoformat()
+    tod = query.get('tod', 'before-sunset')
+
+    if tod not in ('before-sunset', 'after-sunset'):
+        raise ValueError('tod must be before-sunset or after-sunset.')
+
+    num_years = int(query.get('years', 1))
+
+    if not 1 <= num_years <= FOLLOWING_DATES_MAX_LIMIT + 1:
+        raise ValueError('years is out of range.')
+
+    return (
+        query.get('name', ''),
+        decedent_date,
+        tod == 'after-sunset',
+        num_years,
+        query.get('location', ''),
+    )
+
+
+def calculate_shared(request: HttpRequest) -> HttpResponse:
+    """Render a result from date, tod, years, name and location query
+    parameters.
+
+    The page depends only on its URL and the day: it doesn't read the user,
+    session or messages, and doesn't set cookies. So it is public, and
+    browsers and shared caches can keep it until midnight, when today's
+    date changes, unless its candle-lighting times are missing because
+    Google Maps was unavailable. Saving the result is a separate POST to
+    save_res or activate_res. Malformed parameters redirect to the
+    calculator.
 
-    next_date_h_res = helpers.h_date_stringify_res(next_date_h)
-    next_date_g_res = helpers.g_date_stringify_res(next_date_g)
+    """
+
+    try:
+        decedent_name, decedent_date, after_sunset, num_years, location = (
+            _shared_result_params(request.GET)
+        )
+        result = _calculate_result(
+            decedent_date,
+            after_sunset,
+            num_years,
+            location,
+        )
+
+    except ValueError:
+        return redirect('index')
 
     template_context = {
-        'logged_in': True if request.user.is_authenticated else False,
-        'next_date_h': next_date_h_res,
-        'next_date_g': next_date_g_res,
-        'following_dates': following_dates,
-        'is_it_today': is_it_today,
+        'shared': True,
+        'next_date_h': result['next_date_h'],
+        'next_date_g': result['next_date_g'],
+        'dates_html': mark_safe(result['dates_html']),
+        'is_it_today': result['is_it_today'],
         'decedent_name': decedent_name,
+        'save_data': {
+            'name': decedent_name,
+            'date': decedent_date,
+            'tod': 'after-sunset' if after_sunset else 'before-sunset',
+        },
     }
 
-    return render(request, 'result.html', template_context)
+    response = render(request, 'result.html', template_context)
+
+    if result['cacheable']:
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=_seconds_until_tomorrow(),
+        )
 
+    else:
+        patch_cache_control(response, no_cache=True)
 
-def save_res(request: HttpRequest) -> JsonResponse:
-    """API endpoint that saves a calculation result for a logged in user."""
+    return response
+
+
+def _posted_result(request: HttpRequest) -> Union[dict, None]:
+    """Build a dormant result from a JSON body with name, date and tod.
+
+    Return None if the request has no body or it is malformed.
+
+    """
+
+    if not request.body:
+        return
+
+    try:
+        save_data = json.loads(request.body)
+        decedent_name, decedent_date, after_sunset, _, _ = (
+            _shared_result_params(save_data)
+        )
+        result = _calculate_result(decedent_date, after_sunset, 1, None)
+
+    except (AttributeError, TypeError, ValueError):
+        return
+
+    return {
+        'decedent_name': str(decedent_name),
+        'death_date_h': result['death_date_h'],
+        'next_date_h': result['next_date_h_db'],
+        'next_date_g': result['next_date_g_db'],
+        'after_sunset': after_sunset,
+        'status': results.DORMANT,
+    }
 
-    result = request.session.get('result')
 
-    if not result or not request.user.is_authenticated:
+def _batch_item(item: dict) -> Tuple[date, bool, int]:
+    """Parse an item of a calculate_batch request.
+
+    Returns (death date, after sunset, years), with years capped at
+    FOLLOWING_DATES_MAX_LIMIT + 1. Raises ValueError if it is malformed.
+
+    """
+
+    try:
+        death_date = formatting.parse_date(item['date'])
+        num_years = int(item.get('years', 1))
+
+    except (AttributeError, KeyError, TypeError) as e:
+        raise ValueError('Malformed batch item.') from e
+
+    if num_years < 1:
+        raise ValueError('Years must be positive.')
+
+    return (
+        death_date,
+        item.get('after_sunset') is True,
+        min(num_years, FOLLOWING_DATES_MAX_LIMIT + 1),
+    )
+
+
+def _yahrzeits_or_failures(parsed: List[Tuple[date, bool, int]]) -> list:
+    """Calculate yahrzeits for parsed batch items.
+
+    The items are calculated together. If that fails, they are calculated
+    one at a time, and the ones that fail, such as dates outside the
+    calendar tables, get a failure result.
+
+    """
+
+    def calculate(items):
+        death_dates, after_sunset_mask, num_years = zip(*items)
+
+        return helpers.get_yahrzeits_batch(
+            list(death_dates),
+            list(after_sunset_mask),
+            list(num_years),
+        )
+
+    try:
+        return calculate(parsed)
+
+    except (OverflowError, ValueError):
+        pass
+
+    results = []
+    for item in parsed:
+        try:
+            results += calculate([item])
+
+        except (OverflowError, ValueError):
+            results.append({'status': 'failure'})
+
+    return results
+
+
+@csrf_exempt
+def calculate_batch(request: HttpRequest) -> JsonResponse:
+    """API endpoint that calculates yahrzeits for a list of decedents.
+
+    Takes a JSON array of objects with name, date, after_sunset and years
+    keys, where years counts the next yahrzeit and is capped at
+    FOLLOWING_DATES_MAX_LIMIT + 1. Returns a result for each, in order,
+    with a status of its own: an item that is malformed or can't be
+    calculated fails without failing the rest. The whole batch fails if it
+    isn't a list or has more than CALCULATE_BATCH_MAX_SIZE items.
+
+    It reads no cookies or session, so integrations can post to it without
+    a CSRF token.
+
+    """
+
+    try:
+        items = json.loads(request.body)
+
+    except ValueError:
+        return JsonResponse({'status': 'failure'})
+
+    if not isinstance(items, list) or len(items) > CALCULATE_BATCH_MAX_SIZE:
+        return JsonResponse({'status': 'failure'})
+
+    parsed = {}
+    for i, item in enumerate(items):
+        try:
+            parsed[i] = _batch_item(item)
+
+        except ValueError:
+            pass
+
+    calculated = dict(zip(
+        parsed,
+        _yahrzeits_or_failures(list(parsed.values())) if parsed else [],
+    ))
+
+    results = []
+    for i, item in enumerate(items):
+        name = item.get('name', '') if isinstance(item, dict) else ''
+        result = calculated.get(i, {'status': 'failure'})
+        result.setdefault('status', 'success')
+        result['name'] = str(name)
+        results.append(result)
+
+    return JsonResponse({'status': 'success', 'results': results})
+
+
+async def _aget_user(request: HttpRequest) -> Union[
+    CustomUser,
+    AnonymousUser,
+]:
+    """Load the request's user, which queries the database, asynchronously."""
+
+    return await sync_to_async(get_user)(request)
+
+
+async def save_res(request: HttpRequest) -> JsonResponse:
+    """API endpoint that saves a calculation result for a logged in user.
+
+    The result is taken from a JSON body with name, date and tod keys, as
+    a shared result page sends, or else from the result cookie.
+
+    """
+
+    result = (
+        await sync_to_async(_posted_result)(request)
+        or results.get_result(request)
+    )
+    user = await _aget_user(request)
+
+    if not result or not user.is_authenticated:
         return JsonResponse({'status': 'failure'})
 
-    crud.create_decedent(
-        request.user,
+    await crud.acreate_decedent(
+        user,
         result['decedent_name'],
-        helpers.greg_to_heb(result['death_date_h']),
+        result['death_date_h'],
         result['next_date_h'],
         result['next_date_g'],
+        result['after_sunset'],
     )
 
     return JsonResponse({'status': 'success'})
 
 
-def activate_res(request: HttpRequest) -> JsonResponse:
-    """API endpoint to activate result for saving upon creation of account or login."""
+async def activate_res(request: HttpRequest) -> JsonResponse:
+    """API endpoint to activate result for saving upon creation of account or login.
+
+    Like save_res, takes the result from a JSON body or the result cookie.
+
+    """
 
-    result = request.session.get('result')
+    result = (
+        await sync_to_async(_posted_result)(request)
+        or results.get_result(request)
+    )
 
     if not result:
         return JsonResponse({'status': 'failure'})
 
-    result['status'] = 'active'
-    request.session.modified = True
+    result['status'] = results.ACTIVE
+    response = JsonResponse({'status': 'success'})
+    results.set_result(response, result)
 
-    return JsonResponse({'status': 'success'})
+    return response
 
 
-def get_sunset_time(request: HttpRequest, date_string, location_string) -> JsonResponse:
+async def get_sunset_time(request: HttpRequest, date_string, location_string) -> JsonResponse:
     """API endpoint that returns JSON data of sunset time for given day."""
 
-    sunset_time = helpers.get_sunset_time(date_string, location_string)
+    try:
+        sunset_time = await sunset_cache.aget_sunset_time(
+            date_string,
+            location_string,
+        )
+
+    except (ValueError, maps.MapsUnavailableError):
+        return JsonResponse({'status': 'failure'})
 
     return JsonResponse({'sunset_time': sunset_time})
+
+
+def get_sunset_table(request: HttpRequest, location_string) -> JsonResponse:
+    """API endpoint that returns sunset times for every day of a year.
+
+    Takes a year query parameter, which defaults to the current year.
+
+    """
+
+    try:
+        year = int(request.GET.get('year', helpers.today_date().year))
+        location = geocoding.lookup_location(location_string)
+
+    except (ValueError, maps.MapsUnavailableError):
+        return JsonResponse({'status': 'failure'})
+
+    if location is None or not MINYEAR < year < MAXYEAR:
+        return JsonResponse({'status': 'failure'})
+
+    sunset_table = solar.sunset_table(location, year)
+
+    return JsonResponse({
+        'status': 'success',
+        'location': location.name,
+        'timezone': location.timezone,
+        'year': year,
+        'sunset_times': [
+            {
+                'date': day.isoformat(),
+                'sunset_time': (
+                    formatting.time_res(sunset) if sunset else None
+                ),
+            }
+            for day, sunset in sunset_table
+        ],
+    })
+
+
+@cache_control(private=True, no_cache=True)
+@_drop_incomplete_etag
+@condition(etag_func=_following_dates_etag)
+def get_following_dates(request: HttpRequest, date_string) -> JsonResponse:
+    """API endpoint that returns a page of future yahrzeits for a death date.
+
+    Takes TOD, offset and limit query parameters. Offset counts years after
+    the next yahrzeit and can't go past hebrew_calendar.LAST_YEAR, and limit
+    is capped at FOLLOWING_DATES_MAX_LIMIT. With a location query parameter,
+    each date also gets the time of sunset on its eve, when the yahrzeit
+    begins.
+
+    """
+
+    after_sunset = request.GET.get('TOD') == 'after-sunset'
+
+    try:
+        offset = int(request.GET.get('offset', 0))
+        limit = int(request.GET.get('limit', FOLLOWING_DATES_MAX_LIMIT))
+        next_date_h = helpers.get_next_date(date_string, after_sunset)[0]
+
+    except ValueError:
+        return JsonResponse({'status': 'failure'})
+
+    if (
+        offset < 0
+        or limit < 0
+        or next_date_h.year + offset > hebrew_calendar.LAST_YEAR
+    ):
+        return JsonResponse({'status': 'failure'})
+
+    limit = min(limit, FOLLOWING_DATES_MAX_LIMIT)
+
+    try:
+        following_dates = [
+            following_date.to_json()
+            for following_date in helpers.get_following_dates(
+                next_date_h,
+                limit,
+                offset,
+            )
+        ]
+
+    except (OverflowError, ValueError):
+        return JsonResponse({'status': 'failure'})
+
+    location_string = request.GET.get('location')
+    if location_string:
+        erev_sunset_times = _erev_sunset_times(
+            location_string,
+            [
+                formatting.parse_date(following_date['date_g'])
+                for following_date in following_dates
+            ],
+        )
+
+        for following_date, erev_sunset_time in zip(
+            following_dates,
+            erev_sunset_times,
+        ):
+            following_date['erev_sunset_time'] = erev_sunset_time
+
+    response = JsonResponse({
+        'status': 'success',
+        'offset': offset,
+        'limit': limit,
+        'next_offset': offset + limit,
+        'following_dates': following_dates,
+    })
+
+    # Missing times usually mean Google Maps was unavailable.
+    response.incomplete = bool(location_string) and None in (
+        following_date['erev_sunset_time']
+        for following_date in following_dates
+    )
+
+    return response
+
+
+@cache_control(private=True, no_cache=True)
+@condition(
+    etag_func=_decedents_etag,
+    last_modified_func=_decedents_last_modified,
+)
+def get_decedents(request: HttpRequest) -> JsonResponse:
+    """API endpoint that returns a page of a logged in user's decedents.
+
+    Takes after and limit query parameters. After is the next_cursor of the
+    previous page and limit is capped at DECEDENTS_MAX_LIMIT.
+
+    """
+
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': 'failure'})
+
+    try:
+        limit = int(request.GET.get('limit', crud.DECEDENTS_PAGE_SIZE))
+
+        if limit < 1:
+            raise ValueError('Limit must be positive.')
+
+        limit = min(limit, DECEDENTS_MAX_LIMIT)
+        decedents, next_cursor = crud.get_decedents_page(
+            request.user,
+            request.GET.get('after'),
+            limit,
+        )
+
+    except ValueError:
+        return JsonResponse({'status': 'failure'})
+
+    return JsonResponse({
+        'status': 'success',
+        'limit': limit,
+        'next_cursor': next_cursor,
+        'decedents': [decedent.to_json() for decedent in decedents],
+    })
+
+
+def get_locations(request: HttpRequest) -> JsonResponse:
+    """API endpoint that autocompletes a location from the gazetteer.
+
+    Takes q and limit query parameters. Returns places whose name starts
+    with q, and limit is capped at LOCATIONS_MAX_LIMIT.
+
+    """
+
+    try:
+        limit = int(request.GET.get('limit', gazetteer.SEARCH_LIMIT))
+
+        if limit < 1:
+            raise ValueError('Limit must be positive.')
+
+    except ValueError:
+        return JsonResponse({'status': 'failure'})
+
+    locations = gazetteer.search(
+        request.GET.get('q', ''),
+        min(limit, LOCATIONS_MAX_LIMIT),
+    )
+
+    return JsonResponse({
+        'status': 'success',
+        'locations': [
+            {
+                'name': location.name,
+                'region': location.region,
+                'label': f'{location.name}, {location.region}',
+                'timezone': location.timezone,
+                'latitude': location.latitude,
+                'longitude': location.longitude,
+            }
+            for location in locations
+        ],
+    })
+
+
+def _feed_user_pk(token: str) -> int:
+    """Return the pk of the user a feed token was made for.
+
+    Raises Http404 for a bad token.
+
+    """
+
+    try:
+        return calendar_feed.user_pk_from_token(token)
+
+    except signing.BadSignature:
+        raise Http404('Unknown calendar feed.')
+
+
+def _feed_years(request: HttpRequest) -> int:
+    """Return the years query parameter of a feed request.
+
+    A missing or bad value gives calendar_feed.FEED_YEARS, and the value is
+    capped at calendar_feed.MAX_FEED_YEARS.
+
+    """
+
+    try:
+        years = int(request.GET.get('years', calendar_feed.FEED_YEARS))
+
+    except ValueError:
+        return calendar_feed.FEED_YEARS
+
+    if years < 1:
+        return calendar_feed.FEED_YEARS
+
+    return min(years, calendar_feed.MAX_FEED_YEARS)
+
+
+def _calendar_feed_etag(request: HttpRequest, token: str) -> str:
+    """ETag for a user's calendar feed, from their decedents version."""
+
+    pk = _feed_user_pk(token)
+    version = CustomUser.objects.filter(pk=pk).values_list(
+        'decedents_version',
+        flat=True,
+    ).first()
+
+    if version is None:
+        raise Http404('Unknown calendar feed.')
+
+    return _etag(pk, version, _feed_years(request))
+
+
+@condition(etag_func=_calendar_feed_etag)
+def get_calendar_feed(
+    request: HttpRequest,
+    token: str,
+) -> StreamingHttpResponse:
+    """Stream a user's yahrzeits as an iCalendar feed.
+
+    The URL holds a token from calendar_feed.feed_token instead of needing
+    a login. Takes a years query parameter, the number of yahrzeits listed
+    for each decedent.
+
+    """
+
+    try:
+        user = CustomUser.objects.get(pk=_feed_user_pk(token))
+
+    except CustomUser.DoesNotExist:
+        raise Http404('Unknown calendar feed.')
+
+    response = StreamingHttpResponse(
+        calendar_feed.iter_feed(user, _feed_years(request)),
+        content_type='text/calendar; charset=utf-8',
+    )
+    response['Content-Disposition'] = 'inline; filename="yahrzeits.ics"'
+
+    return response
+
+
+@ensure_csrf_cookie
+def get_csrf_cookie(request: HttpRequest) -> JsonResponse:
+    """API endpoint that sets the CSRF cookie.
+
+    Shared result pages are served without cookies, so they call this
+    before posting to save_res or activate_res if the cookie is missing.
+
+    """
+
+    return JsonResponse({'status': 'success'})